@@ -7,7 +7,6 @@ Language-agnostic approach with multi-language support.
 """
 
 import sys
-import time
 from typing import Any, Dict, List, Literal
 
 # Import our implementations
@@ -17,6 +16,7 @@ sys.path.insert(0, 'src/context/python')
 
 from analyze import analyze_code
 from feedback import ExecutionMetrics, FeedbackAnalyzer
+from instrument import instrument
 from builder import ContextBuilder
 
 
@@ -68,6 +68,7 @@ def main():
     print(f"✅ Context built successfully")
     print(f"   Sections: {stats['sections']}")
     print(f"   Size: {stats['total_length']} chars")
+    print(f"   Tokens used: {builder.last_report.used_tokens} (approx)")
     print(f"   Truncated: {truncated}")
     
     # Demo 2: Execute Tool
@@ -81,13 +82,19 @@ def process_data(data: list) -> dict:
     return result
     """
     
-    start_time = time.time()
-    analysis_result = analyze_code(
+    # Every call of the wrapped tool is timed and recorded as feedback
+    analyzer = FeedbackAnalyzer(success_threshold=0.8)
+    timed_analyze_code = instrument(
+        analyzer, 'code_analyzer',
+        tokens=builder.last_report.used_tokens
+    )(analyze_code)
+    
+    analysis_result = timed_analyze_code(
         code=code_sample,
         language='python',
         analyze_for=['readability', 'performance']
     )
-    execution_time = (time.time() - start_time) * 1000
+    analyzer.flush()
     
     print(f"✅ Analysis complete")
     print(f"   Complexity: {analysis_result.complexity}")
@@ -99,9 +106,7 @@ def process_data(data: list) -> dict:
     # Demo 3: Record Feedback
     print_header("Demo 3: Record Execution Feedback")
     
-    analyzer = FeedbackAnalyzer(success_threshold=0.8)
-    
-    # Simulate 3 executions
+    # Simulate 3 more executions
     executions = [
         ExecutionMetrics(
             tool_name='code_analyzer',
@@ -132,6 +137,7 @@ def process_data(data: list) -> dict:
     print("Recording executions...")
     for i, exec_metrics in enumerate(executions, 1):
         analyzer.record(exec_metrics)
+    analyzer.flush()
     
     # Demo 4: Analyze Feedback
     print_header("Demo 4: Analyze Feedback & Get Recommendations")
@@ -4,20 +4,475 @@ Python Context Builder - Language Agnostic Implementation
 Build strategic, prioritized context that works across all languages.
 """
 
+import asyncio
+import concurrent.futures
+import hashlib
+import heapq
+import inspect
+import json
+import mmap
+import os
+import struct
+import threading
+import weakref
+import zlib
 from dataclasses import dataclass, field
-from typing import Dict, List, Tuple, Literal
+from typing import (AsyncIterable, AsyncIterator, Awaitable, Callable, Dict,
+                    Iterable, Iterator, List, Optional, Sequence, TextIO,
+                    Tuple, Union, Literal)
+
+from relevance import InvertedIndex
+from similarity import DEFAULT_HASHER, find_near_duplicates
+from tokenizer import CachedTokenizer, Tokenizer, content_digest, get_tokenizer
+
+
+PackingStrategy = Literal['ordered', 'greedy', 'optimal']
+BudgetUnit = Literal['chars', 'tokens']
+TrimPolicy = Literal['never', 'head', 'tail', 'head_tail']
+LayoutMode = Literal['priority', 'stable']
+
+SEPARATOR = "\n\n"
+TRUNCATION_MARKER = "[... truncated ...]"
+
+# Preferred cut points, best first: paragraph, line, sentence, word
+_BOUNDARIES = ("\n\n", "\n", ". ", "! ", "? ", " ")
+
+# Snapshot file layout (little-endian):
+#   header  magic, version, section count, meta length, blob offset,
+#           CRC-32 of meta and records
+#   meta    JSON builder settings
+#   records one fixed-size entry per section, offsets relative to blob
+#   blob    UTF-8 titles and contents back to back
+_SNAPSHOT_MAGIC = b'CTXSNAP\0'
+_SNAPSHOT_VERSION = 2
+_SNAPSHOT_HEADER = struct.Struct('<8sIIIQI')
+_SNAPSHOT_RECORD = struct.Struct('<QIQIBBBxIi16s')
+_PRIORITY_CODES = ('high', 'medium', 'low')
+_TRIM_CODES = ('never', 'head', 'tail', 'head_tail')
 
 
 @dataclass
 class ContextSection:
-    """A section of context with priority."""
+    """
+    A section of context with priority.
+    
+    The rendered text, its length, digest and token counts are cached
+    and only recomputed after title, content or priority change. Builders
+    holding the section are told about changes so their totals stay
+    current.
+    """
     title: str
     content: str
     priority: Literal['high', 'medium', 'low']
+    trim: TrimPolicy = 'never'
+    volatile: bool = False
     
-    def __str__(self) -> str:
+    _RENDER_FIELDS = frozenset(('title', 'content', 'priority'))
+    
+    def __setattr__(self, name: str, value) -> None:
+        object.__setattr__(self, name, value)
+        if name in self._RENDER_FIELDS:
+            if name == 'content':
+                self.__dict__.pop('_source', None)
+            self._invalidate()
+    
+    def __getattr__(self, name: str):
+        # Only reached for missing attributes: content of a section loaded
+        # from a snapshot is decoded from the mapped file on first access
+        # and checked against the digest saved with it
+        if name == 'content':
+            state = self.__dict__
+            source = state.get('_source')
+            if source is not None:
+                buffer, start, end = source
+                content = str(buffer[start:end], 'utf-8', 'replace')
+                rendered = f"{self.heading}{content}"
+                if content_digest(rendered) != state['_digest']:
+                    raise ValueError(
+                        f"Snapshot content of section {self.title!r} is corrupt")
+                state['content'] = content
+                state['_rendered'] = rendered
+                return content
+        raise AttributeError(name)
+    
+    def _invalidate(self) -> None:
+        """Drop cached renders and report the change to watchers."""
+        state = self.__dict__
+        old_length = state.pop('_length', None)
+        old_tokens = state.pop('_tokens', None)
+        state.pop('_rendered', None)
+        state.pop('_digest', None)
+        state.pop('_sketch', None)
+        watchers = state.get('_watchers')
+        if watchers and old_length is not None:
+            for builder in list(watchers):
+                builder._section_changed(self, old_length, old_tokens)
+    
+    def __getstate__(self) -> dict:
+        # Watchers are weak references and the rendered text is rebuilt
+        # on demand; content of a snapshot section is read off the map
+        state = self.__dict__.copy()
+        for name in ('_watchers', '_rendered', '_sketch', '_source'):
+            state.pop(name, None)
+        state['content'] = self.content
+        return state
+    
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+    
+    def _watch(self, builder: 'ContextBuilder') -> None:
+        watchers = self.__dict__.get('_watchers')
+        if watchers is None:
+            watchers = self.__dict__['_watchers'] = weakref.WeakSet()
+        watchers.add(builder)
+    
+    def _unwatch(self, builder: 'ContextBuilder') -> None:
+        watchers = self.__dict__.get('_watchers')
+        if watchers is not None:
+            watchers.discard(builder)
+    
+    @property
+    def length(self) -> int:
+        """Length of the rendered section in characters."""
+        length = self.__dict__.get('_length')
+        if length is None:
+            length = self.__dict__['_length'] = len(str(self))
+        return length
+    
+    @property
+    def digest(self) -> bytes:
+        """Content digest of the rendered section."""
+        digest = self.__dict__.get('_digest')
+        if digest is None:
+            digest = self.__dict__['_digest'] = content_digest(str(self))
+        return digest
+    
+    @property
+    def sketch(self):
+        """MinHash signature of the content (None if it has no words)."""
+        state = self.__dict__
+        if '_sketch' not in state:
+            state['_sketch'] = DEFAULT_HASHER.sketch(self.content)
+        return state['_sketch']
+    
+    def token_count(self, tokenizer: CachedTokenizer) -> int:
+        """Tokens in the rendered section, cached per tokenizer name."""
+        counts = self.__dict__.get('_tokens')
+        if counts is None:
+            counts = self.__dict__['_tokens'] = {}
+        tokens = counts.get(tokenizer.name)
+        if tokens is None:
+            tokens = counts[tokenizer.name] = tokenizer.count(
+                str(self), self.digest)
+        return tokens
+    
+    @property
+    def heading(self) -> str:
+        """Rendered text that precedes the content."""
         prefix = '⭐ ' if self.priority == 'high' else ''
-        return f"{prefix}## {self.title}\n\n{self.content}"
+        return f"{prefix}## {self.title}\n\n"
+    
+    def __str__(self) -> str:
+        rendered = self.__dict__.get('_rendered')
+        if rendered is None:
+            rendered = f"{self.heading}{self.content}"
+            self.__dict__['_rendered'] = rendered
+        return rendered
+
+
+@dataclass
+class LazySection(ContextSection):
+    """
+    A section whose content comes from a provider at build time.
+    
+    Until resolved it renders as its heading only and is budgeted at
+    size_hint. The provider is only called if the section survives
+    selection.
+    """
+    provider: Optional[Callable[[], Union[str, Awaitable[str]]]] = None
+    size_hint: int = 0
+    timeout: Optional[float] = None
+
+
+def _cut_back(text: str, end: int, floor: int) -> int:
+    """Last boundary cut position in [floor, end], or end if none."""
+    for sep in _BOUNDARIES:
+        pos = text.rfind(sep, floor, end)
+        if pos != -1:
+            return pos + len(sep.rstrip())
+    return end
+
+
+def _cut_forward(text: str, start: int, ceiling: int) -> int:
+    """First boundary cut position in [start, ceiling], or start if none."""
+    for sep in _BOUNDARIES:
+        pos = text.find(sep, start, ceiling)
+        if pos != -1:
+            return pos + len(sep)
+    return start
+
+
+def trim_content(content: str,
+                 limit: int,
+                 policy: TrimPolicy) -> Optional[str]:
+    """
+    Shorten content to at most limit characters, marker included.
+    
+    Cuts land on the nearest paragraph, line, sentence or word boundary
+    within the last (or, for the tail, first) half of the kept span.
+    Boundaries are located with bounded find/rfind scans and the text is
+    sliced once per kept span.
+    
+    Args:
+        content: Text to shorten
+        limit: Maximum length of the result
+        policy: 'head' keeps the beginning, 'tail' the end, 'head_tail'
+                both ends around the marker; 'never' refuses to trim
+    
+    Returns:
+        The trimmed text, content itself if it already fits, or None if
+        the policy forbids trimming or limit leaves no room for text
+    """
+    if len(content) <= limit:
+        return content
+    if policy == 'never':
+        return None
+    
+    marker = TRUNCATION_MARKER
+    gap = SEPARATOR
+    if policy == 'head':
+        room = limit - len(marker) - len(gap)
+        if room <= 0:
+            return None
+        cut = _cut_back(content, room, room // 2)
+        return f"{content[:cut]}{gap}{marker}"
+    if policy == 'tail':
+        room = limit - len(marker) - len(gap)
+        if room <= 0:
+            return None
+        start = len(content) - room
+        cut = _cut_forward(content, start, start + room // 2)
+        return f"{marker}{gap}{content[cut:]}"
+    if policy == 'head_tail':
+        room = limit - len(marker) - 2 * len(gap)
+        if room <= 1:
+            return None
+        head_room = room // 2
+        head_cut = _cut_back(content, head_room, head_room // 2)
+        tail_room = room - head_cut
+        start = len(content) - tail_room
+        tail_cut = _cut_forward(content, start, start + tail_room // 2)
+        return f"{content[:head_cut]}{gap}{marker}{gap}{content[tail_cut:]}"
+    raise ValueError(f"Unknown trim policy: {policy!r}")
+
+
+@dataclass
+class DroppedSection:
+    """A section that was left out of a built context."""
+    title: str
+    priority: Literal['high', 'medium', 'low']
+    length: int
+    reason: Literal['exceeds_budget', 'budget_exhausted', 'not_relevant',
+                    'below_top_k', 'provider_timeout', 'provider_error',
+                    'duplicate']
+    detail: str = ''
+
+
+@dataclass
+class SectionSpan:
+    """Where a section landed in a built context."""
+    title: str
+    start: int
+    end: int
+    volatile: bool
+    digest: bytes
+
+
+@dataclass
+class ContextLayout:
+    """
+    A built context together with its section positions.
+    
+    prefix_end is the offset just past the last static (non-volatile)
+    section and prefix_hash the SHA-256 of text[:prefix_end]. With the
+    'stable' layout, two builds with the same static sections share that
+    prefix byte for byte, whatever their volatile sections contain.
+    """
+    text: str
+    truncated: bool
+    spans: List[SectionSpan]
+    prefix_end: int
+    prefix_hash: str
+
+
+@dataclass
+class BuildReport:
+    """Which sections the last build included, dropped and why."""
+    strategy: PackingStrategy
+    included: List[str] = field(default_factory=list)
+    trimmed: List[str] = field(default_factory=list)
+    dropped: List[DroppedSection] = field(default_factory=list)
+    used_length: int = 0
+    used_tokens: int = 0
+    total_weight: float = 0
+    # Budget-unit size of each included section as emitted, so trimmed
+    # sections count at their trimmed size
+    sizes: Dict[str, int] = field(default_factory=dict)
+    _values: Dict[str, float] = field(default_factory=dict, repr=False)
+    
+    @property
+    def truncated(self) -> bool:
+        return bool(self.dropped or self.trimmed)
+
+
+def _pack_ordered(costs: Sequence[int],
+                  values: Sequence[float],
+                  capacity: int) -> List[int]:
+    """First-fit in the given order, skipping items that do not fit."""
+    chosen = []
+    remaining = capacity
+    for i, cost in enumerate(costs):
+        if cost <= remaining:
+            chosen.append(i)
+            remaining -= cost
+    return chosen
+
+
+def _pack_greedy(costs: Sequence[int],
+                 values: Sequence[float],
+                 capacity: int) -> List[int]:
+    """
+    Greedy by value density (value per unit of budget).
+    
+    The density pass alone can be arbitrarily bad when one valuable
+    item is large, so the result is compared against a first-fit pass in
+    priority order and the better of the two is kept. That bounds the
+    result at no worse than half of the optimum.
+    """
+    by_density = sorted(
+        range(len(costs)),
+        key=lambda i: (-values[i] / costs[i], -values[i], i)
+    )
+    chosen = []
+    remaining = capacity
+    for i in by_density:
+        if costs[i] <= remaining:
+            chosen.append(i)
+            remaining -= costs[i]
+    
+    ordered = _pack_ordered(costs, values, capacity)
+    if sum(values[i] for i in ordered) > sum(values[i] for i in chosen):
+        chosen = ordered
+    return sorted(chosen)
+
+
+# Largest items x capacity table solved by dynamic programming
+_OPTIMAL_DP_CELLS = 1_000_000
+# Branch-and-bound nodes explored before settling for the best so far
+_OPTIMAL_NODES = 200_000
+
+
+class _SearchExhausted(Exception):
+    pass
+
+
+def _pack_dp(costs: Sequence[int],
+             values: Sequence[float],
+             capacity: int) -> List[int]:
+    """Exact 0/1 knapsack over integer capacities, O(n * capacity)."""
+    best = [0.0] * (capacity + 1)
+    takes = []
+    for cost, value in zip(costs, values):
+        if cost > capacity:
+            takes.append(None)
+            continue
+        shifted = [previous + value for previous in best[:capacity + 1 - cost]]
+        take = [candidate > current
+                for candidate, current in zip(shifted, best[cost:])]
+        best = best[:cost] + [candidate if taken else current
+                              for candidate, current, taken
+                              in zip(shifted, best[cost:], take)]
+        takes.append(take)
+    
+    chosen = []
+    room = capacity
+    for i in range(len(costs) - 1, -1, -1):
+        take = takes[i]
+        if take is not None and room >= costs[i] and take[room - costs[i]]:
+            chosen.append(i)
+            room -= costs[i]
+    return sorted(chosen)
+
+
+def _pack_optimal(costs: Sequence[int],
+                  values: Sequence[float],
+                  capacity: int) -> List[int]:
+    """
+    0/1 knapsack, exact whenever the work stays bounded.
+    
+    Costs are integers, so when items x capacity is at most
+    _OPTIMAL_DP_CELLS the table is solved exactly by dynamic programming.
+    Larger budgets use depth-first branch and bound: items are explored
+    in value-density order and a branch is pruned when its fractional
+    (LP relaxation) bound cannot beat the best solution found so far.
+    After _OPTIMAL_NODES nodes the search stops and the better of its
+    best solution and the greedy packing is returned, so the cost is
+    bounded even on inputs built to defeat the bound.
+    """
+    if len(costs) * (capacity + 1) <= _OPTIMAL_DP_CELLS:
+        return _pack_dp(costs, values, capacity)
+    
+    order = [i for i in sorted(range(len(costs)),
+                               key=lambda i: (-values[i] / costs[i], i))
+             if costs[i] <= capacity]
+    c = [costs[i] for i in order]
+    v = [values[i] for i in order]
+    n = len(order)
+    
+    best_value = -1.0
+    best_taken: List[int] = []
+    taken: List[int] = []
+    nodes = 0
+    
+    def bound(k: int, room: int, value: float) -> float:
+        for j in range(k, n):
+            if c[j] <= room:
+                room -= c[j]
+                value += v[j]
+            else:
+                return value + v[j] * room / c[j]
+        return value
+    
+    def search(k: int, room: int, value: float) -> None:
+        nonlocal best_value, best_taken, nodes
+        nodes += 1
+        if nodes > _OPTIMAL_NODES:
+            raise _SearchExhausted
+        if value > best_value:
+            best_value = value
+            best_taken = list(taken)
+        if k == n or bound(k, room, value) <= best_value:
+            return
+        if c[k] <= room:
+            taken.append(k)
+            search(k + 1, room - c[k], value + v[k])
+            taken.pop()
+        search(k + 1, room, value)
+    
+    try:
+        search(0, capacity, 0.0)
+    except _SearchExhausted:
+        greedy = _pack_greedy(costs, values, capacity)
+        if sum(values[i] for i in greedy) > best_value:
+            return greedy
+    return sorted(order[k] for k in best_taken)
+
+
+_PACKERS = {
+    'ordered': _pack_ordered,
+    'greedy': _pack_greedy,
+    'optimal': _pack_optimal,
+}
 
 
 class ContextBuilder:
@@ -29,95 +484,1161 @@ class ContextBuilder:
         'low': 10
     }
     
-    def __init__(self, max_length: int = 10000):
+    # Above this many sections 'optimal' packing uses 'greedy' instead
+    OPTIMAL_MAX_SECTIONS = 32
+    
+    # Share of a section's value that comes from query relevance; the
+    # rest is its plain priority weight
+    RELEVANCE_WEIGHT = 0.8
+    
+    # Trimmed sections must keep at least this many characters of content
+    MIN_TRIM_CHARS = 40
+    
+    # Estimated shingle similarity at which sections count as duplicates
+    DEDUP_THRESHOLD = 0.8
+    
+    # Lazy providers: how many run at once, and the default time limit
+    PROVIDER_CONCURRENCY = 8
+    PROVIDER_TIMEOUT = 10.0
+    
+    def __init__(self,
+                 max_length: int = 10000,
+                 packing: PackingStrategy = 'ordered',
+                 unit: BudgetUnit = 'chars',
+                 tokenizer: Union[str, Tokenizer] = 'approx',
+                 layout: LayoutMode = 'priority',
+                 dedup: bool = False):
         """
         Initialize context builder.
         
         Args:
-            max_length: Maximum context length in characters
+            max_length: Maximum context length, in `unit`
+            packing: How sections are chosen when they do not all fit:
+                     'ordered' takes sections in priority order and skips
+                     any that do not fit, 'greedy' packs by priority weight
+                     per character, 'optimal' solves the knapsack exactly
+                     when that stays cheap and otherwise returns the best
+                     packing found within a fixed search budget
+            unit: 'chars' or 'tokens'; what max_length is measured in
+            tokenizer: Registered tokenizer name (see tokenizer.py) or a
+                       Tokenizer instance, used for token budgets and stats
+            layout: Order of emitted sections: 'priority' (most valuable
+                    first) or 'stable' (static sections first in canonical
+                    order, volatile sections after them)
+            dedup: Drop sections whose content nearly duplicates a
+                   higher-priority section (see DEDUP_THRESHOLD)
         """
+        if packing not in _PACKERS:
+            raise ValueError(f"Unknown packing strategy: {packing!r}")
+        if unit not in ('chars', 'tokens'):
+            raise ValueError(f"Unknown budget unit: {unit!r}")
+        if layout not in ('priority', 'stable'):
+            raise ValueError(f"Unknown layout: {layout!r}")
         self.max_length = max_length
+        self.packing = packing
+        self.unit = unit
+        self.layout = layout
+        self.dedup = dedup
+        self.tokenizer = get_tokenizer(tokenizer)
         self.sections: Dict[str, ContextSection] = {}
+        self.last_report: Optional[BuildReport] = None
+        self._total_length = 0
+        # Token total is computed on first use, then kept current
+        self._total_tokens: Optional[int] = None
+        self._separator_tokens = self.tokenizer.count(SEPARATOR)
+        # Built on the first query, then maintained incrementally
+        self._index: Optional[InvertedIndex] = None
+        # Copy-on-write state shared with fork()ed builders
+        self._sections_shared = False
+        self._index_shared = False
+        self._forks: 'weakref.WeakSet[ContextBuilder]' = weakref.WeakSet()
+        # Builder this one was forked from, kept alive because it
+        # forwards edits of the sections they share
+        self._parent: Optional[ContextBuilder] = None
+        self._lock = threading.RLock()
+    
+    def __getstate__(self) -> dict:
+        # Locks, weak references and mapped snapshots do not pickle; the
+        # copy owns its sections and watches them itself
+        state = self.__dict__.copy()
+        for name in ('_forks', '_parent', '_lock', '_snapshot'):
+            state.pop(name, None)
+        state['_sections_shared'] = state['_index_shared'] = False
+        tokenizer = self.tokenizer
+        try:
+            if get_tokenizer(tokenizer.name) is tokenizer:
+                # Rejoin the shared instance and its count cache on load
+                state['tokenizer'] = tokenizer.name
+        except ValueError:
+            pass
+        return state
+    
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        if isinstance(self.tokenizer, str):
+            self.tokenizer = get_tokenizer(self.tokenizer)
+        self._forks = weakref.WeakSet()
+        self._parent = None
+        self._lock = threading.RLock()
+        for section in self.sections.values():
+            section._watch(self)
+    
+    def fork(self) -> 'ContextBuilder':
+        """
+        Cheap copy for per-request additions.
+        
+        The fork shares this builder's sections, their cached renders and
+        token counts, and the relevance index. Whichever side changes its
+        section set first copies the section dict (and index) at that
+        point, so forking costs O(1) and a fork pays only for what it
+        adds. Safe to call from many threads at once.
+        
+        Sections themselves are shared objects: replace them with
+        add_section() on the fork rather than editing them in place,
+        otherwise the edit shows up in every builder sharing them. Such
+        edits still keep every sharing builder's totals current; a fork
+        keeps the builder it came from alive for that.
+        """
+        child = ContextBuilder.__new__(type(self))
+        with self._lock:
+            child.__dict__.update(self.__dict__)
+            self._sections_shared = True
+            self._index_shared = self._index is not None
+            self._forks.add(child)
+        child._sections_shared = True
+        child._index_shared = child._index is not None
+        child._forks = weakref.WeakSet()
+        child._parent = self
+        child._lock = threading.RLock()
+        child.last_report = None
+        return child
+    
+    def save(self, path: str) -> None:
+        """
+        Write a binary snapshot of the sections and builder settings.
+        
+        Cached rendered lengths, digests and token counts for this
+        builder's tokenizer are stored with each section, so a loaded
+        builder can select and report without touching section text.
+        The settings and records are covered by a CRC-32, each section's
+        content by its digest. The file is written to a temporary name
+        and moved into place.
+        """
+        meta = json.dumps({
+            'max_length': self.max_length,
+            'packing': self.packing,
+            'unit': self.unit,
+            'layout': self.layout,
+            'dedup': self.dedup,
+            'tokenizer': self.tokenizer.name,
+        }).encode('utf-8')
+        sections = list(self.sections.values())
+        if any(isinstance(s, LazySection) for s in sections):
+            raise ValueError("Sections with lazy providers cannot be saved")
+        
+        records = []
+        chunks = []
+        offset = 0
+        for section in sections:
+            title = section.title.encode('utf-8')
+            content = section.content.encode('utf-8')
+            records.append(_SNAPSHOT_RECORD.pack(
+                offset, len(title), offset + len(title), len(content),
+                _PRIORITY_CODES.index(section.priority),
+                _TRIM_CODES.index(section.trim),
+                1 if section.volatile else 0,
+                section.length, section.token_count(self.tokenizer),
+                section.digest
+            ))
+            chunks.append(title)
+            chunks.append(content)
+            offset += len(title) + len(content)
+        
+        blob_offset = (_SNAPSHOT_HEADER.size + len(meta)
+                       + _SNAPSHOT_RECORD.size * len(records))
+        checksum = zlib.crc32(b''.join(records), zlib.crc32(meta))
+        temp = f"{path}.tmp"
+        with open(temp, 'wb') as f:
+            f.write(_SNAPSHOT_HEADER.pack(_SNAPSHOT_MAGIC, _SNAPSHOT_VERSION,
+                                          len(records), len(meta),
+                                          blob_offset, checksum))
+            f.write(meta)
+            f.writelines(records)
+            f.writelines(chunks)
+        os.replace(temp, path)
+    
+    @classmethod
+    def load(cls,
+             path: str,
+             memory_map: bool = True,
+             tokenizer: Union[str, Tokenizer, None] = None) -> 'ContextBuilder':
+        """
+        Load a builder from a snapshot written by save().
+        
+        With memory_map, the file is mapped read-only and section content
+        is decoded only when first used, so worker processes loading the
+        same snapshot share its pages through the OS page cache. Titles,
+        lengths, digests and token counts are read up front.
+        
+        Args:
+            path: Snapshot file
+            memory_map: Map the file instead of reading it into memory
+            tokenizer: Override the tokenizer recorded in the snapshot
+        
+        Raises:
+            ValueError: If the file is not a snapshot of this version or
+                        is truncated or corrupt. Content is checked
+                        against its digest when first decoded, which
+                        raises ValueError for a corrupt section.
+        """
+        with open(path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size < _SNAPSHOT_HEADER.size:
+                raise ValueError(f"{path} is not a context snapshot")
+            if memory_map:
+                buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                buffer = f.read()
+        
+        (magic, version, count, meta_len, blob,
+         checksum) = _SNAPSHOT_HEADER.unpack_from(buffer)
+        if magic != _SNAPSHOT_MAGIC:
+            raise ValueError(f"{path} is not a context snapshot")
+        if version != _SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported snapshot version {version}")
+        position = _SNAPSHOT_HEADER.size
+        if (blob != position + meta_len + _SNAPSHOT_RECORD.size * count
+                or blob > len(buffer)
+                or zlib.crc32(buffer[position:blob]) != checksum):
+            raise ValueError(f"{path} is truncated or corrupt")
+        meta = json.loads(bytes(buffer[position:position + meta_len]))
+        position += meta_len
+        
+        saved_tokenizer = meta.pop('tokenizer')
+        builder = cls(tokenizer=tokenizer or saved_tokenizer, **meta)
+        for (title_off, title_len, content_off, content_len, priority, trim,
+             flags, length, tokens, digest) in _SNAPSHOT_RECORD.iter_unpack(
+                buffer[position:blob]):
+            if blob + content_off + content_len > len(buffer):
+                raise ValueError(f"{path} is truncated or corrupt")
+            start = blob + title_off
+            section = ContextSection.__new__(ContextSection)
+            section.__dict__.update(
+                title=str(buffer[start:start + title_len], 'utf-8'),
+                priority=_PRIORITY_CODES[priority],
+                trim=_TRIM_CODES[trim],
+                volatile=bool(flags & 1),
+                _source=(buffer, blob + content_off,
+                         blob + content_off + content_len),
+                _length=length,
+                _digest=digest,
+                _tokens={saved_tokenizer: tokens},
+            )
+            builder._put_section(section)
+        builder._snapshot = buffer
+        return builder
+    
+    def _own_sections(self) -> None:
+        """Take a private copy of shared state before changing it."""
+        if self._sections_shared:
+            self.sections = dict(self.sections)
+            self._sections_shared = False
+        if self._index_shared:
+            self._index = self._index.copy()
+            self._index_shared = False
     
     def add_section(self, 
                     title: str, 
                     content: str, 
-                    priority: Literal['high', 'medium', 'low'] = 'medium') -> 'ContextBuilder':
-        """Add a context section."""
-        self.sections[title] = ContextSection(title, content, priority)
+                    priority: Literal['high', 'medium', 'low'] = 'medium',
+                    trim: TrimPolicy = 'never',
+                    volatile: bool = False) -> 'ContextBuilder':
+        """
+        Add a context section.
+        
+        Args:
+            title: Section heading (also its key)
+            content: Section body
+            priority: 'high', 'medium' or 'low'
+            trim: What to do when the whole section does not fit:
+                  'never' drops it, 'head'/'tail'/'head_tail' include a
+                  shortened copy cut at paragraph/line/sentence boundaries
+            volatile: Content changes from request to request; the
+                      'stable' layout keeps it out of the cacheable prefix
+        """
+        self._put_section(
+            ContextSection(title, content, priority, trim, volatile))
         return self  # Allow chaining
     
+    def add_provider(self,
+                     title: str,
+                     provider: Callable[[], Union[str, Awaitable[str]]],
+                     size_hint: int,
+                     priority: Literal['high', 'medium', 'low'] = 'medium',
+                     trim: TrimPolicy = 'never',
+                     volatile: bool = False,
+                     timeout: Optional[float] = None) -> 'ContextBuilder':
+        """
+        Add a section whose content is fetched only if it gets selected.
+        
+        Selected providers are resolved concurrently (at most
+        PROVIDER_CONCURRENCY at a time) on every build; plain callables
+        run in worker threads, coroutine functions on the event loop.
+        A provider that times out or raises is left out of the context
+        and reported in last_report. With a query, providers are ranked
+        on their title.
+        
+        Args:
+            title: Section heading (also its key)
+            provider: Zero-argument callable returning the content, or an
+                      async function returning it
+            size_hint: Expected size in the budget unit, used for
+                       selection before the content is known
+            priority: 'high', 'medium' or 'low'
+            trim: Trim policy applied once the content is known
+            volatile: See add_section()
+            timeout: Seconds to wait for this provider; defaults to
+                     PROVIDER_TIMEOUT
+        """
+        if size_hint <= 0:
+            raise ValueError("size_hint must be positive")
+        self._put_section(LazySection(
+            title, '', priority, trim, volatile,
+            provider=provider, size_hint=size_hint, timeout=timeout
+        ))
+        return self
+    
+    def _put_section(self, section: ContextSection) -> None:
+        """Store a section, keeping the running total length current."""
+        with self._lock:
+            self._own_sections()
+            old = self.sections.get(section.title)
+            if old is not None:
+                self._release(old)
+            self.sections[section.title] = section
+            section._watch(self)
+            self._total_length += section.length
+            if self._total_tokens is not None:
+                self._total_tokens += section.token_count(self.tokenizer)
+            if self._index is not None:
+                self._index.add(section.title, self._index_text(section))
+    
+    def _release(self, section: ContextSection) -> None:
+        """Take a section's share out of the running totals."""
+        # Forks may still hold the section and rely on us to forward
+        # its change notifications
+        if not self._forks:
+            section._unwatch(self)
+        self._total_length -= section.length
+        if self._total_tokens is not None:
+            self._total_tokens -= section.token_count(self.tokenizer)
+    
+    def remove_section(self, title: str) -> 'ContextBuilder':
+        """Remove a section if present."""
+        with self._lock:
+            if title not in self.sections:
+                return self
+            self._own_sections()
+            self._release(self.sections.pop(title))
+            if self._index is not None:
+                self._index.remove(title)
+        return self
+    
+    def _section_changed(self,
+                         section: ContextSection,
+                         old_length: int,
+                         old_tokens: Optional[Dict[str, int]]) -> None:
+        """Called by a held section whose rendered text changed."""
+        for fork in list(self._forks):
+            fork._section_changed(section, old_length, old_tokens)
+        if self.sections.get(section.title) is not section:
+            return
+        self._total_length += section.length - old_length
+        if self._total_tokens is not None:
+            old_count = (old_tokens or {}).get(self.tokenizer.name)
+            if old_count is None:
+                self._total_tokens = None
+            else:
+                self._total_tokens += (section.token_count(self.tokenizer)
+                                       - old_count)
+        if self._index is not None:
+            if self._index_shared:
+                self._index = self._index.copy()
+                self._index_shared = False
+            self._index.add(section.title, self._index_text(section))
+    
+    @staticmethod
+    def _index_text(section: ContextSection) -> str:
+        return f"{section.title}\n{section.content}"
+    
+    def relevance(self, query: str) -> Dict[str, float]:
+        """
+        BM25 relevance of each section to a query, scaled to 0-1.
+        
+        Sections that share no terms with the query are omitted.
+        """
+        if self._index is None:
+            self._index = InvertedIndex()
+            for section in self.sections.values():
+                self._index.add(section.title, self._index_text(section))
+        scores = self._index.scores(query)
+        if not scores:
+            return {}
+        best = max(scores.values())
+        return {title: score / best for title, score in scores.items()}
+    
+    @property
+    def total_tokens(self) -> int:
+        """Tokens across all sections, excluding separators."""
+        if self._total_tokens is None:
+            self._total_tokens = sum(s.token_count(self.tokenizer)
+                                     for s in self.sections.values())
+        return self._total_tokens
+    
+    def count_tokens(self, text: str) -> int:
+        """Count tokens in text with this builder's tokenizer."""
+        return self.tokenizer.count(text)
+    
+    def _size(self, section: ContextSection) -> int:
+        """Size of a rendered section in the budget unit."""
+        if isinstance(section, LazySection):
+            return section.size_hint
+        if self.unit == 'tokens':
+            return section.token_count(self.tokenizer)
+        return section.length
+    
+    @property
+    def _separator_size(self) -> int:
+        """Size of SEPARATOR in the budget unit."""
+        if self.unit == 'tokens':
+            return self._separator_tokens
+        return len(SEPARATOR)
+    
     def add_examples(self, 
                      examples: List[Dict[str, str]]) -> 'ContextBuilder':
         """Add usage examples."""
-        content = "### Examples\n\n"
+        parts = ["### Examples\n\n"]
         for i, ex in enumerate(examples, 1):
-            content += f"**Example {i}:**\n"
-            content += f"Input: {ex['input']}\n"
-            content += f"Output: {ex['output']}\n\n"
+            parts.append(f"**Example {i}:**\n"
+                         f"Input: {ex['input']}\n"
+                         f"Output: {ex['output']}\n\n")
         
-        self.add_section('Examples', content, 'medium')
+        self.add_section('Examples', ''.join(parts), 'medium')
         return self
     
     def add_tools(self, tools: List[Dict[str, str]]) -> 'ContextBuilder':
         """Add available tools."""
-        content = "### Available Tools\n\n"
-        for tool in tools:
-            content += f"- **{tool['name']}**: {tool['description']}\n"
+        parts = ["### Available Tools\n\n"]
+        parts.extend(f"- **{tool['name']}**: {tool['description']}\n"
+                     for tool in tools)
         
-        self.add_section('Tools', content, 'high')
+        self.add_section('Tools', ''.join(parts), 'high')
         return self
     
-    def build(self) -> Tuple[str, bool]:
+    def build(self,
+              packing: Optional[PackingStrategy] = None,
+              query: Optional[str] = None,
+              top_k: Optional[int] = None,
+              layout: Optional[LayoutMode] = None) -> Tuple[str, bool]:
         """
         Build final context.
         
+        Sections are packed into max_length according to the packing
+        strategy and emitted in priority order. Details of what was left
+        out are available in last_report afterwards.
+        
+        With a query, each section is valued by its priority weight
+        scaled by BM25 relevance to the query (RELEVANCE_WEIGHT sets the
+        mix) and sections come out most valuable first. Sections with no
+        terms in common with the query are only kept if they are 'high'
+        priority, so standing instructions survive.
+        
+        Args:
+            packing: Override the builder's packing strategy for this build
+            query: Task description to rank sections against
+            top_k: Consider at most this many sections
+            layout: Override the builder's layout for this build
+        
         Returns:
             (context_string, was_truncated)
         """
-        # Sort by priority
-        sorted_sections = sorted(
-            self.sections.values(),
-            key=lambda s: self.PRIORITY_WEIGHTS[s.priority],
-            reverse=True
-        )
+        context = ''.join(self.build_iter(packing, query, top_k, layout))
+        return context, self.last_report.truncated
+    
+    def build_iter(self,
+                   packing: Optional[PackingStrategy] = None,
+                   query: Optional[str] = None,
+                   top_k: Optional[int] = None,
+                   layout: Optional[LayoutMode] = None) -> Iterator[str]:
+        """
+        Build final context as a stream of chunks.
+        
+        Selection happens eagerly, so last_report is already populated
+        when this returns; only the rendering is lazy. Joining the chunks
+        gives exactly what build() returns.
+        
+        Args:
+            packing: Override the builder's packing strategy for this build
+            query: Task description to rank sections against
+            top_k: Consider at most this many sections
+            layout: Override the builder's layout for this build
+        
+        Returns:
+            Iterator over section texts and separators
+        """
+        selected = self._plan(packing, query, top_k, layout)
+        return self._render(selected)
+    
+    def build_into(self,
+                   fileobj: TextIO,
+                   packing: Optional[PackingStrategy] = None,
+                   query: Optional[str] = None,
+                   top_k: Optional[int] = None,
+                   layout: Optional[LayoutMode] = None) -> Tuple[int, bool]:
+        """
+        Write final context to a text file object chunk by chunk.
+        
+        Args:
+            fileobj: Anything with a write(str) method (file, StringIO,
+                     socket.makefile('w'), ...)
+            packing: Override the builder's packing strategy for this build
+            query: Task description to rank sections against
+            top_k: Consider at most this many sections
+            layout: Override the builder's layout for this build
+        
+        Returns:
+            (characters_written, was_truncated)
+        """
+        written = 0
+        for chunk in self.build_iter(packing, query, top_k, layout):
+            fileobj.write(chunk)
+            written += len(chunk)
+        return written, self.last_report.truncated
+    
+    def build_layout(self,
+                     packing: Optional[PackingStrategy] = None,
+                     query: Optional[str] = None,
+                     top_k: Optional[int] = None,
+                     layout: LayoutMode = 'stable') -> ContextLayout:
+        """
+        Build final context and report where each section landed.
+        
+        Span ends exclude trailing whitespace, so a static section's span
+        is the same whether or not volatile sections follow it.
         
-        # Build context
-        context = ""
-        truncated = False
+        Args:
+            packing: Override the builder's packing strategy for this build
+            query: Task description to rank sections against
+            top_k: Consider at most this many sections
+            layout: Section order; defaults to 'stable' so the prefix hash
+                    is meaningful across requests
         
-        for section in sorted_sections:
-            section_str = str(section)
-            if len(context) + len(section_str) <= self.max_length:
-                context += section_str + "\n\n"
+        Returns:
+            ContextLayout with text, spans and the stable prefix hash
+        """
+        selected = self._plan(packing, query, top_k, layout)
+        return self._layout(selected)
+    
+    async def abuild(self,
+                     packing: Optional[PackingStrategy] = None,
+                     query: Optional[str] = None,
+                     top_k: Optional[int] = None,
+                     layout: Optional[LayoutMode] = None) -> Tuple[str, bool]:
+        """Async build(); use it from a running event loop with providers."""
+        selected = await self._aplan(packing, query, top_k, layout)
+        return ''.join(self._render(selected)), self.last_report.truncated
+    
+    async def abuild_layout(self,
+                            packing: Optional[PackingStrategy] = None,
+                            query: Optional[str] = None,
+                            top_k: Optional[int] = None,
+                            layout: LayoutMode = 'stable') -> ContextLayout:
+        """Async build_layout(); use it from a running event loop."""
+        selected = await self._aplan(packing, query, top_k, layout)
+        return self._layout(selected)
+    
+    def _plan(self,
+              packing: Optional[PackingStrategy],
+              query: Optional[str],
+              top_k: Optional[int],
+              layout: Optional[LayoutMode]) -> List[ContextSection]:
+        """Select, resolve providers and arrange sections for output."""
+        strategy = packing or self.packing
+        selected = self._select(strategy, query, top_k)
+        if any(isinstance(s, LazySection) for s in selected):
+            try:
+                asyncio.get_running_loop()
+            except RuntimeError:
+                fetched = asyncio.run(self._fetch(selected))
             else:
-                truncated = True
+                raise RuntimeError(
+                    "Lazy providers were selected inside a running event "
+                    "loop; use abuild() or abuild_layout() instead"
+                )
+            selected = self._reselect(strategy, query, top_k, *fetched)
+        return self._fit_tokens(selected, layout)
+    
+    async def _aplan(self,
+                     packing: Optional[PackingStrategy],
+                     query: Optional[str],
+                     top_k: Optional[int],
+                     layout: Optional[LayoutMode]) -> List[ContextSection]:
+        """Async _plan()."""
+        strategy = packing or self.packing
+        selected = self._select(strategy, query, top_k)
+        if any(isinstance(s, LazySection) for s in selected):
+            fetched = await self._fetch(selected)
+            selected = self._reselect(strategy, query, top_k, *fetched)
+        return self._fit_tokens(selected, layout)
+    
+    async def _fetch(self,
+                     selected: Sequence[ContextSection]
+                     ) -> Tuple[Dict[str, ContextSection], List[DroppedSection]]:
+        """
+        Resolve the selected lazy sections concurrently.
+        
+        Plain callables run on a pool owned by this call, which is shut
+        down without waiting: a provider that overruns its timeout keeps
+        its thread until it returns, but the build does not wait for it.
+        
+        Returns:
+            (resolved sections by title, drop records for failed providers)
+        """
+        limit = asyncio.Semaphore(self.PROVIDER_CONCURRENCY)
+        loop = asyncio.get_running_loop()
+        lazies = [s for s in selected if isinstance(s, LazySection)]
+        blocking = sum(not inspect.iscoroutinefunction(s.provider)
+                       for s in lazies)
+        # One thread per blocking provider, so providers that overran
+        # their timeout cannot hold up the ones queued after them
+        pool = (concurrent.futures.ThreadPoolExecutor(
+                    max_workers=blocking, thread_name_prefix='context-provider')
+                if blocking else None)
+        
+        async def resolve(lazy: LazySection) -> Union[str, BaseException]:
+            timeout = lazy.timeout if lazy.timeout is not None \
+                else self.PROVIDER_TIMEOUT
+            async with limit:
+                try:
+                    if inspect.iscoroutinefunction(lazy.provider):
+                        pending = lazy.provider()
+                    else:
+                        pending = loop.run_in_executor(pool, lazy.provider)
+                    content = await asyncio.wait_for(pending, timeout)
+                    if inspect.isawaitable(content):
+                        content = await asyncio.wait_for(content, timeout)
+                    return str(content)
+                except Exception as exc:  # reported, never raised
+                    return exc
+        
+        try:
+            results = await asyncio.gather(*(resolve(s) for s in lazies))
+        finally:
+            if pool is not None:
+                pool.shutdown(wait=False, cancel_futures=True)
+        resolved: Dict[str, ContextSection] = {}
+        failed: List[DroppedSection] = []
+        for lazy, result in zip(lazies, results):
+            if isinstance(result, asyncio.TimeoutError):
+                failed.append(DroppedSection(
+                    lazy.title, lazy.priority, 0, 'provider_timeout',
+                    'provider did not answer in time'
+                ))
+            elif isinstance(result, BaseException):
+                failed.append(DroppedSection(
+                    lazy.title, lazy.priority, 0, 'provider_error',
+                    f'{type(result).__name__}: {result}'
+                ))
+            else:
+                resolved[lazy.title] = ContextSection(
+                    lazy.title, result, lazy.priority, lazy.trim, lazy.volatile)
+        return resolved, failed
+    
+    def _reselect(self,
+                  strategy: PackingStrategy,
+                  query: Optional[str],
+                  top_k: Optional[int],
+                  resolved: Dict[str, ContextSection],
+                  failed: List[DroppedSection]) -> List[ContextSection]:
+        """
+        Select again with resolved provider content in place.
+        
+        Providers that were not selected the first time (or failed) stay
+        out; the rest now compete with their real size, so a provider
+        that returned more than its size_hint may still be trimmed or
+        dropped.
+        """
+        first = self.last_report
+        pool = []
+        for section in self.sections.values():
+            if isinstance(section, LazySection):
+                section = resolved.get(section.title)
+                if section is None:
+                    continue
+            pool.append(section)
+        selected = self._select(strategy, query, top_k, pool)
+        left_out = [d for d in first.dropped
+                    if isinstance(self.sections.get(d.title), LazySection)]
+        self.last_report.dropped.extend(left_out + failed)
+        return selected
+    
+    def _fit_tokens(self,
+                    selected: List[ContextSection],
+                    layout: Optional[LayoutMode]) -> List[ContextSection]:
+        """
+        Arrange selected sections and enforce a token budget exactly.
+        
+        Selection adds up per-section token counts, but tokenizers are
+        not additive where sections are joined. For token budgets the
+        arranged text is counted once; if it is over max_length, the
+        least valuable sections are dropped in one cut, sized by how far
+        the per-section estimate was off, and the result is counted
+        again. used_tokens then holds the count of the text emitted.
+        """
+        arranged = self._arrange(selected, layout)
+        if self.unit != 'tokens' or not arranged:
+            return arranged
+        report = self.last_report
+        by_value = list(selected)  # selection order: most valuable first
+        # Uncached: a joined text is never counted twice, and caching it
+        # would push per-section counts out of the shared cache
+        count = self.tokenizer.tokenizer.count
+        used = count(''.join(self._render(arranged)))
+        while used > self.max_length and by_value:
+            estimate = report.used_tokens
+            target = self.max_length * estimate / used
+            victims = []
+            while by_value and (estimate > target or not victims):
+                victim = by_value.pop()
+                estimate -= report.sizes[victim.title] + self._separator_tokens
+                victims.append(victim)
+            for victim in victims:
+                title = victim.title
+                report.included.remove(title)
+                if title in report.trimmed:
+                    report.trimmed.remove(title)
+                report.total_weight -= report._values.pop(title)
+                report.used_length -= victim.length + len(SEPARATOR)
+                report.dropped.append(DroppedSection(
+                    title, victim.priority, victim.length, 'budget_exhausted',
+                    f'joined text came to {used} tokens > max_length '
+                    f'{self.max_length}'
+                ))
+                del report.sizes[title]
+            gone = set(map(id, victims))
+            arranged = [s for s in arranged if id(s) not in gone]
+            report.used_tokens = estimate
+            used = count(''.join(self._render(arranged))) if arranged else 0
+        if not arranged:
+            report.used_length = 0
+        report.used_tokens = used
+        return arranged
+    
+    def _layout(self, selected: List[ContextSection]) -> ContextLayout:
+        """Render arranged sections and compute spans and prefix hash."""
+        spans = self._spans(selected)
+        text = ''.join(self._render(selected))
+        
+        # Only the leading run of static sections forms a reusable prefix
+        prefix_end = 0
+        for span in spans:
+            if span.volatile:
                 break
+            prefix_end = span.end
+        prefix_hash = hashlib.sha256(text[:prefix_end].encode('utf-8')).hexdigest()
+        return ContextLayout(text, self.last_report.truncated, spans,
+                             prefix_end, prefix_hash)
+    
+    @staticmethod
+    def _spans(selected: Sequence[ContextSection]) -> List[SectionSpan]:
+        """Offsets of arranged sections in the rendered text."""
+        spans = []
+        position = 0
+        for i, section in enumerate(selected):
+            if i:
+                position += len(SEPARATOR)
+            rendered = str(section)
+            end = position + len(rendered.rstrip())
+            spans.append(SectionSpan(section.title, position, end,
+                                     section.volatile, section.digest))
+            position += len(rendered)
+        return spans
+    
+    def session(self, layout: LayoutMode = 'stable') -> 'ContextSession':
+        """Start a multi-turn session that reports per-turn changes."""
+        return ContextSession(self, layout)
+    
+    def _arrange(self,
+                 selected: List[ContextSection],
+                 layout: Optional[LayoutMode]) -> List[ContextSection]:
+        """
+        Order selected sections for output.
         
-        return context.strip(), truncated
+        'priority' keeps selection order (most valuable first). 'stable'
+        emits static sections by priority weight then title, so the same
+        static set always renders identically, followed by volatile
+        sections in selection order.
+        """
+        layout = layout or self.layout
+        if layout == 'priority':
+            return selected
+        if layout != 'stable':
+            raise ValueError(f"Unknown layout: {layout!r}")
+        weights = self.PRIORITY_WEIGHTS
+        static = sorted(
+            (s for s in selected if not s.volatile),
+            key=lambda s: (-weights[s.priority], s.title)
+        )
+        return static + [s for s in selected if s.volatile]
     
-    def get_stats(self) -> dict:
-        """Get builder statistics."""
-        return {
-            'sections': len(self.sections),
-            'total_length': sum(len(str(s)) for s in self.sections.values()),
-            'within_limit': all(
-                len(str(s)) for s in self.sections.values()
+    @staticmethod
+    def _render(selected: Sequence[ContextSection]) -> Iterator[str]:
+        """
+        Yield rendered sections joined by SEPARATOR.
+        
+        Matches the old strip() of the whole string: a rendered section
+        always starts with its heading, so only the tail of the last
+        section can carry whitespace that needs removing.
+        """
+        last = len(selected) - 1
+        for i, section in enumerate(selected):
+            if i < last:
+                yield str(section)
+                yield SEPARATOR
+            else:
+                yield str(section).rstrip()
+    
+    def _select(self,
+                strategy: PackingStrategy,
+                query: Optional[str] = None,
+                top_k: Optional[int] = None,
+                pool: Optional[Sequence[ContextSection]] = None
+                ) -> List[ContextSection]:
+        """
+        Choose the sections to emit and record a BuildReport.
+        
+        Args:
+            strategy: Packing strategy
+            query: Optional task description to rank against
+            top_k: Optional cap on the number of candidates
+            pool: Candidate sections; defaults to all held sections
+        """
+        if strategy not in _PACKERS:
+            raise ValueError(f"Unknown packing strategy: {strategy!r}")
+        report = BuildReport(strategy=strategy)
+        weights = self.PRIORITY_WEIGHTS
+        if pool is None:
+            pool = list(self.sections.values())
+        if self.dedup:
+            pool = self._drop_duplicates(pool, report)
+        
+        if query is None:
+            # Sort by priority
+            sorted_sections = sorted(
+                pool,
+                key=lambda s: weights[s.priority],
+                reverse=True
             )
+            values = [weights[s.priority] for s in sorted_sections]
+        else:
+            relevance = self.relevance(query)
+            mix = self.RELEVANCE_WEIGHT
+            scored = []
+            for section in pool:
+                score = relevance.get(section.title)
+                if score is None and section.priority != 'high':
+                    report.dropped.append(DroppedSection(
+                        section.title, section.priority, section.length,
+                        'not_relevant', 'no terms in common with the query'
+                    ))
+                    continue
+                value = weights[section.priority] * (1 - mix + mix * (score or 0))
+                scored.append((value, section))
+            scored.sort(key=lambda item: item[0], reverse=True)
+            sorted_sections = [section for _, section in scored]
+            values = [value for value, _ in scored]
+        
+        if top_k is not None and len(sorted_sections) > top_k:
+            for section in sorted_sections[top_k:]:
+                report.dropped.append(DroppedSection(
+                    section.title, section.priority, section.length,
+                    'below_top_k', f'not among the top {top_k} sections'
+                ))
+            sorted_sections = sorted_sections[:top_k]
+            values = values[:top_k]
+        
+        if (strategy == 'optimal'
+                and len(sorted_sections) > self.OPTIMAL_MAX_SECTIONS):
+            strategy = report.strategy = 'greedy'
+        
+        # Every section pays for the separator that follows it; the last
+        # separator is never emitted, so the capacity gets it back.
+        separator = self._separator_size
+        sizes = [self._size(s) for s in sorted_sections]
+        costs = [size + separator for size in sizes]
+        capacity = self.max_length + separator
+        chosen = set(_PACKERS[strategy](costs, values, capacity))
+        
+        # Spend what is left on shortened copies of trimmable sections,
+        # most valuable first
+        remaining = capacity - sum(costs[i] for i in chosen)
+        trimmed: Dict[int, ContextSection] = {}
+        for i, section in enumerate(sorted_sections):
+            if (i in chosen or section.trim == 'never'
+                    or isinstance(section, LazySection)):
+                continue
+            copy = self._trim_to(section, remaining - separator)
+            if copy is not None:
+                trimmed[i] = copy
+                remaining -= self._size(copy) + separator
+        
+        selected = []
+        for i, section in enumerate(sorted_sections):
+            if i in chosen or i in trimmed:
+                if i in trimmed:
+                    section = trimmed[i]
+                    report.trimmed.append(section.title)
+                selected.append(section)
+                report.included.append(section.title)
+                report.sizes[section.title] = self._size(section)
+                report._values[section.title] = values[i]
+                report.used_length += section.length + len(SEPARATOR)
+                report.used_tokens += (section.token_count(self.tokenizer)
+                                       + self._separator_tokens)
+                report.total_weight += values[i]
+            elif sizes[i] > self.max_length:
+                report.dropped.append(DroppedSection(
+                    section.title, section.priority, section.length,
+                    'exceeds_budget',
+                    f'{sizes[i]} {self.unit} > max_length {self.max_length}'
+                ))
+            else:
+                report.dropped.append(DroppedSection(
+                    section.title, section.priority, section.length,
+                    'budget_exhausted',
+                    f'{sizes[i]} {self.unit} did not fit next to '
+                    f'higher-value sections'
+                ))
+        if selected:
+            report.used_length -= len(SEPARATOR)
+            report.used_tokens -= self._separator_tokens
+        self.last_report = report
+        return selected
+    
+    def _drop_duplicates(self,
+                         pool: Sequence[ContextSection],
+                         report: BuildReport) -> List[ContextSection]:
+        """
+        Keep one copy of each group of near-duplicate sections.
+        
+        The highest-priority copy wins, earlier sections on ties.
+        Signatures are cached on the sections and matched through LSH
+        buckets, so unchanged sections cost nothing to re-check.
+        """
+        weights = self.PRIORITY_WEIGHTS
+        preferred = sorted(pool, key=lambda s: weights[s.priority],
+                           reverse=True)
+        duplicates = find_near_duplicates(
+            [(s, None if isinstance(s, LazySection) else s.sketch)
+             for s in preferred],
+            self.DEDUP_THRESHOLD, DEFAULT_HASHER
+        )
+        if not duplicates:
+            return list(pool)
+        dropped = set()
+        for i, (kept, similarity) in duplicates.items():
+            section = preferred[i]
+            dropped.add(id(section))
+            report.dropped.append(DroppedSection(
+                section.title, section.priority, section.length, 'duplicate',
+                f'~{similarity:.0%} similar to {preferred[kept].title!r}'
+            ))
+        return [s for s in pool if id(s) not in dropped]
+    
+    def _trim_to(self,
+                 section: ContextSection,
+                 allowance: int) -> Optional[ContextSection]:
+        """
+        Shortened copy of section whose size is within allowance.
+        
+        Token budgets are converted to a character limit from the
+        section's own chars-per-token ratio and tightened until the copy
+        fits, which normally takes one or two tries.
+        """
+        header = len(section.heading)
+        if self.unit == 'chars':
+            limit = allowance - header
+        else:
+            tokens = section.token_count(self.tokenizer)
+            limit = section.length * allowance // max(tokens, 1) - header
+        
+        for _ in range(4):
+            if limit < self.MIN_TRIM_CHARS:
+                return None
+            shortened = trim_content(section.content, limit, section.trim)
+            if shortened is None:
+                return None
+            copy = ContextSection(section.title, shortened, section.priority,
+                                  section.trim, section.volatile)
+            size = self._size(copy)
+            if size <= allowance:
+                return copy
+            limit = limit * allowance * 9 // (size * 10)
+        return None
+    
+    def get_stats(self) -> dict:
+        """
+        Get builder statistics.
+        
+        Token builders also report total_tokens; character builders skip
+        it so stats never tokenize every section.
+        """
+        count = len(self.sections)
+        gaps = max(count - 1, 0)
+        stats = {
+            'sections': count,
+            'total_length': self._total_length,
         }
+        if self.unit == 'tokens':
+            stats['total_tokens'] = self.total_tokens
+            size = self.total_tokens + gaps * self._separator_tokens
+        else:
+            size = self._total_length + gaps * len(SEPARATOR)
+        stats['within_limit'] = size <= self.max_length
+        return stats
     
     def clear(self) -> 'ContextBuilder':
         """Clear all sections."""
-        self.sections = {}
+        with self._lock:
+            if not self._forks:
+                for section in self.sections.values():
+                    section._unwatch(self)
+            self.sections = {}
+            self._sections_shared = False
+            self._total_length = 0
+            self._total_tokens = 0
+            self._index = None
+            self._index_shared = False
         return self
 
 
-def merge_contexts(contexts: List[Tuple[str, int]]) -> str:
+@dataclass
+class ContextDelta:
+    """
+    What changed in a session's context since the previous turn.
+    
+    Spans in added and changed refer to the new text, spans in removed
+    to the previous one. Everything before common_prefix is identical in
+    both texts, so a transport can resend only text[common_prefix:].
+    """
+    added: List[SectionSpan]
+    removed: List[SectionSpan]
+    changed: List[Tuple[SectionSpan, SectionSpan]]
+    unchanged: List[str]
+    spans: List[SectionSpan]
+    common_prefix: int
+    truncated: bool
+    _sections: List[ContextSection] = field(repr=False, default_factory=list)
+    
+    @property
+    def has_changes(self) -> bool:
+        return bool(self.added or self.removed or self.changed)
+    
+    @property
+    def text(self) -> str:
+        """Full context text, rendered on first access."""
+        text = self.__dict__.get('_text')
+        if text is None:
+            text = self.__dict__['_text'] = ''.join(
+                ContextBuilder._render(self._sections))
+        return text
+
+
+class ContextSession:
+    """
+    Builds a context turn after turn and diffs each turn's layout.
+    
+    Sections are matched by title and compared by digest, which is
+    cached on each section, so a turn in which little changed costs
+    little more than selection. The full text is only rendered when
+    ContextDelta.text is read.
+    """
+    
+    def __init__(self, builder: ContextBuilder, layout: LayoutMode = 'stable'):
+        """
+        Initialize session.
+        
+        Args:
+            builder: Builder whose sections make up the context
+            layout: Section order; 'stable' keeps unchanged sections in
+                    place between turns
+        """
+        self.builder = builder
+        self.layout = layout
+        self.turns = 0
+        self._previous: List[SectionSpan] = []
+    
+    def build(self,
+              packing: Optional[PackingStrategy] = None,
+              query: Optional[str] = None,
+              top_k: Optional[int] = None) -> ContextDelta:
+        """Build this turn's context and diff it against the last turn."""
+        selected = self.builder._plan(packing, query, top_k, self.layout)
+        return self._advance(selected)
+    
+    async def abuild(self,
+                     packing: Optional[PackingStrategy] = None,
+                     query: Optional[str] = None,
+                     top_k: Optional[int] = None) -> ContextDelta:
+        """Async build(), for builders with lazy providers."""
+        selected = await self.builder._aplan(packing, query, top_k, self.layout)
+        return self._advance(selected)
+    
+    def reset(self) -> None:
+        """Forget the previous turn; the next delta adds everything."""
+        self._previous = []
+        self.turns = 0
+    
+    def _advance(self, selected: List[ContextSection]) -> ContextDelta:
+        spans = self.builder._spans(selected)
+        previous = {span.title: span for span in self._previous}
+        current = {span.title: span for span in spans}
+        
+        added, changed, unchanged = [], [], []
+        for span in spans:
+            old = previous.get(span.title)
+            if old is None:
+                added.append(span)
+            elif old.digest != span.digest:
+                changed.append((old, span))
+            else:
+                unchanged.append(span.title)
+        removed = [span for span in self._previous if span.title not in current]
+        
+        common = 0
+        for old, new in zip(self._previous, spans):
+            if (old.title, old.digest, old.start) != (new.title, new.digest,
+                                                      new.start):
+                break
+            common = new.end
+        
+        self._previous = spans
+        self.turns += 1
+        return ContextDelta(added, removed, changed, unchanged, spans, common,
+                            self.builder.last_report.truncated, selected)
+
+
+def merge_contexts(contexts: List[Tuple[str, int]],
+                   max_length: Optional[int] = None,
+                   tokenizer: Union[str, Tokenizer, None] = None) -> str:
     """
     Merge multiple contexts by priority.
     
     Args:
         contexts: List of (content, priority) tuples
+        max_length: Optional budget; lower-priority contexts that would
+                    exceed it are left out
+        tokenizer: Measure max_length in tokens with this tokenizer
+                   instead of in characters
     
     Returns:
         Merged context string
@@ -126,7 +1647,133 @@ def merge_contexts(contexts: List[Tuple[str, int]]) -> str:
     sorted_contexts = sorted(contexts, key=lambda x: x[1], reverse=True)
     
     # Merge
-    return "\n\n".join(content for content, _ in sorted_contexts)
+    return SEPARATOR.join(merge_context_streams(
+        sorted_contexts, max_length=max_length, tokenizer=tokenizer
+    ))
+
+
+class _MergeBudget:
+    """Running budget for merged contexts, separators included."""
+    
+    def __init__(self,
+                 max_length: Optional[int],
+                 tokenizer: Union[str, Tokenizer, None]):
+        self.tokenizer = None if tokenizer is None else get_tokenizer(tokenizer)
+        self.remaining = max_length
+        self.separator = self._size(SEPARATOR)
+        self.first = True
+    
+    def _size(self, text: str) -> int:
+        if self.tokenizer is None:
+            return len(text)
+        return self.tokenizer.count(text)
+    
+    @property
+    def full(self) -> bool:
+        """True when not even a separator plus one unit still fits."""
+        return self.remaining is not None and self.remaining <= self.separator
+    
+    def take(self, content: str) -> bool:
+        """Charge content against the budget if it fits."""
+        if self.remaining is None:
+            return True
+        cost = self._size(content) + (0 if self.first else self.separator)
+        if cost > self.remaining:
+            return False
+        self.remaining -= cost
+        self.first = False
+        return True
+
+
+def merge_context_streams(*streams: Iterable[Tuple[str, int]],
+                          max_length: Optional[int] = None,
+                          tokenizer: Union[str, Tokenizer, None] = None,
+                          on_overflow: Literal['stop', 'skip'] = 'stop'
+                          ) -> Iterator[str]:
+    """
+    Lazily merge priority-ordered context streams within a budget.
+    
+    Each stream must yield (content, priority) tuples in descending
+    priority order. Only one pending item per stream is held at a time
+    (a k-way heap merge), and no stream is pulled from again once the
+    budget is full. Equal priorities keep stream order, then arrival
+    order, so merging is stable.
+    
+    Args:
+        *streams: Iterables of (content, priority) tuples
+        max_length: Budget for the merged text joined with SEPARATOR;
+                    None means unlimited
+        tokenizer: Measure max_length in tokens with this tokenizer
+                   instead of in characters
+        on_overflow: 'stop' ends the merge at the first context that does
+                     not fit; 'skip' leaves it out and keeps trying smaller
+                     ones until the budget is full or streams run dry
+    
+    Yields:
+        Context contents in merged order; join them with SEPARATOR
+    """
+    budget = _MergeBudget(max_length, tokenizer)
+    iterators = [iter(stream) for stream in streams]
+    heap: List[Tuple[float, int, int, str]] = []
+    
+    def pull(index: int, seq: int) -> None:
+        for content, priority in iterators[index]:
+            heapq.heappush(heap, (-priority, index, seq, content))
+            return
+    
+    for index in range(len(iterators)):
+        pull(index, 0)
+    while heap:
+        _, index, seq, content = heapq.heappop(heap)
+        if budget.take(content):
+            yield content
+        elif on_overflow == 'stop':
+            return
+        if budget.full:
+            return
+        pull(index, seq + 1)
+
+
+async def amerge_context_streams(
+        *streams: Union[AsyncIterable[Tuple[str, int]], Iterable[Tuple[str, int]]],
+        max_length: Optional[int] = None,
+        tokenizer: Union[str, Tokenizer, None] = None,
+        on_overflow: Literal['stop', 'skip'] = 'stop') -> AsyncIterator[str]:
+    """
+    Async version of merge_context_streams().
+    
+    Accepts async and plain iterables. The first item of every stream is
+    awaited concurrently; afterwards only the stream whose item was just
+    emitted is awaited, so slow producers are not polled needlessly.
+    """
+    budget = _MergeBudget(max_length, tokenizer)
+    iterators = [
+        stream.__aiter__() if hasattr(stream, '__aiter__') else iter(stream)
+        for stream in streams
+    ]
+    heap: List[Tuple[float, int, int, str]] = []
+    
+    async def pull(index: int, seq: int) -> None:
+        iterator = iterators[index]
+        try:
+            if hasattr(iterator, '__anext__'):
+                content, priority = await iterator.__anext__()
+            else:
+                content, priority = next(iterator)
+        except (StopIteration, StopAsyncIteration):
+            return
+        heapq.heappush(heap, (-priority, index, seq, content))
+    
+    await asyncio.gather(*(pull(index, 0) for index in range(len(iterators))))
+    while heap:
+        _, index, seq, content = heapq.heappop(heap)
+        if budget.take(content):
+            yield content
+        elif on_overflow == 'stop':
+            return
+        if budget.full:
+            return
+        await pull(index, seq + 1)
 
 
 # Example usage
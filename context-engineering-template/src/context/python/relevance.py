@@ -0,0 +1,200 @@
+"""
+Python Relevance Index - Language Agnostic Implementation
+
+Incrementally maintained inverted index with BM25 scoring, used to rank
+context sections against a task description.
+"""
+
+import math
+import re
+from array import array
+from collections import Counter
+from typing import Dict, List, Optional, Set, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; scoring falls back to pure Python
+    np = None
+
+
+_TERM = re.compile(r"[^\W_]+")
+
+
+def terms(text: str) -> List[str]:
+    """Split text into lowercase index terms."""
+    return _TERM.findall(text.lower())
+
+
+class InvertedIndex:
+    """
+    BM25 index over documents identified by string keys.
+    
+    Documents can be added, replaced and removed at any time; only the
+    postings of the affected terms are touched. With NumPy installed,
+    scoring runs one vectorized update per query term over that term's
+    postings; otherwise an equivalent dict-based loop is used.
+    
+    copy() is copy-on-write at the level of individual posting lists, so
+    copying a large index and adding a few documents to the copy only
+    duplicates the posting lists of the terms those documents contain.
+    """
+    
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        """
+        Initialize index.
+        
+        Args:
+            k1: BM25 term-frequency saturation
+            b: BM25 document-length normalization (0-1)
+        """
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, Dict[int, int]] = {}
+        # Terms whose posting dict belongs to this index alone
+        self._owned: Set[str] = set()
+        self._doc_terms: Dict[int, Counter] = {}
+        self._ids: Dict[str, int] = {}
+        self._keys: List[Optional[str]] = []
+        self._free: List[int] = []
+        self._doc_len = array('d')
+        self._total_len = 0.0
+        # Per-term (doc ids, term frequencies) arrays for NumPy scoring
+        self._arrays: Dict[str, Tuple['np.ndarray', 'np.ndarray']] = {}
+    
+    def __len__(self) -> int:
+        return len(self._ids)
+    
+    def __contains__(self, key: str) -> bool:
+        return key in self._ids
+    
+    def copy(self) -> 'InvertedIndex':
+        """Cheap copy sharing posting lists until either side changes them."""
+        other = InvertedIndex.__new__(InvertedIndex)
+        other.k1 = self.k1
+        other.b = self.b
+        other._postings = dict(self._postings)
+        other._owned = set()
+        other._doc_terms = dict(self._doc_terms)
+        other._ids = dict(self._ids)
+        other._keys = list(self._keys)
+        other._free = list(self._free)
+        other._doc_len = array('d', self._doc_len)
+        other._total_len = self._total_len
+        other._arrays = dict(self._arrays)
+        self._owned = set()
+        return other
+    
+    def _writable(self, term: str) -> Dict[int, int]:
+        """Posting dict for term that is safe to modify in place."""
+        if term in self._owned:
+            return self._postings[term]
+        postings = dict(self._postings.get(term, ()))
+        self._postings[term] = postings
+        self._owned.add(term)
+        return postings
+    
+    def add(self, key: str, text: str) -> None:
+        """Index text under key, replacing any previous document."""
+        if key in self._ids:
+            self.remove(key)
+        if self._free:
+            doc = self._free.pop()
+            self._keys[doc] = key
+        else:
+            doc = len(self._keys)
+            self._keys.append(key)
+            self._doc_len.append(0.0)
+        self._ids[key] = doc
+        
+        counts = Counter(terms(text))
+        self._doc_terms[doc] = counts
+        length = sum(counts.values())
+        self._doc_len[doc] = length
+        self._total_len += length
+        for term, tf in counts.items():
+            self._writable(term)[doc] = tf
+            self._arrays.pop(term, None)
+    
+    def remove(self, key: str) -> None:
+        """Remove a document; unknown keys are ignored."""
+        doc = self._ids.pop(key, None)
+        if doc is None:
+            return
+        for term in self._doc_terms.pop(doc):
+            postings = self._writable(term)
+            del postings[doc]
+            if not postings:
+                del self._postings[term]
+                self._owned.discard(term)
+            self._arrays.pop(term, None)
+        self._total_len -= self._doc_len[doc]
+        self._doc_len[doc] = 0.0
+        self._keys[doc] = None
+        self._free.append(doc)
+    
+    def clear(self) -> None:
+        """Remove all documents."""
+        self.__init__(self.k1, self.b)
+    
+    def scores(self, query: str) -> Dict[str, float]:
+        """
+        BM25 score of every document matching at least one query term.
+        
+        Returns:
+            Mapping of key to score; documents without matches are absent
+        """
+        if not self._ids:
+            return {}
+        query_terms = Counter(t for t in terms(query) if t in self._postings)
+        if not query_terms:
+            return {}
+        if np is not None:
+            return self._scores_numpy(query_terms)
+        return self._scores_python(query_terms)
+    
+    def search(self, query: str, top_k: Optional[int] = None) -> List[Tuple[str, float]]:
+        """Documents ranked by BM25 score, best first."""
+        ranked = sorted(self.scores(query).items(),
+                        key=lambda item: (-item[1], item[0]))
+        return ranked if top_k is None else ranked[:top_k]
+    
+    def _idf(self, term: str) -> float:
+        df = len(self._postings[term])
+        return math.log(1 + (len(self._ids) - df + 0.5) / (df + 0.5))
+    
+    def _scores_python(self, query_terms: Counter) -> Dict[str, float]:
+        k1, b = self.k1, self.b
+        avgdl = self._total_len / len(self._ids) or 1.0
+        scores: Dict[int, float] = {}
+        for term, qtf in query_terms.items():
+            idf = self._idf(term) * qtf
+            for doc, tf in self._postings[term].items():
+                norm = k1 * (1 - b + b * self._doc_len[doc] / avgdl)
+                scores[doc] = (scores.get(doc, 0.0)
+                               + idf * tf * (k1 + 1) / (tf + norm))
+        return {self._keys[doc]: score for doc, score in scores.items()}
+    
+    def _postings_arrays(self, term: str) -> Tuple['np.ndarray', 'np.ndarray']:
+        cached = self._arrays.get(term)
+        if cached is None:
+            postings = self._postings[term]
+            cached = (
+                np.fromiter(postings.keys(), dtype=np.intp, count=len(postings)),
+                np.fromiter(postings.values(), dtype=np.float64,
+                            count=len(postings)),
+            )
+            self._arrays[term] = cached
+        return cached
+    
+    def _scores_numpy(self, query_terms: Counter) -> Dict[str, float]:
+        k1, b = self.k1, self.b
+        doc_len = np.frombuffer(self._doc_len, dtype=np.float64)
+        avgdl = self._total_len / len(self._ids) or 1.0
+        scores = np.zeros(len(doc_len))
+        for term, qtf in query_terms.items():
+            ids, tfs = self._postings_arrays(term)
+            norm = k1 * (1 - b + b * doc_len[ids] / avgdl)
+            scores[ids] += self._idf(term) * qtf * tfs * (k1 + 1) / (tfs + norm)
+        matched = np.flatnonzero(scores)
+        keys = self._keys
+        return {keys[doc]: float(scores[doc]) for doc in matched.tolist()}
@@ -0,0 +1,161 @@
+"""
+Python Similarity Sketches - Language Agnostic Implementation
+
+Compact MinHash sketches and LSH banding for spotting near-duplicate
+context sections without comparing every pair.
+"""
+
+import hashlib
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, TypeVar
+
+from relevance import terms
+
+
+T = TypeVar('T')
+
+_EMPTY = (1 << 64) - 1
+
+
+def _hash64(shingle: str) -> int:
+    return int.from_bytes(
+        hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest(),
+        'little'
+    )
+
+
+class MinHasher:
+    """
+    One-permutation MinHash over word shingles.
+    
+    Every shingle is hashed once; the top bits of the hash pick one of
+    num_bins bins and the rest is a value whose minimum is kept per bin.
+    Empty bins borrow the value of the next non-empty bin (rotation
+    densification) so every position of the signature is usable for
+    banding. The fraction of equal positions between two signatures
+    estimates the Jaccard similarity of their shingle sets, at O(words)
+    cost per text instead of O(words * num_bins).
+    
+    Texts shorter than short_words are shingled word by word: one edited
+    word changes up to shingle_size of their few shingles, which would
+    put even close copies of a sentence or two below a usual threshold.
+    """
+    
+    def __init__(self,
+                 num_bins: int = 64,
+                 shingle_size: int = 3,
+                 bands: int = 16,
+                 short_words: int = 32):
+        """
+        Initialize hasher.
+        
+        Args:
+            num_bins: Signature length; must be a power of two
+            shingle_size: Words per shingle
+            bands: LSH bands; must divide num_bins. More bands find
+                   candidates at lower similarity.
+            short_words: Texts with fewer words use one-word shingles
+        """
+        if num_bins & (num_bins - 1) or num_bins < 2:
+            raise ValueError("num_bins must be a power of two")
+        if num_bins % bands:
+            raise ValueError("bands must divide num_bins")
+        self.num_bins = num_bins
+        self.shingle_size = shingle_size
+        self.short_words = short_words
+        self.bands = bands
+        self.rows = num_bins // bands
+        self._shift = 64 - (num_bins.bit_length() - 1)
+        self._mask = (1 << self._shift) - 1
+    
+    def sketch(self, text: str) -> Optional[Tuple[int, ...]]:
+        """
+        Signature of text, or None for text without any words.
+        """
+        words = terms(text)
+        if not words:
+            return None
+        size = self.shingle_size if len(words) >= self.short_words else 1
+        if len(words) <= size:
+            shingles: Iterable[str] = (' '.join(words),)
+        else:
+            shingles = {' '.join(words[i:i + size])
+                        for i in range(len(words) - size + 1)}
+        
+        bins = [_EMPTY] * self.num_bins
+        shift, mask = self._shift, self._mask
+        for shingle in shingles:
+            h = _hash64(shingle)
+            slot = h >> shift
+            value = h & mask
+            if value < bins[slot]:
+                bins[slot] = value
+        
+        # Rotation densification: fill empty bins from the right
+        n = self.num_bins
+        filled = [i for i, v in enumerate(bins) if v != _EMPTY]
+        if len(filled) < n:
+            nxt = filled[0]
+            for i in range(n - 1, -1, -1):
+                if bins[i] != _EMPTY:
+                    nxt = i
+                else:
+                    distance = (nxt - i) % n
+                    bins[i] = bins[nxt] + distance * (mask + 1)
+        return tuple(bins)
+    
+    @staticmethod
+    def similarity(a: Sequence[int], b: Sequence[int]) -> float:
+        """Estimated Jaccard similarity of two signatures."""
+        return sum(x == y for x, y in zip(a, b)) / len(a)
+    
+    def band_keys(self, signature: Sequence[int]) -> List[Tuple[int, Tuple[int, ...]]]:
+        """LSH bucket keys, one per band."""
+        rows = self.rows
+        return [(band, tuple(signature[band * rows:(band + 1) * rows]))
+                for band in range(self.bands)]
+
+
+def find_near_duplicates(items: Sequence[Tuple[T, Optional[Tuple[int, ...]]]],
+                         threshold: float,
+                         hasher: 'MinHasher') -> Dict[int, Tuple[int, float]]:
+    """
+    Mark items that nearly duplicate an earlier item.
+    
+    Items are visited in the given order, which should be most preferred
+    first. An item is only compared with earlier kept items that share at
+    least one LSH bucket with it, so the expected cost is linear in the
+    number of items.
+    
+    Args:
+        items: (payload, signature) pairs; a None signature never matches
+        threshold: Minimum estimated similarity to count as a duplicate
+        hasher: The MinHasher that produced the signatures
+    
+    Returns:
+        Mapping of duplicate index to (kept index, similarity)
+    """
+    buckets: Dict[Tuple[int, Tuple[int, ...]], List[int]] = {}
+    duplicates: Dict[int, Tuple[int, float]] = {}
+    for i, (_, signature) in enumerate(items):
+        if signature is None:
+            continue
+        keys = hasher.band_keys(signature)
+        best: Optional[Tuple[int, float]] = None
+        seen = set()
+        for key in keys:
+            for j in buckets.get(key, ()):
+                if j in seen:
+                    continue
+                seen.add(j)
+                score = hasher.similarity(signature, items[j][1])
+                if score >= threshold and (best is None or score > best[1]):
+                    best = (j, score)
+        if best is not None:
+            duplicates[i] = best
+            continue
+        for key in keys:
+            buckets.setdefault(key, []).append(i)
+    return duplicates
+
+
+DEFAULT_HASHER = MinHasher()
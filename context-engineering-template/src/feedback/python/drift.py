@@ -0,0 +1,118 @@
+"""
+Python Drift Detection - Language Agnostic Implementation
+
+Online detection of latency regressions, cheap enough to run on every
+recorded execution.
+"""
+
+import math
+from typing import Optional
+
+
+class DriftDetector:
+    """
+    EWMA baseline with a one-sided CUSUM test on log latency.
+    
+    Latencies are compared on a log scale, so a tool going from 40ms to
+    120ms counts the same as one going from 400ms to 1200ms. The first
+    `warmup` values set the baseline mean and variance; after that a slow
+    EWMA tracks the baseline while the CUSUM sum
+    S = max(0, S + z - slack), with z the standardized deviation of each
+    value, accumulates evidence of an upward shift. The baseline adapts
+    slowly, ignores clipped outliers and holds still once S is halfway to
+    the threshold, so a regression is reported before it can become the
+    new normal. When S exceeds
+    `threshold`, and the values since S last left zero average at least
+    min_ratio times the baseline, a regression is reported and the
+    detector re-baselines at that new level.
+    
+    Each update is O(1) in time and memory.
+    """
+    
+    def __init__(self,
+                 alpha: float = 0.01,
+                 threshold: float = 8.0,
+                 slack: float = 1.0,
+                 warmup: int = 30,
+                 min_ratio: float = 1.25,
+                 min_scale: float = 0.05):
+        """
+        Initialize detector.
+        
+        Args:
+            alpha: EWMA weight of the baseline (smaller = slower)
+            threshold: CUSUM decision threshold, in standard deviations
+            slack: Shift ignored per value, in standard deviations
+            warmup: Values used to set the initial baseline
+            min_ratio: Smallest recent/baseline latency ratio reported
+            min_scale: Floor of the log-latency standard deviation, so
+                       near-constant latencies do not trigger on noise
+        """
+        self.alpha = alpha
+        self.threshold = threshold
+        self.slack = slack
+        self.warmup = warmup
+        self.min_ratio = min_ratio
+        self.min_scale = min_scale
+        self.count = 0
+        self.mean = 0.0
+        self.variance = 0.0
+        self.cusum = 0.0
+        self._run_sum = 0.0
+        self._run_count = 0
+        self.alarms = 0
+    
+    @property
+    def baseline(self) -> float:
+        """Baseline latency (geometric mean, ms)."""
+        return math.exp(self.mean)
+    
+    def update(self, value: float) -> Optional[float]:
+        """
+        Add one latency (ms).
+        
+        Returns:
+            recent/baseline ratio when a regression is detected, else None
+        """
+        x = math.log(max(value, 1e-3))
+        self.count += 1
+        if self.count <= self.warmup:
+            # Welford over the warmup period
+            delta = x - self.mean
+            self.mean += delta / self.count
+            self.variance += (delta * (x - self.mean) - self.variance) / self.count
+            return None
+        
+        scale = max(math.sqrt(self.variance), self.min_scale)
+        z = (x - self.mean) / scale
+        self.cusum = max(0.0, self.cusum + z - self.slack)
+        if self.cusum:
+            self._run_sum += x
+            self._run_count += 1
+        else:
+            self._run_sum = 0.0
+            self._run_count = 0
+        
+        # The baseline holds still while evidence of a shift builds up, and
+        # outliers are clipped so one slow call barely moves it
+        if self.cusum < self.threshold / 2:
+            delta = max(-3 * scale, min(x - self.mean, 3 * scale))
+            self.mean += self.alpha * delta
+            self.variance = (1 - self.alpha) * (self.variance
+                                                + self.alpha * delta * delta)
+        if self.cusum < self.threshold:
+            return None
+        
+        level = self._run_sum / self._run_count
+        ratio = math.exp(level - self.mean)
+        if ratio < self.min_ratio and self.cusum < 2 * self.threshold:
+            return None
+        # Re-baseline at the new level; minor shifts are accepted silently
+        self.mean = level
+        self.cusum = 0.0
+        self._run_sum = 0.0
+        self._run_count = 0
+        if ratio < self.min_ratio:
+            return None
+        self.alarms += 1
+        return ratio
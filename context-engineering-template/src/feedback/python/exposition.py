@@ -0,0 +1,179 @@
+"""
+Python Metrics Exposition - Language Agnostic Implementation
+
+Publishes a FeedbackAnalyzer's per-tool counters, latency histograms and
+token totals in the OpenMetrics text format, for Prometheus or any
+compatible scraper, from a small local HTTP endpoint or a file.
+"""
+
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional, Tuple
+
+from feedback import LATENCY_BUCKETS, FeedbackAnalyzer
+
+
+CONTENT_TYPE = 'application/openmetrics-text; version=1.0.0; charset=utf-8'
+
+
+def _label(value: str) -> str:
+    """Escape a label value."""
+    return (value.replace('\\', '\\\\').replace('"', '\\"')
+            .replace('\n', '\\n'))
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render(analyzer: FeedbackAnalyzer, prefix: str = 'context_tool') -> str:
+    """
+    OpenMetrics text for the analyzer's current aggregates.
+    
+    Args:
+        analyzer: Analyzer to expose
+        prefix: Prefix of every metric family name
+    
+    Returns:
+        Exposition ending in '# EOF'
+    """
+    tools = sorted(analyzer.tool_stats().items())
+    bounds = [_number(bound / 1000) for bound in LATENCY_BUCKETS] + ['+Inf']
+    lines: List[str] = []
+    
+    def family(name: str, kind: str, text: str, unit: str = '') -> str:
+        full = f'{prefix}_{name}'
+        lines.append(f'# TYPE {full} {kind}')
+        if unit:
+            lines.append(f'# UNIT {full} {unit}')
+        lines.append(f'# HELP {full} {text}')
+        return full
+    
+    name = family('executions', 'counter', 'Recorded executions.')
+    for tool, stats in tools:
+        lines.append(f'{name}_total{{tool="{_label(tool)}"}} {stats.times.count}')
+    name = family('successes', 'counter', 'Successful executions.')
+    for tool, stats in tools:
+        lines.append(f'{name}_total{{tool="{_label(tool)}"}} {stats.successes}')
+    name = family('context_tokens', 'counter', 'Context tokens used.')
+    for tool, stats in tools:
+        lines.append(f'{name}_total{{tool="{_label(tool)}"}} {stats.tokens}')
+    
+    name = family('execution_seconds', 'histogram', 'Execution time.', 'seconds')
+    for tool, stats in tools:
+        label = _label(tool)
+        cumulative = 0
+        for bound, count in zip(bounds, stats.histogram):
+            cumulative += count
+            lines.append(f'{name}_bucket{{tool="{label}",le="{bound}"}} '
+                         f'{cumulative}')
+        # Aggregates merged from a compacted log have no histogram, so
+        # the count can be below the executions counter
+        lines.append(f'{name}_count{{tool="{label}"}} {cumulative}')
+        lines.append(f'{name}_sum{{tool="{label}"}} '
+                     f'{_number(stats.histogram_sum / 1000)}')
+    
+    name = family('outputs', 'counter', 'Executions by output quality.')
+    for quality, count in sorted(analyzer.quality_counts().items()):
+        lines.append(f'{name}_total{{quality="{_label(quality)}"}} {count}')
+    
+    lines.append('# EOF')
+    return '\n'.join(lines) + '\n'
+
+
+class MetricsExporter:
+    """
+    Cached OpenMetrics exposition of a FeedbackAnalyzer.
+    
+    The text is rendered again only when the analyzer has recorded new
+    executions since the last render, so frequent scrapes of an idle
+    analyzer cost a version check.
+    """
+    
+    def __init__(self, analyzer: FeedbackAnalyzer, prefix: str = 'context_tool'):
+        """
+        Initialize exporter.
+        
+        Args:
+            analyzer: Analyzer to expose
+            prefix: Prefix of every metric family name
+        """
+        self.analyzer = analyzer
+        self.prefix = prefix
+        self.renders = 0
+        self._cache: Optional[Tuple[int, str]] = None
+        self._written: Optional[int] = None
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+    
+    def render(self) -> str:
+        """Current exposition, from cache when nothing changed."""
+        with self._lock:
+            version = self.analyzer.version
+            if self._cache is None or self._cache[0] != version:
+                self._cache = (version, render(self.analyzer, self.prefix))
+                self.renders += 1
+            return self._cache[1]
+    
+    def write_file(self, path: str) -> bool:
+        """
+        Write the exposition atomically, e.g. for node_exporter's
+        textfile collector.
+        
+        Returns:
+            False if nothing changed since the last write
+        """
+        version = self.analyzer.version
+        if self._written == version and os.path.exists(path):
+            return False
+        text = self.render()
+        tmp = f'{path}.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp, path)
+        self._written = version
+        return True
+    
+    def serve(self, host: str = '127.0.0.1', port: int = 9464) -> Tuple[str, int]:
+        """
+        Serve /metrics from a daemon thread.
+        
+        Args:
+            host: Interface to bind; local only by default
+            port: Port to bind; 0 picks a free one
+        
+        Returns:
+            The bound (host, port)
+        """
+        if self._server is not None:
+            return self._server.server_address[:2]
+        exporter = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?', 1)[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = exporter.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', CONTENT_TYPE)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            
+            def log_message(self, format, *args):
+                pass
+        
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever,
+                         name='metrics-exporter', daemon=True).start()
+        return self._server.server_address[:2]
+    
+    def close(self) -> None:
+        """Stop serving."""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
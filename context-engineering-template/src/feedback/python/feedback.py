@@ -4,22 +4,40 @@ Python Feedback Analyzer - Language Agnostic Implementation
 Universal feedback metrics and analysis that work across all languages.
 """
 
+from bisect import bisect_left
+from collections import deque
 from dataclasses import dataclass, field
 from datetime import datetime
-from typing import List, Literal
-from statistics import mean, stdev
+from math import sqrt
+from typing import (TYPE_CHECKING, Callable, Deque, Dict, Iterable, List, Literal,
+                    Optional, Tuple)
 
+from drift import DriftDetector
+from sinks import Backpressure, MetricsDispatcher, Sink, StdoutSink
+from sketch import WindowedSketch
+from store import MetricsStore
 
-@dataclass
+if TYPE_CHECKING:
+    from journal import MetricsLog
+
+
+PERCENTILES = (0.5, 0.9, 0.99)
+
+# Upper bounds (ms) of the cumulative latency histogram kept per tool
+LATENCY_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+@dataclass(slots=True)
 class ExecutionMetrics:
     """Standard metrics for any tool execution."""
     tool_name: str
     timestamp: float  # milliseconds since epoch
     success: bool
     execution_time: float  # milliseconds
-    context_tokens_used: int
+    context_tokens_used: int  # e.g. ContextBuilder.last_report.used_tokens
     output_quality: Literal['excellent', 'good', 'fair', 'poor']
     feedback: str = None
+    context_id: Optional[str] = None  # e.g. from ContextTuner.observe_build()
 
 
 @dataclass
@@ -31,58 +49,354 @@ class ContextAdjustment:
     impact: Literal['high', 'medium', 'low']
 
 
+@dataclass
+class RunningStats:
+    """
+    Count, mean and variance of a stream of values in O(1) per value.
+    
+    Uses Welford's update, which stays numerically stable where the
+    naive sum-of-squares formula loses precision.
+    """
+    count: int = 0
+    mean: float = 0.0
+    m2: float = 0.0
+    
+    def add(self, value: float) -> None:
+        """Fold one value into the running statistics."""
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+    
+    def merge(self, other: 'RunningStats') -> 'RunningStats':
+        """Fold in statistics of another stream (Chan et al. update)."""
+        if not other.count:
+            return self
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+        return self
+    
+    @property
+    def variance(self) -> float:
+        """Sample variance (0 for fewer than two values)."""
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+    
+    @property
+    def stdev(self) -> float:
+        """Sample standard deviation."""
+        return sqrt(self.variance)
+
+
+@dataclass
+class ToolStats:
+    """Running aggregates for one tool."""
+    times: RunningStats
+    latency: WindowedSketch
+    successes: int = 0
+    tokens: int = 0
+    drift: DriftDetector = field(default_factory=DriftDetector)
+    # Executions per LATENCY_BUCKETS bound, plus one for larger values
+    histogram: List[int] = field(
+        default_factory=lambda: [0] * (len(LATENCY_BUCKETS) + 1))
+    histogram_sum: float = 0.0
+    
+    def summary(self, now: Optional[float]) -> dict:
+        count = self.times.count
+        window = self.latency.merged(now)
+        result = {
+            'executions': count,
+            'success_rate': self.successes / count,
+            'avg_execution_time': self.times.mean,
+            'total_tokens_used': self.tokens,
+            'window_executions': window.count,
+        }
+        for q in PERCENTILES:
+            result[f'p{round(q * 100)}'] = window.quantile(q)
+        return result
+
+
 class FeedbackAnalyzer:
     """Analyzes execution metrics and provides recommendations."""
     
-    def __init__(self, success_threshold: float = 0.8):
+    def __init__(self,
+                 success_threshold: float = 0.8,
+                 capacity: int = 65536,
+                 latency_threshold: float = 1000,
+                 window_ms: float = 60_000,
+                 windows: int = 5,
+                 sinks: Optional[Iterable[Sink]] = None,
+                 max_queue: int = 10000,
+                 backpressure: Backpressure = 'block',
+                 on_alert: Optional[Callable[[ContextAdjustment], None]] = None,
+                 max_alerts: int = 100):
         """
         Initialize feedback analyzer.
         
         Args:
             success_threshold: Target success rate (0-1)
+            capacity: Most recent executions kept in the metrics store;
+                      aggregates in analyze() still cover every execution
+            latency_threshold: Execution time (ms) a tool's p99 and the
+                               overall average should stay under
+            window_ms: Length of one latency window (ms)
+            windows: Windows covered by per-tool percentiles
+            sinks: Where recorded executions are written, in batches
+                   from a background thread (drained at exit if never
+                   closed); defaults to stdout, pass [] to disable output
+            max_queue: Executions queued for the sinks before
+                       backpressure applies
+            backpressure: 'block', 'drop_oldest' or 'drop_newest'
+            on_alert: Called from record() with a ContextAdjustment as
+                      soon as a tool's latency regresses
+            max_alerts: Most recent regression alerts kept in `alerts`.
+                        analyze() only reports a tool's latest alert, and
+                        only until the tool's baseline falls back within
+                        the detector's min_ratio of its level before the
+                        regression or `windows` windows have passed.
         """
-        self.metrics: List[ExecutionMetrics] = []
+        self.store = MetricsStore(capacity)
         self.success_threshold = success_threshold
+        self.latency_threshold = latency_threshold
+        self.window_ms = window_ms
+        self.windows = windows
+        self.on_alert = on_alert
+        self.alerts: Deque[ContextAdjustment] = deque(maxlen=max_alerts)
+        # Unresolved regression per tool: (alert, baseline before it in ms,
+        # timestamp it was raised at)
+        self._open_alerts: Dict[str, Tuple[ContextAdjustment, float, float]] = {}
+        # Bumped by every change to the aggregates; keys rendered caches
+        self.version = 0
+        self._report: Optional[tuple] = None
+        sinks = [StdoutSink()] if sinks is None else list(sinks)
+        self.dispatcher = (MetricsDispatcher(sinks, max_queue=max_queue,
+                                             backpressure=backpressure)
+                           if sinks else None)
+        self._reset_totals()
+    
+    def _reset_totals(self) -> None:
+        """Zero the running aggregates kept up to date by record()."""
+        self._times = RunningStats()
+        self._successes = 0
+        self._tokens = 0
+        self._quality: Dict[str, int] = {}
+        self._tools: Dict[str, ToolStats] = {}
+        self._last_timestamp: Optional[float] = None
+        self.alerts.clear()
+        self._open_alerts = {}
+        self.version += 1
+    
+    def _tool(self, name: str) -> ToolStats:
+        stats = self._tools.get(name)
+        if stats is None:
+            stats = self._tools[name] = ToolStats(
+                RunningStats(), WindowedSketch(self.window_ms, self.windows))
+        return stats
     
     def record(self, metrics: ExecutionMetrics) -> None:
-        """Record execution metrics."""
+        """
+        Record execution metrics.
+        
+        Aggregates are updated immediately; sink output happens later on
+        the dispatcher thread, so call flush() before relying on it.
+        """
         if metrics.timestamp is None:
             metrics.timestamp = datetime.now().timestamp() * 1000
-        self.metrics.append(metrics)
-        print(f"✅ Recorded: {metrics.tool_name} "
-              f"({metrics.execution_time}ms, "
-              f"Quality: {metrics.output_quality})")
+        self._apply(metrics, alert=True)
+        if self.dispatcher is not None:
+            self.dispatcher.put(metrics)
+    
+    def _apply(self, metrics: ExecutionMetrics, alert: bool = False) -> None:
+        """
+        Fold one execution into the store and running aggregates.
+        
+        Args:
+            metrics: Execution to add
+            alert: Report latency regressions; off while replaying history
+        """
+        self.store.append(metrics.tool_name, metrics.timestamp, metrics.success,
+                          metrics.execution_time, metrics.context_tokens_used,
+                          metrics.output_quality, metrics.feedback,
+                          metrics.context_id)
+        self._times.add(metrics.execution_time)
+        self._successes += bool(metrics.success)
+        self._tokens += metrics.context_tokens_used or 0
+        quality = metrics.output_quality
+        self._quality[quality] = self._quality.get(quality, 0) + 1
+        
+        tool = self._tool(metrics.tool_name)
+        tool.times.add(metrics.execution_time)
+        tool.latency.add(metrics.execution_time, metrics.timestamp)
+        tool.successes += bool(metrics.success)
+        tool.tokens += metrics.context_tokens_used or 0
+        tool.histogram[bisect_left(LATENCY_BUCKETS, metrics.execution_time)] += 1
+        tool.histogram_sum += metrics.execution_time
+        self.version += 1
+        ratio = tool.drift.update(metrics.execution_time)
+        if ratio is not None and alert:
+            self._alert(metrics.tool_name, ratio, tool.drift.baseline,
+                        metrics.timestamp)
+        elif metrics.tool_name in self._open_alerts:
+            _, before, _ = self._open_alerts[metrics.tool_name]
+            if tool.drift.baseline < before * tool.drift.min_ratio:
+                # Recovered: back inside the band it regressed from
+                del self._open_alerts[metrics.tool_name]
+        if self._last_timestamp is None or metrics.timestamp > self._last_timestamp:
+            self._last_timestamp = metrics.timestamp
+    
+    def _alert(self, name: str, ratio: float, recent: float,
+               timestamp: float) -> None:
+        adjustment = ContextAdjustment(
+            metric='performance',
+            change=f'Investigate latency regression in {name} '
+                   f'(recent context or input changes)',
+            reason=f'{name} latency rose {ratio:.1f}x, from ~{recent / ratio:.0f}ms '
+                   f'to ~{recent:.0f}ms',
+            impact='high' if ratio >= 3 else 'medium'
+        )
+        self.alerts.append(adjustment)
+        self._open_alerts.pop(name, None)
+        self._open_alerts[name] = (adjustment, recent / ratio, timestamp)
+        if self.on_alert is not None:
+            self.on_alert(adjustment)
+    
+    def active_alerts(self) -> List[ContextAdjustment]:
+        """Regression alerts not yet resolved or aged out, oldest first."""
+        if self._last_timestamp is not None:
+            horizon = self._last_timestamp - self.window_ms * self.windows
+            for name, (_, _, raised) in list(self._open_alerts.items()):
+                if raised < horizon:
+                    del self._open_alerts[name]
+        return [alert for alert, _, _ in self._open_alerts.values()]
+    
+    def tool_stats(self) -> Dict[str, ToolStats]:
+        """Per-tool aggregates; treat the returned objects as read-only."""
+        return dict(self._tools)
+    
+    def quality_counts(self) -> Dict[str, int]:
+        """Executions per output quality label."""
+        return dict(self._quality)
+    
+    def replay(self,
+               log: 'MetricsLog',
+               start: Optional[float] = None,
+               end: Optional[float] = None) -> int:
+        """
+        Load executions from a durable MetricsLog, e.g. on startup.
+        
+        Replayed executions are not sent to the sinks again. Without a
+        start time the log's compacted aggregates are merged into the
+        totals as well.
+        
+        Args:
+            log: Log to read
+            start: Earliest timestamp (ms) to replay
+            end: Latest timestamp (ms) to replay
+        
+        Returns:
+            Number of raw executions replayed
+        """
+        if start is None:
+            self._merge_aggregates(log.aggregates()['tools'])
+        count = 0
+        for metrics in log.replay(start, end):
+            self._apply(metrics)
+            count += 1
+        return count
+    
+    def _merge_aggregates(self, tools: Dict[str, dict]) -> None:
+        for name, entry in tools.items():
+            stats = RunningStats(entry['count'], entry['mean'], entry['m2'])
+            self._times.merge(stats)
+            self._successes += entry['successes']
+            self._tokens += entry['tokens']
+            for quality, n in entry['quality'].items():
+                self._quality[quality] = self._quality.get(quality, 0) + n
+            tool = self._tool(name)
+            tool.times.merge(stats)
+            tool.successes += entry['successes']
+            tool.tokens += entry['tokens']
+        self.version += 1
+    
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until every recorded execution has reached the sinks."""
+        if self.dispatcher is None:
+            return True
+        return self.dispatcher.flush(timeout)
+    
+    def close(self) -> None:
+        """Flush and close the sinks; no records may follow."""
+        if self.dispatcher is not None:
+            self.dispatcher.close()
+    
+    @property
+    def metrics(self) -> List[ExecutionMetrics]:
+        """Retained executions, oldest first, rebuilt from the store."""
+        return [ExecutionMetrics(*row) for row in self.store]
+    
+    def analyze_window(self,
+                       tool_name: Optional[str] = None,
+                       since: Optional[float] = None) -> dict:
+        """
+        Aggregate only the executions still held in the store.
+        
+        Args:
+            tool_name: Restrict to one tool
+            since: Restrict to executions at or after this time (ms)
+        """
+        return self.store.summary(tool_name, since)
     
     def analyze(self) -> dict:
-        """Analyze all recorded metrics."""
-        if not self.metrics:
+        """
+        Analyze all recorded metrics.
+        
+        Every figure comes from aggregates that record() keeps up to
+        date, not from a pass over the metrics, so the cost depends only
+        on the number of tools. Per-tool percentiles cover the latest
+        `windows` windows of `window_ms` each.
+        """
+        count = self._times.count
+        if not count:
             return {
                 'success_rate': 0,
                 'avg_execution_time': 0,
-                'recommendations': []
+                'recommendations': [],
+                'total_executions': 0
             }
         
         # Calculate success rate
-        successes = sum(1 for m in self.metrics if m.success)
-        success_rate = successes / len(self.metrics)
+        success_rate = self._successes / count
         
         # Calculate execution time
-        times = [m.execution_time for m in self.metrics]
-        avg_time = mean(times)
+        avg_time = self._times.mean
+        
+        # Per-tool counts and latency percentiles
+        tools = {name: stats.summary(self._last_timestamp)
+                 for name, stats in self._tools.items()}
         
         # Generate recommendations
-        recommendations = self._generate_recommendations(success_rate, avg_time)
+        recommendations = self._generate_recommendations(success_rate, avg_time,
+                                                         tools)
         
         return {
             'success_rate': success_rate,
             'avg_execution_time': avg_time,
+            'stdev_execution_time': self._times.stdev,
+            'total_tokens_used': self._tokens,
+            'avg_tokens_used': self._tokens / count,
+            'quality_counts': dict(self._quality),
+            'tools': tools,
             'recommendations': recommendations,
-            'total_executions': len(self.metrics)
+            'total_executions': count
         }
     
     def _generate_recommendations(self, 
                                   success_rate: float,
-                                  avg_time: float) -> List[ContextAdjustment]:
+                                  avg_time: float,
+                                  tools: Optional[Dict[str, dict]] = None
+                                  ) -> List[ContextAdjustment]:
         """Generate optimization recommendations."""
         recommendations = []
         
@@ -103,41 +417,81 @@ class FeedbackAnalyzer:
             ))
         
         # High execution time
-        if avg_time > 1000:
+        if avg_time > self.latency_threshold:
             recommendations.append(ContextAdjustment(
                 metric='performance',
                 change='Break complex tasks into smaller steps',
-                reason=f'Avg time ({avg_time:.0f}ms) exceeds optimal threshold',
+                reason=f'Avg time ({avg_time:.0f}ms) exceeds '
+                       f'{self.latency_threshold:.0f}ms',
                 impact='medium'
             ))
         
+        # Latency regressions caught by the per-tool drift detectors
+        recommendations.extend(self.active_alerts())
+        
+        # Tail latency per tool, which the overall average hides
+        for name, stats in (tools or {}).items():
+            p50, p99 = stats['p50'], stats['p99']
+            if p99 is None or p99 <= self.latency_threshold:
+                continue
+            recommendations.append(ContextAdjustment(
+                metric='performance',
+                change=f'Reduce tail latency of {name} '
+                       f'(smaller inputs, timeouts or caching)',
+                reason=f'{name} p99 ({p99:.0f}ms) exceeds '
+                       f'{self.latency_threshold:.0f}ms (p50 {p50:.0f}ms)',
+                impact='high' if p50 > self.latency_threshold else 'medium'
+            ))
+        
         return recommendations
     
     def report(self) -> str:
-        """Generate analysis report."""
+        """
+        Generate analysis report.
+        
+        The text is cached and only rendered again after new executions
+        arrive or a threshold changes.
+        """
+        key = (self.version, self.success_threshold, self.latency_threshold)
+        if self._report is not None and self._report[0] == key:
+            return self._report[1]
         analysis = self.analyze()
         
-        report = "# Feedback Analysis Report\n\n"
-        report += "## Performance Metrics\n"
-        report += f"- Success Rate: {analysis['success_rate']:.1%}\n"
-        report += f"- Avg Execution Time: {analysis['avg_execution_time']:.0f}ms\n"
-        report += f"- Total Executions: {analysis['total_executions']}\n\n"
+        lines = ["# Feedback Analysis Report\n\n",
+                 "## Performance Metrics\n",
+                 f"- Success Rate: {analysis['success_rate']:.1%}\n",
+                 f"- Avg Execution Time: {analysis['avg_execution_time']:.0f}ms\n",
+                 f"- Total Executions: {analysis['total_executions']}\n\n"]
+        
+        if analysis.get('tools'):
+            span = self.window_ms * self.windows / 1000
+            lines.append(f"## Tool Latency (last {span:g}s)\n")
+            for name, stats in analysis['tools'].items():
+                if stats['p50'] is None:
+                    continue
+                lines.append(f"- {name}: p50 {stats['p50']:.0f}ms, "
+                             f"p90 {stats['p90']:.0f}ms, "
+                             f"p99 {stats['p99']:.0f}ms "
+                             f"({stats['window_executions']} executions)\n")
+            lines.append("\n")
         
-        report += "## Recommendations\n"
+        lines.append("## Recommendations\n")
         if not analysis['recommendations']:
-            report += "✅ Performance is optimal!\n"
+            lines.append("✅ Performance is optimal!\n")
         else:
             for rec in analysis['recommendations']:
-                report += f"\n### {rec.metric.upper()} ({rec.impact} impact)\n"
-                report += f"- **Change**: {rec.change}\n"
-                report += f"- **Reason**: {rec.reason}\n"
+                lines.append(f"\n### {rec.metric.upper()} ({rec.impact} impact)\n")
+                lines.append(f"- **Change**: {rec.change}\n")
+                lines.append(f"- **Reason**: {rec.reason}\n")
         
+        report = ''.join(lines)
+        self._report = (key, report)
         return report
     
     def reset(self) -> None:
         """Clear all metrics."""
-        self.metrics = []
-        print("🔄 Feedback analyzer reset")
+        self.store.clear()
+        self._reset_totals()
 
 
 # Example usage
@@ -174,5 +528,6 @@ if __name__ == '__main__':
     
     for exec_metrics in executions:
         analyzer.record(exec_metrics)
+    analyzer.flush()
     
     print("\n" + analyzer.report())
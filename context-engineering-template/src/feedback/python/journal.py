@@ -0,0 +1,487 @@
+"""
+Python Metrics Log - Language Agnostic Implementation
+
+Durable append-only log of execution metrics, so feedback survives
+restarts. Records are length-prefixed binary with a CRC, written in
+group commits, split into segments with a sparse time index, and
+compacted into per-tool aggregates once they age out.
+"""
+
+import atexit
+import bisect
+import json
+import os
+import struct
+import threading
+import time
+import weakref
+import zlib
+from array import array
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from feedback import ExecutionMetrics, RunningStats
+from sinks import Sink
+
+
+# Record frame: payload length, CRC-32 of payload
+_FRAME = struct.Struct('<II')
+# Payload head: timestamp, execution_time, tokens, success, then the byte
+# lengths of tool name, quality, feedback and context id (0xFFFFFFFF = None)
+_FIELDS = struct.Struct('<ddq?HHII')
+# Index entry: timestamp of the first record in a block, its offset
+_INDEX = struct.Struct('<dQ')
+_ABSENT = 0xFFFFFFFF
+
+_AGGREGATES = 'aggregates.json'
+
+# Logs still open, committed at interpreter exit. This hook runs before
+# the dispatchers' (atexit is last in, first out), whose close() then
+# commits and closes any log they still feed.
+_OPEN: 'weakref.WeakSet[MetricsLog]' = weakref.WeakSet()
+
+
+@atexit.register
+def _commit_open() -> None:
+    for log in list(_OPEN):
+        try:
+            log.flush()
+        except (OSError, ValueError):
+            pass
+
+
+def _encode(metrics: ExecutionMetrics) -> bytes:
+    tool = metrics.tool_name.encode('utf-8')
+    quality = metrics.output_quality.encode('utf-8')
+    feedback = (b'' if metrics.feedback is None
+                else metrics.feedback.encode('utf-8'))
+    context = (b'' if metrics.context_id is None
+               else metrics.context_id.encode('utf-8'))
+    payload = _FIELDS.pack(
+        metrics.timestamp, metrics.execution_time,
+        metrics.context_tokens_used or 0, bool(metrics.success),
+        len(tool), len(quality),
+        _ABSENT if metrics.feedback is None else len(feedback),
+        _ABSENT if metrics.context_id is None else len(context)
+    ) + tool + quality + feedback + context
+    return _FRAME.pack(len(payload), zlib.crc32(payload)) + payload
+
+
+def _decode(buffer, offset: int) -> Tuple[Optional[ExecutionMetrics], int]:
+    """
+    Record at offset and the offset after it.
+    
+    Returns (None, offset) at the end of valid data, including a torn or
+    corrupt final record.
+    """
+    if offset + _FRAME.size > len(buffer):
+        return None, offset
+    length, crc = _FRAME.unpack_from(buffer, offset)
+    start = offset + _FRAME.size
+    end = start + length
+    if end > len(buffer) or length < _FIELDS.size:
+        return None, offset
+    payload = buffer[start:end]
+    if zlib.crc32(payload) != crc:
+        return None, offset
+    (timestamp, execution_time, tokens, success,
+     tool_len, quality_len, feedback_len,
+     context_len) = _FIELDS.unpack_from(payload)
+    pos = _FIELDS.size
+    tool = bytes(payload[pos:pos + tool_len]).decode('utf-8')
+    pos += tool_len
+    quality = bytes(payload[pos:pos + quality_len]).decode('utf-8')
+    pos += quality_len
+    feedback = None
+    if feedback_len != _ABSENT:
+        feedback = bytes(payload[pos:pos + feedback_len]).decode('utf-8')
+        pos += feedback_len
+    context_id = (None if context_len == _ABSENT
+                  else bytes(payload[pos:pos + context_len]).decode('utf-8'))
+    return ExecutionMetrics(tool, timestamp, success, execution_time, tokens,
+                            quality, feedback, context_id), end
+
+
+class _Segment:
+    """One log file plus its sparse index of (first timestamp, offset)."""
+    
+    def __init__(self, directory: str, seq: int):
+        self.seq = seq
+        self.path = os.path.join(directory, f'{seq:08d}.seg')
+        self.index_path = os.path.join(directory, f'{seq:08d}.idx')
+        self.times = array('d')
+        self.offsets = array('Q')
+        self.max_timestamp = float('-inf')
+    
+    def load_index(self) -> bool:
+        """Read the persisted index; False if it is missing."""
+        try:
+            with open(self.index_path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return False
+        usable = len(data) - len(data) % _INDEX.size
+        for ts, offset in _INDEX.iter_unpack(data[:usable]):
+            self.times.append(ts)
+            self.offsets.append(offset)
+        return True
+
+
+class MetricsLog(Sink):
+    """
+    Segmented append-only log of ExecutionMetrics.
+    
+    Appends are buffered and written with a single fsync per group
+    commit, which happens once group_bytes are pending, on flush(), and
+    otherwise from a timer at most sync_interval after the previous
+    commit, so an append is durable within sync_interval even if nothing
+    follows it. Open logs are also committed at interpreter exit. Used as
+    a sink of FeedbackAnalyzer every dispatcher batch becomes one group
+    commit. A segment is sealed before a record would take it past
+    segment_bytes.
+    
+    Each segment has a sidecar index holding the timestamp and offset of
+    every index_every-th record, so replay(start, end) seeks straight to
+    the right block instead of scanning from the beginning. Timestamps
+    are expected to be roughly increasing, as they are when records are
+    appended as they happen.
+    
+    compact(before) folds whole segments whose records are all older
+    than `before` into per-tool aggregates (count, successes, tokens,
+    Welford mean/variance, quality counts) and deletes them.
+    """
+    
+    def __init__(self,
+                 directory: str,
+                 segment_bytes: int = 16 << 20,
+                 sync_interval: float = 0.05,
+                 group_bytes: int = 1 << 20,
+                 index_every: int = 256):
+        """
+        Open or create a log.
+        
+        Args:
+            directory: Directory holding the segments; created if missing
+            segment_bytes: Size at which a new segment is started
+            sync_interval: Longest time (s) an append waits for its fsync
+            group_bytes: Pending bytes that force a commit
+            index_every: Records per sparse index entry
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.sync_interval = sync_interval
+        self.group_bytes = group_bytes
+        self.index_every = index_every
+        self._lock = threading.RLock()
+        self._pending = bytearray()
+        self._pending_index: List[Tuple[float, int]] = []
+        self._last_commit = time.monotonic()
+        self._timer: Optional[threading.Timer] = None
+        self._compactor: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        
+        aggregates = self.aggregates()
+        compacted = aggregates.get('compacted_through', -1)
+        self._segments: List[_Segment] = []
+        for name in sorted(os.listdir(directory)):
+            if not name.endswith('.seg'):
+                continue
+            segment = _Segment(directory, int(name[:-4]))
+            if segment.seq <= compacted:
+                # Compaction finished but the old files were not removed
+                self._remove(segment)
+                continue
+            self._segments.append(segment)
+        for segment in self._segments[:-1]:
+            if segment.load_index():
+                self._scan_tail(segment)
+            else:
+                self._scan(segment)
+        count = 0
+        if self._segments:
+            count = self._recover(self._segments[-1])
+        else:
+            self._segments.append(_Segment(directory, compacted + 1))
+        self._open_active(count)
+        _OPEN.add(self)
+    
+    def append(self, metrics: ExecutionMetrics) -> None:
+        """Buffer one record; it is durable after the next commit."""
+        self.write([metrics])
+    
+    def write(self, batch: List[ExecutionMetrics]) -> None:
+        """Buffer records and commit if a group is due."""
+        with self._lock:
+            segment = self._segments[-1]
+            for metrics in batch:
+                record = _encode(metrics)
+                used = self._size + len(self._pending)
+                if used and used + len(record) > self.segment_bytes:
+                    self._commit()
+                    self._roll()
+                    segment = self._segments[-1]
+                if self._count % self.index_every == 0:
+                    self._pending_index.append((metrics.timestamp,
+                                                len(self._pending)))
+                self._pending += record
+                self._count += 1
+                if metrics.timestamp > segment.max_timestamp:
+                    segment.max_timestamp = metrics.timestamp
+            if (len(self._pending) >= self.group_bytes
+                    or time.monotonic() - self._last_commit >= self.sync_interval):
+                self._commit()
+            elif self._pending and self._timer is None:
+                delay = self.sync_interval - (time.monotonic() - self._last_commit)
+                self._timer = threading.Timer(delay, self._deadline)
+                self._timer.daemon = True
+                self._timer.start()
+    
+    def _deadline(self) -> None:
+        """Timer callback: commit whatever the last appends left pending."""
+        with self._lock:
+            self._timer = None
+            if not self._file.closed:
+                self._commit()
+    
+    def flush(self) -> None:
+        """Write and fsync everything appended so far."""
+        with self._lock:
+            self._commit()
+    
+    def _commit(self) -> None:
+        if self._pending:
+            segment = self._segments[-1]
+            self._file.write(self._pending)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            if self._pending_index:
+                entries = b''.join(_INDEX.pack(ts, self._size + offset)
+                                   for ts, offset in self._pending_index)
+                with open(segment.index_path, 'ab') as f:
+                    f.write(entries)
+                for ts, offset in self._pending_index:
+                    segment.times.append(ts)
+                    segment.offsets.append(self._size + offset)
+            self._size += len(self._pending)
+            self._pending.clear()
+            self._pending_index.clear()
+        self._last_commit = time.monotonic()
+    
+    def _roll(self) -> None:
+        self._file.close()
+        self._segments.append(_Segment(self.directory,
+                                       self._segments[-1].seq + 1))
+        self._open_active()
+    
+    def _open_active(self, count: int = 0) -> None:
+        self._file = open(self._segments[-1].path, 'ab')
+        self._size = self._file.tell()
+        self._count = count
+    
+    def close(self) -> None:
+        """Commit pending records, stop compaction and close the file."""
+        self._stop.set()
+        if self._compactor is not None:
+            self._compactor.join()
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self._file.closed:
+                self._commit()
+                self._file.close()
+        _OPEN.discard(self)
+    
+    def _scan(self, segment: _Segment) -> Tuple[int, int]:
+        """
+        Rebuild a segment's index from its data.
+        
+        Returns:
+            (valid bytes, record count)
+        """
+        with open(segment.path, 'rb') as f:
+            data = f.read()
+        del segment.times[:]
+        del segment.offsets[:]
+        offset = count = 0
+        while True:
+            metrics, end = _decode(data, offset)
+            if metrics is None:
+                break
+            if count % self.index_every == 0:
+                segment.times.append(metrics.timestamp)
+                segment.offsets.append(offset)
+            if metrics.timestamp > segment.max_timestamp:
+                segment.max_timestamp = metrics.timestamp
+            count += 1
+            offset = end
+        with open(segment.index_path, 'wb') as f:
+            f.write(b''.join(_INDEX.pack(ts, off) for ts, off
+                             in zip(segment.times, segment.offsets)))
+        return offset, count
+    
+    def _scan_tail(self, segment: _Segment) -> None:
+        """Find a sealed segment's newest timestamp from its last block."""
+        with open(segment.path, 'rb') as f:
+            if segment.offsets:
+                f.seek(segment.offsets[-1])
+            data = f.read()
+        offset = 0
+        while True:
+            metrics, offset = _decode(data, offset)
+            if metrics is None:
+                break
+            segment.max_timestamp = max(segment.max_timestamp, metrics.timestamp)
+    
+    def _recover(self, segment: _Segment) -> int:
+        """
+        Cut a torn tail left by a crash off the active segment.
+        
+        Returns:
+            Number of valid records kept
+        """
+        valid, count = self._scan(segment)
+        if os.path.getsize(segment.path) > valid:
+            with open(segment.path, 'r+b') as f:
+                f.truncate(valid)
+                os.fsync(f.fileno())
+        return count
+    
+    def replay(self,
+               start: Optional[float] = None,
+               end: Optional[float] = None) -> Iterator[ExecutionMetrics]:
+        """
+        Committed records with start <= timestamp <= end, oldest first.
+        
+        Args:
+            start: Earliest timestamp (ms); None reads from the beginning
+            end: Latest timestamp (ms); None reads to the end
+        """
+        with self._lock:
+            self._commit()
+            segments = list(self._segments)
+        for segment in segments:
+            if start is not None and segment.max_timestamp < start:
+                continue
+            if end is not None and segment.times and segment.times[0] > end:
+                break
+            yield from self._read_segment(segment, start, end)
+    
+    def _read_segment(self, segment: _Segment, start: Optional[float],
+                      end: Optional[float]) -> Iterator[ExecutionMetrics]:
+        times, offsets = segment.times, segment.offsets
+        base = 0
+        if start is not None and times:
+            block = bisect.bisect_right(times, start) - 1
+            if block > 0:
+                base = offsets[block]
+        try:
+            with open(segment.path, 'rb') as f:
+                f.seek(base)
+                view = memoryview(f.read())
+        except FileNotFoundError:  # compacted meanwhile
+            return
+        next_block = bisect.bisect_right(offsets, base)
+        offset = 0
+        while True:
+            if (end is not None and next_block < len(offsets)
+                    and base + offset == offsets[next_block]):
+                if times[next_block] > end:
+                    return
+                next_block += 1
+            metrics, offset = _decode(view, offset)
+            if metrics is None:
+                return
+            ts = metrics.timestamp
+            if (start is None or ts >= start) and (end is None or ts <= end):
+                yield metrics
+    
+    def __iter__(self) -> Iterator[ExecutionMetrics]:
+        return self.replay()
+    
+    def aggregates(self) -> dict:
+        """Per-tool aggregates of compacted records."""
+        try:
+            with open(os.path.join(self.directory, _AGGREGATES),
+                      encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {'tools': {}, 'compacted_through': -1}
+    
+    def compact(self, before: float) -> int:
+        """
+        Fold segments holding only records older than `before` (ms).
+        
+        The active segment is never compacted. Aggregates are written
+        atomically before the segments are deleted, and a crash in
+        between is repaired on the next open.
+        
+        Returns:
+            Number of records folded into the aggregates
+        """
+        with self._lock:
+            candidates = [s for s in self._segments[:-1]
+                          if s.max_timestamp < before]
+        if not candidates:
+            return 0
+        aggregates = self.aggregates()
+        tools: Dict[str, dict] = aggregates['tools']
+        folded = 0
+        for segment in candidates:
+            for metrics in self._read_segment(segment, None, None):
+                self._fold(tools, metrics)
+                folded += 1
+        aggregates['compacted_through'] = candidates[-1].seq
+        path = os.path.join(self.directory, _AGGREGATES)
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(aggregates, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + '.tmp', path)
+        with self._lock:
+            for segment in candidates:
+                self._segments.remove(segment)
+                self._remove(segment)
+        return folded
+    
+    @staticmethod
+    def _fold(tools: Dict[str, dict], metrics: ExecutionMetrics) -> None:
+        entry = tools.setdefault(metrics.tool_name, {
+            'count': 0, 'mean': 0.0, 'm2': 0.0, 'successes': 0,
+            'tokens': 0, 'quality': {}, 'first': metrics.timestamp,
+            'last': metrics.timestamp,
+        })
+        stats = RunningStats(entry['count'], entry['mean'], entry['m2'])
+        stats.add(metrics.execution_time)
+        entry['count'], entry['mean'], entry['m2'] = (stats.count, stats.mean,
+                                                      stats.m2)
+        entry['successes'] += bool(metrics.success)
+        entry['tokens'] += metrics.context_tokens_used or 0
+        quality = entry['quality']
+        quality[metrics.output_quality] = quality.get(metrics.output_quality, 0) + 1
+        entry['first'] = min(entry['first'], metrics.timestamp)
+        entry['last'] = max(entry['last'], metrics.timestamp)
+    
+    def start_compaction(self, max_age_ms: float, interval: float = 60.0) -> None:
+        """
+        Compact records older than max_age_ms every `interval` seconds
+        on a background thread until close().
+        """
+        if self._compactor is not None:
+            return
+        
+        def run() -> None:
+            while not self._stop.wait(interval):
+                self.compact(time.time() * 1000 - max_age_ms)
+        
+        self._compactor = threading.Thread(target=run, name='metrics-compactor',
+                                           daemon=True)
+        self._compactor.start()
+    
+    @staticmethod
+    def _remove(segment: _Segment) -> None:
+        for path in (segment.path, segment.index_path):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
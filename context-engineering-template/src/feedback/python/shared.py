@@ -0,0 +1,363 @@
+"""
+Python Shared Metrics - Language Agnostic Implementation
+
+Fleet-wide execution statistics for analyzers running in several
+processes, kept in one multiprocessing.shared_memory block so any
+process can read the combined picture without pickling metrics around.
+"""
+
+import math
+import multiprocessing
+import os
+import struct
+import time
+import warnings
+from multiprocessing import shared_memory
+from typing import Any, List, Optional, Tuple
+
+from feedback import RunningStats
+from sinks import Sink
+from sketch import QuantileSketch
+
+
+_MAGIC = b'CTXSHM\0\0'
+_VERSION = 2
+# magic, version, slots, buckets, accuracy, lowest bucket key,
+# reclaim generation, executions lost for want of a slot
+_HEADER = struct.Struct('<8sIIIxxxxdqQQ')
+_GENERATION_AT = _HEADER.size - 16
+_LOST_AT = _HEADER.size - 8
+# seq, pid, count, successes, tokens, zeros, mean, m2, min, max
+_SLOT = struct.Struct('<QqQQQQdddd')
+# The slot fields after seq and pid. pack_into() zeroes its whole range
+# before packing, so writers never repack seq or pid: a reader could
+# catch seq at zero or see the slot as unowned.
+_STATS = struct.Struct('<QQQQdddd')
+_STATS_AT = 16
+_SEQ = struct.Struct('<Q')
+_BUCKET = struct.Struct('<Q')
+
+
+def _alive(pid: int) -> bool:
+    """Whether a process with this pid exists."""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class SharedMetrics(Sink):
+    """
+    Per-worker execution statistics in shared memory.
+    
+    The block has one fixed-size slot per worker. A slot holds count,
+    successes, tokens, Welford mean/M2 of execution time and a
+    log-bucket latency histogram with the same layout in every slot, so
+    slots merge exactly. Each slot has a single writer, its worker; the
+    writer bumps a sequence number to odd before changing the slot and
+    back to even afterwards (a seqlock), and readers retry any slot that
+    was odd or changed while they copied it. Writers never wait and a
+    record costs a few fixed-offset writes.
+    
+    A slot whose owner process has exited is reclaimed by the next
+    claim(): its totals are folded into a retired slot after the worker
+    slots, so snapshots keep counting them. Reclaims bump a block-wide
+    generation that snapshots check the same way. Executions a worker
+    could not record because every slot was held by a live process are
+    counted in the block and reported by snapshot() as 'lost'.
+    
+    Create the block once in the parent, then attach in each worker with
+    the name and lock from attach_args(), typically in a Pool
+    initializer. SharedMetrics is a Sink, so workers can pass it in
+    FeedbackAnalyzer(sinks=[...]).
+    """
+    
+    def __init__(self,
+                 name: str,
+                 lock: Any = None,
+                 slot: Optional[int] = None,
+                 _shm: Optional[shared_memory.SharedMemory] = None):
+        """
+        Attach to an existing block.
+        
+        Args:
+            name: Shared memory name from attach_args()
+            lock: Lock from attach_args(), used to claim a slot
+            slot: Fixed slot to write to instead of claiming one
+        """
+        self.shm = _shm or shared_memory.SharedMemory(name=name)
+        self.name = self.shm.name
+        self.lock = lock
+        (magic, version, self.slots, self.buckets, self.accuracy,
+         self.min_key, _, _) = _HEADER.unpack_from(self.shm.buf)
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError(f"{name} is not a shared metrics block")
+        self._log_gamma = math.log((1 + self.accuracy) / (1 - self.accuracy))
+        self._slot_size = _SLOT.size + _BUCKET.size * self.buckets
+        self._slot = slot
+        if slot is not None:
+            self._own(slot)
+        self._stats = RunningStats()
+        self._successes = self._tokens = self._zeros = 0
+        self._min = math.inf
+        self._max = -math.inf
+        self._histogram = struct.Struct(f'<{self.buckets}Q')
+    
+    @classmethod
+    def create(cls,
+               slots: int = 64,
+               accuracy: float = 0.02,
+               min_value: float = 0.001,
+               max_value: float = 1e7,
+               name: Optional[str] = None) -> 'SharedMetrics':
+        """
+        Create a new block; the caller owns it and should unlink() it.
+        
+        Args:
+            slots: Most workers that can write
+            accuracy: Relative error of latency percentiles
+            min_value: Smallest execution time (ms) resolved
+            max_value: Largest execution time (ms) resolved
+            name: Shared memory name; generated if omitted
+        """
+        log_gamma = math.log((1 + accuracy) / (1 - accuracy))
+        min_key = math.ceil(math.log(min_value) / log_gamma)
+        buckets = math.ceil(math.log(max_value) / log_gamma) - min_key + 1
+        # One slot per worker plus the retired slot
+        size = _HEADER.size + (slots + 1) * (_SLOT.size + _BUCKET.size * buckets)
+        shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        shm.buf[:size] = bytes(size)
+        _HEADER.pack_into(shm.buf, 0, _MAGIC, _VERSION, slots, buckets,
+                          accuracy, min_key, 0, 0)
+        return cls(shm.name, multiprocessing.Lock(), _shm=shm)
+    
+    def attach_args(self) -> Tuple[str, Any]:
+        """(name, lock) for SharedMetrics(*args) in a worker."""
+        return self.name, self.lock
+    
+    def _offset(self, slot: int) -> int:
+        return _HEADER.size + slot * self._slot_size
+    
+    def claim(self) -> int:
+        """
+        Take a free slot for this process, reclaiming one whose owner has
+        exited if none is free.
+        
+        Raises:
+            RuntimeError: If every slot belongs to a live process
+        """
+        if self._slot is not None:
+            return self._slot
+        if self.lock is None:
+            raise RuntimeError("pass a lock or a slot to write")
+        buf = self.shm.buf
+        pid = os.getpid()
+        with self.lock:
+            owners = [struct.unpack_from('<Qq', buf, self._offset(slot))[1]
+                      for slot in range(self.slots)]
+            if pid in owners:
+                slot = owners.index(pid)
+                self._resume(slot)
+            elif 0 in owners:
+                slot = owners.index(0)
+            else:
+                slot = next((slot for slot, owner in enumerate(owners)
+                             if not _alive(owner)), None)
+                if slot is None:
+                    raise RuntimeError(f"all {self.slots} slots are taken")
+                self._retire(slot)
+            self._own(slot)
+            self._slot = slot
+            return slot
+    
+    def _own(self, slot: int) -> None:
+        """Mark a slot as this process's, in one copy."""
+        at = self._offset(slot) + 8
+        self.shm.buf[at:at + 8] = struct.pack('<q', os.getpid())
+    
+    def _retire(self, slot: int) -> None:
+        """Fold a dead worker's slot into the retired slot and clear it."""
+        buf = self.shm.buf
+        generation = _SEQ.unpack_from(buf, _GENERATION_AT)[0]
+        _SEQ.pack_into(buf, _GENERATION_AT, generation + 1)
+        offset = self._offset(slot)
+        (_, _, count, successes, tokens, zeros, mean, m2, low,
+         high) = _SLOT.unpack_from(buf, offset)
+        buckets = self._histogram.unpack_from(buf, offset + _SLOT.size)
+        retired = self._offset(self.slots)
+        (_, _, r_count, r_successes, r_tokens, r_zeros, r_mean, r_m2,
+         r_low, r_high) = _SLOT.unpack_from(buf, retired)
+        if count:
+            stats = RunningStats(r_count, r_mean, r_m2)
+            stats.merge(RunningStats(count, mean, m2))
+            if not r_count:
+                r_low, r_high = math.inf, -math.inf
+            _STATS.pack_into(buf, retired + _STATS_AT, stats.count,
+                             r_successes + successes, r_tokens + tokens,
+                             r_zeros + zeros, stats.mean, stats.m2,
+                             min(r_low, low), max(r_high, high))
+            at = retired + _SLOT.size
+            merged = [a + b for a, b in
+                      zip(self._histogram.unpack_from(buf, at), buckets)]
+            self._histogram.pack_into(buf, at, *merged)
+        buf[offset:offset + self._slot_size] = bytes(self._slot_size)
+        _SEQ.pack_into(buf, _GENERATION_AT, generation + 2)
+    
+    def _resume(self, slot: int) -> None:
+        """Continue the totals of a slot this process wrote before."""
+        (_, _, count, self._successes, self._tokens, self._zeros,
+         mean, m2, self._min, self._max) = _SLOT.unpack_from(
+            self.shm.buf, self._offset(slot))
+        self._stats = RunningStats(count, mean, m2)
+        if not count:
+            self._min, self._max = math.inf, -math.inf
+    
+    def record(self, execution_time: float, success: bool, tokens: int) -> None:
+        """
+        Add one execution to this process's slot.
+        
+        Raises:
+            RuntimeError: If this process has no slot and none is free
+        """
+        if self._slot is None:
+            self.claim()
+        stats = self._stats
+        stats.add(execution_time)
+        self._successes += bool(success)
+        self._tokens += tokens or 0
+        self._min = min(self._min, execution_time)
+        self._max = max(self._max, execution_time)
+        if execution_time <= 0:
+            self._zeros += 1
+            bucket = None
+        else:
+            key = math.ceil(math.log(execution_time) / self._log_gamma)
+            bucket = min(max(key - self.min_key, 0), self.buckets - 1)
+        
+        buf = self.shm.buf
+        offset = self._offset(self._slot)
+        seq = _SEQ.unpack_from(buf, offset)[0]
+        _SEQ.pack_into(buf, offset, seq + 1)
+        _STATS.pack_into(buf, offset + _STATS_AT, stats.count,
+                         self._successes, self._tokens, self._zeros,
+                         stats.mean, stats.m2, self._min, self._max)
+        if bucket is not None:
+            at = offset + _SLOT.size + bucket * _BUCKET.size
+            _BUCKET.pack_into(buf, at, _BUCKET.unpack_from(buf, at)[0] + 1)
+        _SEQ.pack_into(buf, offset, seq + 2)
+    
+    def write(self, batch: List[Any]) -> None:
+        """
+        Sink interface: add a batch of ExecutionMetrics.
+        
+        A batch that finds no free slot is counted as lost in the block
+        and reported with a RuntimeWarning rather than raised into the
+        dispatcher, which would only count it as a sink error.
+        """
+        if self._slot is None:
+            try:
+                self.claim()
+            except RuntimeError as e:
+                self._lose(len(batch))
+                warnings.warn(f"{len(batch)} executions not recorded in "
+                              f"{self.name}: {e}", RuntimeWarning)
+                return
+        for metrics in batch:
+            self.record(metrics.execution_time, metrics.success,
+                        metrics.context_tokens_used)
+    
+    def _lose(self, count: int) -> None:
+        buf = self.shm.buf
+        with self.lock:
+            _SEQ.pack_into(buf, _LOST_AT, _SEQ.unpack_from(buf, _LOST_AT)[0] + count)
+    
+    def _read_slot(self, slot: int) -> Optional[Tuple[tuple, tuple]]:
+        buf = self.shm.buf
+        offset = self._offset(slot)
+        end = offset + self._slot_size
+        for _ in range(1000):
+            seq = _SEQ.unpack_from(buf, offset)[0]
+            if seq & 1:
+                time.sleep(0)
+                continue
+            data = bytes(buf[offset:end])
+            if _SEQ.unpack_from(buf, offset)[0] == seq:
+                return (_SLOT.unpack_from(data),
+                        self._histogram.unpack_from(data, _SLOT.size))
+        return None
+    
+    def snapshot(self) -> dict:
+        """
+        Combined statistics of every worker.
+        
+        Returns:
+            Dict with workers (live slots), total_executions (including
+            those of reclaimed slots), success_rate, avg_execution_time,
+            stdev_execution_time, total_tokens_used, p50/p90/p99, lost
+            (executions that found no slot) and skipped (slots busy for
+            every retry)
+        """
+        buf = self.shm.buf
+        for _ in range(1000):
+            generation = _SEQ.unpack_from(buf, _GENERATION_AT)[0]
+            if generation & 1:
+                time.sleep(0)
+                continue
+            result = self._combine()
+            if _SEQ.unpack_from(buf, _GENERATION_AT)[0] == generation:
+                break
+        else:
+            result = self._combine()
+        result['lost'] = _SEQ.unpack_from(buf, _LOST_AT)[0]
+        return result
+    
+    def _combine(self) -> dict:
+        stats = RunningStats()
+        successes = tokens = workers = skipped = 0
+        sketch = QuantileSketch(self.accuracy, self.buckets)
+        for slot in range(self.slots + 1):
+            result = self._read_slot(slot)
+            if result is None:
+                skipped += 1
+                continue
+            fields, buckets = result
+            (_, pid, count, slot_successes, slot_tokens, zeros,
+             mean, m2, low, high) = fields
+            if not count:
+                continue
+            workers += slot < self.slots
+            stats.merge(RunningStats(count, mean, m2))
+            successes += slot_successes
+            tokens += slot_tokens
+            sketch.count += count
+            sketch.zeros += zeros
+            sketch.min = min(sketch.min, low)
+            sketch.max = max(sketch.max, high)
+            for index, n in enumerate(buckets):
+                if n:
+                    key = index + self.min_key
+                    sketch.buckets[key] = sketch.buckets.get(key, 0) + n
+        count = stats.count
+        return {
+            'workers': workers,
+            'total_executions': count,
+            'success_rate': successes / count if count else 0,
+            'avg_execution_time': stats.mean,
+            'stdev_execution_time': stats.stdev,
+            'total_tokens_used': tokens,
+            'p50': sketch.quantile(0.5),
+            'p90': sketch.quantile(0.9),
+            'p99': sketch.quantile(0.99),
+            'skipped': skipped,
+        }
+    
+    def close(self) -> None:
+        """Detach from the block."""
+        self.shm.close()
+    
+    def unlink(self) -> None:
+        """Destroy the block; only the creator should call this."""
+        self.shm.unlink()
@@ -0,0 +1,286 @@
+"""
+Python Metric Sinks - Language Agnostic Implementation
+
+Destinations for recorded execution metrics, and a dispatcher that
+delivers them in batches from a background thread so recording never
+waits on I/O.
+"""
+
+import atexit
+import json
+import sys
+import threading
+import weakref
+from collections import deque
+from dataclasses import asdict, is_dataclass
+from typing import Any, Callable, Deque, Iterable, List, Literal, Optional, TextIO
+
+
+Backpressure = Literal['block', 'drop_oldest', 'drop_newest']
+
+
+class Sink:
+    """
+    Destination for batches of execution metrics.
+    
+    Subclasses implement write(); flush() and close() are optional.
+    """
+    
+    def write(self, batch: List[Any]) -> None:
+        """Deliver a batch of metrics, oldest first."""
+        raise NotImplementedError
+    
+    def flush(self) -> None:
+        """Push buffered output to its destination."""
+    
+    def close(self) -> None:
+        """Release resources; no writes follow."""
+        self.flush()
+
+
+class StdoutSink(Sink):
+    """Human-readable line per execution, one write per batch."""
+    
+    def __init__(self, stream: Optional[TextIO] = None):
+        self.stream = stream
+    
+    def write(self, batch: List[Any]) -> None:
+        stream = self.stream or sys.stdout
+        stream.write(''.join(
+            f"✅ Recorded: {m.tool_name} "
+            f"({m.execution_time}ms, "
+            f"Quality: {m.output_quality})\n"
+            for m in batch
+        ))
+    
+    def flush(self) -> None:
+        (self.stream or sys.stdout).flush()
+
+
+class JsonlFileSink(Sink):
+    """Appends one JSON object per execution to a file."""
+    
+    def __init__(self, path: str):
+        """
+        Initialize sink.
+        
+        Args:
+            path: File to append to; created if missing
+        """
+        self.path = path
+        self._file = open(path, 'a', encoding='utf-8')
+    
+    def write(self, batch: List[Any]) -> None:
+        self._file.write(''.join(
+            json.dumps(asdict(m) if is_dataclass(m) else m,
+                       ensure_ascii=False) + '\n'
+            for m in batch
+        ))
+    
+    def flush(self) -> None:
+        self._file.flush()
+    
+    def close(self) -> None:
+        if not self._file.closed:
+            self._file.close()
+
+
+class CallbackSink(Sink):
+    """Hands every batch to a callable."""
+    
+    def __init__(self, callback: Callable[[List[Any]], None]):
+        self.callback = callback
+    
+    def write(self, batch: List[Any]) -> None:
+        self.callback(batch)
+
+
+class _Marker:
+    """Queue entry that is signalled once everything before it is written."""
+    __slots__ = ('done',)
+    
+    def __init__(self):
+        self.done = threading.Event()
+
+
+# Dispatchers with a running worker, closed (and so drained) at exit
+_RUNNING: 'weakref.WeakSet[MetricsDispatcher]' = weakref.WeakSet()
+
+
+@atexit.register
+def _close_running() -> None:
+    for dispatcher in list(_RUNNING):
+        dispatcher.close(dispatcher.EXIT_TIMEOUT)
+
+
+class MetricsDispatcher:
+    """
+    Bounded queue drained in batches by a background thread.
+    
+    put() is a deque append (atomic under the GIL) and only touches a
+    lock when a batch is ready or the queue is full, so producers never
+    wait on sink I/O. When the queue is full the backpressure policy
+    decides: 'block' waits for room, 'drop_oldest' discards the oldest
+    queued item, 'drop_newest' discards the new one. Sink errors are
+    counted in `errors` and never reach the producer.
+    
+    The worker is a daemon thread; dispatchers still open at interpreter
+    exit are closed from an atexit hook, so queued items reach the sinks
+    even if the program never calls close().
+    """
+    
+    # Seconds the exit hook waits for one dispatcher to drain
+    EXIT_TIMEOUT = 5.0
+    
+    def __init__(self,
+                 sinks: Iterable[Sink],
+                 max_queue: int = 10000,
+                 batch_size: int = 256,
+                 interval: float = 0.05,
+                 backpressure: Backpressure = 'block'):
+        """
+        Initialize dispatcher.
+        
+        Args:
+            sinks: Destinations for every batch
+            max_queue: Items queued before backpressure applies
+            batch_size: Most items handed to sinks at once
+            interval: Seconds the worker waits before writing a partial batch
+            backpressure: Policy when the queue is full
+        """
+        if backpressure not in ('block', 'drop_oldest', 'drop_newest'):
+            raise ValueError(f"Unknown backpressure policy: {backpressure}")
+        self.sinks = list(sinks)
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.interval = interval
+        self.backpressure = backpressure
+        self._wake_at = min(batch_size, max_queue)
+        self.dropped = 0
+        self.errors = 0
+        self._queue: Deque[Any] = deque()
+        self._wake = threading.Event()
+        self._space = threading.Event()
+        self._closed = False
+        self._start_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+    
+    def put(self, item: Any) -> bool:
+        """
+        Queue an item for the sinks.
+        
+        Returns:
+            False if the item was dropped by the backpressure policy
+        """
+        if self._closed:
+            raise RuntimeError("dispatcher is closed")
+        if self._thread is None:
+            self._start()
+        queue = self._queue
+        if len(queue) >= self.max_queue:
+            if self.backpressure == 'drop_newest':
+                self.dropped += 1
+                return False
+            if self.backpressure == 'drop_oldest':
+                self._evict_oldest()
+            else:
+                while len(queue) >= self.max_queue and not self._closed:
+                    self._space.clear()
+                    self._wake.set()
+                    self._space.wait(self.interval)
+        queue.append(item)
+        if len(queue) >= self._wake_at:
+            self._wake.set()
+        return True
+    
+    def _evict_oldest(self) -> None:
+        try:
+            oldest = self._queue.popleft()
+        except IndexError:
+            return
+        if isinstance(oldest, _Marker):
+            # Never lose a flush request; it just moves back in line
+            self._queue.append(oldest)
+        else:
+            self.dropped += 1
+    
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until everything queued so far has been written and flushed.
+        
+        Returns:
+            False if the timeout expired first
+        """
+        if self._thread is None:
+            return True
+        marker = _Marker()
+        self._queue.append(marker)
+        self._wake.set()
+        return marker.done.wait(timeout)
+    
+    def close(self, timeout: Optional[float] = None) -> None:
+        """Flush, stop the worker and close all sinks."""
+        if self._closed:
+            return
+        _RUNNING.discard(self)
+        self.flush(timeout)
+        self._closed = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        for sink in self.sinks:
+            try:
+                sink.close()
+            except Exception:
+                self.errors += 1
+    
+    def _start(self) -> None:
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name='metrics-dispatcher', daemon=True)
+                self._thread.start()
+                _RUNNING.add(self)
+    
+    def _run(self) -> None:
+        queue = self._queue
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self._drain(queue)
+            if self._closed and not queue:
+                return
+    
+    def _drain(self, queue: Deque[Any]) -> None:
+        batch: List[Any] = []
+        while queue:
+            item = queue.popleft()
+            if isinstance(item, _Marker):
+                self._deliver(batch)
+                batch = []
+                self._flush_sinks()
+                item.done.set()
+            else:
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    self._deliver(batch)
+                    batch = []
+                    self._space.set()
+        self._deliver(batch)
+        self._space.set()
+    
+    def _deliver(self, batch: List[Any]) -> None:
+        if not batch:
+            return
+        for sink in self.sinks:
+            try:
+                sink.write(batch)
+            except Exception:
+                self.errors += 1
+    
+    def _flush_sinks(self) -> None:
+        for sink in self.sinks:
+            try:
+                sink.flush()
+            except Exception:
+                self.errors += 1
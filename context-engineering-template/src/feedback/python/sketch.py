@@ -0,0 +1,179 @@
+"""
+Python Latency Sketches - Language Agnostic Implementation
+
+Mergeable quantile sketches for execution times, so percentiles can be
+tracked per tool and per time window in bounded memory.
+"""
+
+import math
+from collections import deque
+from typing import Deque, Dict, Iterable, Optional, Tuple
+
+
+class QuantileSketch:
+    """
+    Log-bucket quantile sketch with bounded relative error.
+    
+    Values fall into buckets whose bounds grow geometrically by a factor
+    gamma = (1 + accuracy) / (1 - accuracy); any quantile is then within
+    `accuracy` of the true value relative to its size. Two sketches with
+    the same accuracy merge by adding bucket counts, so per-window or
+    per-process sketches combine exactly. When more than max_buckets
+    buckets are in use the lowest ones are folded together, which only
+    affects the accuracy of the smallest values.
+    """
+    
+    def __init__(self, accuracy: float = 0.01, max_buckets: int = 2048):
+        """
+        Initialize sketch.
+        
+        Args:
+            accuracy: Relative error bound of quantiles (0-1)
+            max_buckets: Bucket limit that bounds memory
+        """
+        if not 0 < accuracy < 1:
+            raise ValueError("accuracy must be between 0 and 1")
+        self.accuracy = accuracy
+        self.max_buckets = max_buckets
+        self._gamma = (1 + accuracy) / (1 - accuracy)
+        self._log_gamma = math.log(self._gamma)
+        self.buckets: Dict[int, int] = {}
+        self.zeros = 0
+        self.count = 0
+        self.min = math.inf
+        self.max = -math.inf
+    
+    def add(self, value: float, count: int = 1) -> None:
+        """Record a value (values <= 0 are counted as zero)."""
+        self.count += count
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        if value <= 0:
+            self.zeros += count
+            return
+        key = math.ceil(math.log(value) / self._log_gamma)
+        self.buckets[key] = self.buckets.get(key, 0) + count
+        if len(self.buckets) > self.max_buckets:
+            self._collapse()
+    
+    def _collapse(self) -> None:
+        keys = sorted(self.buckets)
+        excess = len(keys) - self.max_buckets
+        target = keys[excess]
+        self.buckets[target] += sum(self.buckets.pop(k) for k in keys[:excess])
+    
+    def merge(self, other: 'QuantileSketch') -> 'QuantileSketch':
+        """Fold another sketch with the same accuracy into this one."""
+        if other.accuracy != self.accuracy:
+            raise ValueError("cannot merge sketches of different accuracy")
+        for key, count in other.buckets.items():
+            self.buckets[key] = self.buckets.get(key, 0) + count
+        self.zeros += other.zeros
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        if len(self.buckets) > self.max_buckets:
+            self._collapse()
+        return self
+    
+    def copy(self) -> 'QuantileSketch':
+        other = QuantileSketch(self.accuracy, self.max_buckets)
+        return other.merge(self)
+    
+    def quantile(self, q: float) -> Optional[float]:
+        """
+        Approximate q-quantile (0-1), or None if the sketch is empty.
+        """
+        if not self.count:
+            return None
+        if q <= 0:
+            return self.min
+        if q >= 1:
+            return self.max
+        rank = q * (self.count - 1)
+        seen = self.zeros
+        if rank < seen:
+            return 0.0
+        for key in sorted(self.buckets):
+            seen += self.buckets[key]
+            if rank < seen:
+                value = 2 * self._gamma ** key / (self._gamma + 1)
+                return min(max(value, self.min), self.max)
+        return self.max
+    
+    def quantiles(self, qs: Iterable[float]) -> Dict[float, Optional[float]]:
+        """Several quantiles at once."""
+        return {q: self.quantile(q) for q in qs}
+
+
+class WindowedSketch:
+    """
+    Quantile sketch over a sliding time window.
+    
+    Time is cut into fixed windows of window_ms each holding its own
+    QuantileSketch; only the newest `windows` of them are kept, and a
+    query merges those still inside the window. Memory is bounded by
+    windows * max_buckets regardless of traffic.
+    """
+    
+    def __init__(self,
+                 window_ms: float = 60_000,
+                 windows: int = 5,
+                 accuracy: float = 0.01,
+                 max_buckets: int = 2048):
+        """
+        Initialize windowed sketch.
+        
+        Args:
+            window_ms: Length of one window in milliseconds
+            windows: Number of windows covered by a query
+            accuracy: Relative error of each window's sketch
+            max_buckets: Bucket limit of each window's sketch
+        """
+        self.window_ms = window_ms
+        self.windows = windows
+        self.accuracy = accuracy
+        self.max_buckets = max_buckets
+        self._ring: Deque[Tuple[int, QuantileSketch]] = deque()
+    
+    def add(self, value: float, timestamp: float) -> None:
+        """Record a value observed at timestamp (ms)."""
+        index = int(timestamp // self.window_ms)
+        ring = self._ring
+        if ring and ring[-1][0] == index:
+            sketch = ring[-1][1]
+        elif ring and index < ring[-1][0]:
+            # Late arrival: find its window if still retained
+            for existing, sketch in ring:
+                if existing == index:
+                    break
+            else:
+                return
+        else:
+            sketch = QuantileSketch(self.accuracy, self.max_buckets)
+            ring.append((index, sketch))
+            while len(ring) > self.windows:
+                ring.popleft()
+        sketch.add(value)
+    
+    def merged(self, now: Optional[float] = None) -> QuantileSketch:
+        """
+        Sketch of every value in the last `windows` windows.
+        
+        Args:
+            now: Reference time (ms); defaults to the newest window
+        """
+        total = QuantileSketch(self.accuracy, self.max_buckets)
+        if not self._ring:
+            return total
+        newest = (self._ring[-1][0] if now is None
+                  else int(now // self.window_ms))
+        for index, sketch in self._ring:
+            if newest - self.windows < index <= newest:
+                total.merge(sketch)
+        return total
+    
+    def clear(self) -> None:
+        self._ring.clear()
@@ -0,0 +1,235 @@
+"""
+Python Metrics Store - Language Agnostic Implementation
+
+Bounded columnar storage for execution metrics. Each field lives in its
+own typed array, so a record costs a few dozen bytes instead of a full
+Python object, and the oldest records are overwritten once the store is
+full.
+"""
+
+from array import array
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; analyses fall back to pure Python
+    np = None
+
+
+QUALITY_LEVELS = ('excellent', 'good', 'fair', 'poor')
+
+# (tool_name, timestamp, success, execution_time, context_tokens_used,
+#  output_quality, feedback, context_id), in ExecutionMetrics field order
+Row = Tuple[str, float, bool, float, int, str, Optional[str], Optional[str]]
+
+
+class MetricsStore:
+    """
+    Ring buffer of execution metrics stored column by column.
+    
+    Tool names and quality labels are interned into small tables and
+    stored as integer codes. Free-text feedback and context ids are
+    optional, so they are kept in side dicts keyed by slot. With NumPy
+    installed the columns are viewed as arrays without copying and
+    summaries are vectorized.
+    """
+    
+    def __init__(self, capacity: int = 65536):
+        """
+        Initialize store.
+        
+        Args:
+            capacity: Maximum records kept; older ones are overwritten
+        """
+        if capacity < 1:
+            raise ValueError("capacity must be positive")
+        self.capacity = capacity
+        self.timestamp = array('d', bytes(8 * capacity))
+        self.execution_time = array('d', bytes(8 * capacity))
+        self.tokens = array('q', bytes(8 * capacity))
+        self.success = array('b', bytes(capacity))
+        self.quality = array('B', bytes(capacity))
+        self.tool = array('I', bytes(4 * capacity))
+        self._feedback: Dict[int, str] = {}
+        self._context: Dict[int, str] = {}
+        self.tool_names: List[str] = []
+        self._tool_ids: Dict[str, int] = {}
+        self.quality_names: List[str] = list(QUALITY_LEVELS)
+        self._quality_ids = {name: i for i, name in enumerate(QUALITY_LEVELS)}
+        self._next = 0
+        self._size = 0
+        self.evicted = 0
+    
+    def __len__(self) -> int:
+        return self._size
+    
+    def __iter__(self) -> Iterator[Row]:
+        """Rows from oldest to newest."""
+        for slot in self._slots():
+            yield self.row(slot)
+    
+    def tool_id(self, name: str) -> int:
+        """Interned code of a tool name, assigning one on first use."""
+        code = self._tool_ids.get(name)
+        if code is None:
+            code = self._tool_ids[name] = len(self.tool_names)
+            self.tool_names.append(name)
+        return code
+    
+    def _quality_id(self, name: str) -> int:
+        code = self._quality_ids.get(name)
+        if code is None:
+            if len(self.quality_names) > 255:
+                raise ValueError("too many distinct output_quality values")
+            code = self._quality_ids[name] = len(self.quality_names)
+            self.quality_names.append(name)
+        return code
+    
+    def append(self,
+               tool_name: str,
+               timestamp: float,
+               success: bool,
+               execution_time: float,
+               context_tokens_used: int,
+               output_quality: str,
+               feedback: Optional[str] = None,
+               context_id: Optional[str] = None) -> None:
+        """Store one record, overwriting the oldest if full."""
+        slot = self._next
+        self.timestamp[slot] = timestamp
+        self.execution_time[slot] = execution_time
+        self.tokens[slot] = context_tokens_used or 0
+        self.success[slot] = bool(success)
+        self.quality[slot] = self._quality_id(output_quality)
+        self.tool[slot] = self.tool_id(tool_name)
+        if feedback is not None:
+            self._feedback[slot] = feedback
+        else:
+            self._feedback.pop(slot, None)
+        if context_id is not None:
+            self._context[slot] = context_id
+        else:
+            self._context.pop(slot, None)
+        
+        self._next = (slot + 1) % self.capacity
+        if self._size < self.capacity:
+            self._size += 1
+        else:
+            self.evicted += 1
+    
+    def row(self, slot: int) -> Row:
+        """Fields of the record in a physical slot."""
+        return (
+            self.tool_names[self.tool[slot]],
+            self.timestamp[slot],
+            bool(self.success[slot]),
+            self.execution_time[slot],
+            self.tokens[slot],
+            self.quality_names[self.quality[slot]],
+            self._feedback.get(slot),
+            self._context.get(slot),
+        )
+    
+    def _slots(self) -> Sequence[int]:
+        """Physical slots of live records, oldest first (may wrap)."""
+        if self._size < self.capacity:
+            return range(self._size)
+        return [*range(self._next, self.capacity), *range(self._next)]
+    
+    def clear(self) -> None:
+        """Drop all records; interned names are kept."""
+        self._feedback.clear()
+        self._context.clear()
+        self._next = 0
+        self._size = 0
+        self.evicted = 0
+    
+    def columns(self) -> Dict[str, 'np.ndarray']:
+        """
+        Zero-copy NumPy views of the live part of each column.
+        
+        Rows are in slot order, not time order, once the buffer has
+        wrapped. Views are invalidated by the next append().
+        """
+        if np is None:
+            raise ImportError("MetricsStore.columns() requires NumPy")
+        size = self._size
+        return {
+            'timestamp': np.frombuffer(self.timestamp, dtype=np.float64)[:size],
+            'execution_time': np.frombuffer(self.execution_time,
+                                            dtype=np.float64)[:size],
+            'tokens': np.frombuffer(self.tokens, dtype=np.int64)[:size],
+            'success': np.frombuffer(self.success, dtype=np.int8)[:size],
+            'quality': np.frombuffer(self.quality, dtype=np.uint8)[:size],
+            'tool': np.frombuffer(self.tool, dtype=np.uint32)[:size],
+        }
+    
+    def summary(self,
+                tool_name: Optional[str] = None,
+                since: Optional[float] = None) -> dict:
+        """
+        Aggregate the retained records, optionally filtered.
+        
+        Args:
+            tool_name: Only count this tool
+            since: Only count records with timestamp >= since (ms)
+        
+        Returns:
+            Dict with executions, success_rate, avg_execution_time,
+            total_tokens_used and quality_counts
+        """
+        if tool_name is not None and tool_name not in self._tool_ids:
+            return self._summary(0, 0, 0.0, 0, {})
+        tool = self._tool_ids.get(tool_name)
+        if np is not None:
+            return self._summary_numpy(tool, since)
+        return self._summary_python(tool, since)
+    
+    def _summary(self, count: int, successes: int, total_time: float,
+                 tokens: int, quality: Dict[str, int]) -> dict:
+        return {
+            'executions': count,
+            'success_rate': successes / count if count else 0,
+            'avg_execution_time': total_time / count if count else 0,
+            'total_tokens_used': tokens,
+            'quality_counts': quality,
+        }
+    
+    def _summary_python(self, tool: Optional[int], since: Optional[float]) -> dict:
+        count = successes = tokens = 0
+        total_time = 0.0
+        quality: Dict[str, int] = {}
+        for slot in range(self._size):
+            if tool is not None and self.tool[slot] != tool:
+                continue
+            if since is not None and self.timestamp[slot] < since:
+                continue
+            count += 1
+            successes += self.success[slot]
+            total_time += self.execution_time[slot]
+            tokens += self.tokens[slot]
+            name = self.quality_names[self.quality[slot]]
+            quality[name] = quality.get(name, 0) + 1
+        return self._summary(count, successes, total_time, tokens, quality)
+    
+    def _summary_numpy(self, tool: Optional[int], since: Optional[float]) -> dict:
+        cols = self.columns()
+        mask = None
+        if tool is not None:
+            mask = cols['tool'] == tool
+        if since is not None:
+            recent = cols['timestamp'] >= since
+            mask = recent if mask is None else mask & recent
+        if mask is not None:
+            cols = {name: col[mask] for name, col in cols.items()}
+        
+        counts = np.bincount(cols['quality'], minlength=len(self.quality_names))
+        quality = {self.quality_names[code]: int(n)
+                   for code, n in enumerate(counts.tolist()) if n}
+        return self._summary(
+            len(cols['success']),
+            int(cols['success'].sum()),
+            float(cols['execution_time'].sum()),
+            int(cols['tokens'].sum()),
+            quality,
+        )
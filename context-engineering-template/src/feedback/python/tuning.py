@@ -0,0 +1,310 @@
+"""
+Python Context Tuner - Language Agnostic Implementation
+
+Closes the loop between feedback and context building: joins execution
+metrics with the sections each build included, estimates what every
+section contributes to output quality per token, and shrinks the
+builder's budget and section set where context does not pay for itself.
+"""
+
+import itertools
+import math
+import random
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from feedback import ExecutionMetrics, RunningStats
+from sinks import Sink
+
+
+QUALITY_SCORES = {'excellent': 1.0, 'good': 0.75, 'fair': 0.5, 'poor': 0.25}
+
+
+@dataclass
+class SectionEstimate:
+    """Estimated contribution of one section (or priority level)."""
+    key: str
+    priority: Optional[str]
+    builds_with: int
+    builds_without: int
+    quality_with: float
+    quality_without: float
+    avg_size: float
+    
+    @property
+    def marginal_quality(self) -> float:
+        """Mean quality with the section minus mean quality without."""
+        return self.quality_with - self.quality_without
+    
+    @property
+    def quality_per_unit(self) -> float:
+        """Marginal quality per unit of budget (token or char)."""
+        return self.marginal_quality / self.avg_size if self.avg_size else 0.0
+
+
+@dataclass
+class TuningRecommendation:
+    """A smaller budget and the sections to leave out."""
+    max_length: int
+    drop: List[str]
+    size_saved: float
+    quality_change: float
+    estimates: List[SectionEstimate] = field(default_factory=list)
+    undecided: List[str] = field(default_factory=list)
+
+
+@dataclass
+class _Build:
+    sections: Dict[str, Tuple[str, int]]  # title -> (priority, size)
+    used: int
+
+
+class _Contrast:
+    """Quality with vs without one section (or priority level)."""
+    __slots__ = ('priority', 'quality', 'size')
+    
+    def __init__(self, priority: Optional[str]):
+        self.priority = priority
+        self.quality = RunningStats()
+        self.size = 0
+
+
+class ContextTuner(Sink):
+    """
+    Learns which context is worth its budget from execution feedback.
+    
+    Register each build with observe_build(), put the returned id in the
+    ExecutionMetrics.context_id of executions that used it, and feed the
+    metrics to observe() (or pass the tuner in FeedbackAnalyzer's sinks).
+    For every section the tuner keeps the mean quality of executions
+    whose context included it; comparing that with the overall mean gives
+    the mean quality without it, so each observation costs O(sections in
+    the build). Quality is QUALITY_SCORES[output_quality], or 0 for a
+    failed execution.
+    
+    Sections that are always included cannot be judged; with
+    explore_rate > 0, prepare() occasionally leaves one of them out of a
+    forked builder to collect the missing contrast.
+    """
+    
+    def __init__(self,
+                 min_samples: int = 20,
+                 tolerance: float = 0.02,
+                 headroom: float = 1.1,
+                 explore_rate: float = 0.0,
+                 max_builds: int = 10000,
+                 quality_scores: Optional[Dict[str, float]] = None,
+                 seed: Optional[int] = None):
+        """
+        Initialize tuner.
+        
+        Args:
+            min_samples: Executions needed with and without a section
+                         before it is judged
+            tolerance: Total estimated quality (0-1 scale) recommendations
+                       may give up
+            headroom: Factor applied to the observed size of kept
+                      sections when proposing max_length
+            explore_rate: Chance that prepare() holds a section out
+            max_builds: Builds remembered for joining with metrics
+            quality_scores: Score of each output_quality label
+            seed: Seed of the exploration random generator
+        """
+        self.min_samples = min_samples
+        self.tolerance = tolerance
+        self.headroom = headroom
+        self.explore_rate = explore_rate
+        self.max_builds = max_builds
+        self.quality_scores = quality_scores or QUALITY_SCORES
+        self.unmatched = 0
+        self._builds: 'OrderedDict[str, _Build]' = OrderedDict()
+        self._ids = itertools.count()
+        self._random = random.Random(seed)
+        # observe() may run on the dispatcher thread
+        self._lock = threading.Lock()
+        self._reset()
+    
+    def _reset(self) -> None:
+        self._overall = RunningStats()
+        self._used = RunningStats()
+        self._sections: Dict[str, _Contrast] = {}
+        self._priorities: Dict[str, _Contrast] = {}
+    
+    def prepare(self, builder: Any) -> Any:
+        """
+        Builder to use for the next build.
+        
+        Usually the builder itself; with probability explore_rate a fork
+        without one not-yet-judged section.
+        """
+        if self.explore_rate <= 0 or self._random.random() >= self.explore_rate:
+            return builder
+        candidates = [title for title in builder.sections
+                      if self._without(title) < self.min_samples]
+        if not candidates:
+            return builder
+        return builder.fork().remove_section(self._random.choice(candidates))
+    
+    def observe_build(self, builder: Any, context_id: Optional[str] = None) -> str:
+        """
+        Remember which sections the builder's last build included.
+        
+        Args:
+            builder: ContextBuilder right after build()/build_layout()
+            context_id: Id to use; generated if omitted
+        
+        Returns:
+            The id to set as ExecutionMetrics.context_id
+        """
+        report = builder.last_report
+        if report is None:
+            raise ValueError("builder has not built anything yet")
+        if context_id is None:
+            context_id = f'ctx-{next(self._ids)}'
+        # Sizes in the builder's budget unit, as emitted after trimming
+        sections = {}
+        for title in report.included:
+            section = builder.sections.get(title)
+            if section is not None:
+                sections[title] = (section.priority, report.sizes[title])
+        used = (report.used_tokens if builder.unit == 'tokens'
+                else report.used_length)
+        with self._lock:
+            self._builds[context_id] = _Build(sections, used)
+            self._builds.move_to_end(context_id)
+            while len(self._builds) > self.max_builds:
+                self._builds.popitem(last=False)
+        return context_id
+    
+    def score(self, metrics: ExecutionMetrics) -> float:
+        """Quality of an execution on a 0-1 scale."""
+        if not metrics.success:
+            return 0.0
+        return self.quality_scores.get(metrics.output_quality, 0.0)
+    
+    def observe(self, metrics: ExecutionMetrics) -> bool:
+        """
+        Join one execution with its build.
+        
+        Returns:
+            False if its context_id is unknown
+        """
+        quality = self.score(metrics)
+        with self._lock:
+            build = self._builds.get(metrics.context_id)
+            if build is None:
+                self.unmatched += 1
+                return False
+            self._overall.add(quality)
+            self._used.add(build.used)
+            levels: Dict[str, int] = {}
+            for title, (priority, size) in build.sections.items():
+                self._add(self._sections, title, priority, quality, size)
+                levels[priority] = levels.get(priority, 0) + size
+            for priority, size in levels.items():
+                self._add(self._priorities, priority, priority, quality, size)
+        return True
+    
+    @staticmethod
+    def _add(table: Dict[str, _Contrast], key: str, priority: str,
+             quality: float, size: int) -> None:
+        contrast = table.get(key)
+        if contrast is None:
+            contrast = table[key] = _Contrast(priority)
+        contrast.priority = priority
+        contrast.quality.add(quality)
+        contrast.size += size
+    
+    def write(self, batch: List[ExecutionMetrics]) -> None:
+        """Sink interface: observe a batch of executions."""
+        for metrics in batch:
+            self.observe(metrics)
+    
+    def _without(self, title: str) -> int:
+        contrast = self._sections.get(title)
+        with_count = contrast.quality.count if contrast else 0
+        return self._overall.count - with_count
+    
+    def _estimate(self, key: str, contrast: _Contrast) -> SectionEstimate:
+        overall = self._overall
+        n_with = contrast.quality.count
+        n_without = overall.count - n_with
+        total = overall.mean * overall.count
+        with_total = contrast.quality.mean * n_with
+        return SectionEstimate(
+            key=key,
+            priority=contrast.priority,
+            builds_with=n_with,
+            builds_without=n_without,
+            quality_with=contrast.quality.mean,
+            quality_without=((total - with_total) / n_without
+                             if n_without else math.nan),
+            avg_size=contrast.size / n_with if n_with else 0.0,
+        )
+    
+    def estimates(self) -> List[SectionEstimate]:
+        """Per-section estimates, lowest quality per unit first."""
+        result = [self._estimate(title, contrast)
+                  for title, contrast in self._sections.items()]
+        return sorted(result, key=lambda e: (math.isnan(e.quality_without),
+                                             e.quality_per_unit, e.key))
+    
+    def priority_estimates(self) -> List[SectionEstimate]:
+        """The same estimates aggregated per priority level."""
+        return [self._estimate(level, contrast)
+                for level, contrast in sorted(self._priorities.items())]
+    
+    def recommend(self, builder: Any) -> TuningRecommendation:
+        """
+        Propose sections to drop and a smaller max_length.
+        
+        Sections are considered from the lowest marginal quality per
+        unit up. A section is dropped while the summed quality loss of
+        everything dropped (negative contributions count as zero) stays
+        within tolerance. max_length becomes the observed average build
+        size minus the dropped sections, times headroom, and never
+        grows.
+        """
+        drop: List[str] = []
+        undecided: List[str] = []
+        loss = 0.0
+        saved = 0.0
+        estimates = self.estimates()
+        for estimate in estimates:
+            if estimate.key not in builder.sections:
+                continue
+            if (estimate.builds_with < self.min_samples
+                    or estimate.builds_without < self.min_samples):
+                undecided.append(estimate.key)
+                continue
+            cost = max(estimate.marginal_quality, 0.0)
+            if loss + cost > self.tolerance:
+                break
+            loss += cost
+            drop.append(estimate.key)
+            share = estimate.builds_with / self._overall.count
+            saved += estimate.avg_size * share
+        
+        max_length = builder.max_length
+        if self._used.count:
+            proposed = math.ceil((self._used.mean - saved) * self.headroom)
+            max_length = max(1, min(max_length, proposed))
+        return TuningRecommendation(max_length, drop, saved, -loss,
+                                    estimates, undecided)
+    
+    @staticmethod
+    def apply(builder: Any, recommendation: TuningRecommendation) -> Any:
+        """Remove the dropped sections and lower max_length in place."""
+        for title in recommendation.drop:
+            builder.remove_section(title)
+        builder.max_length = recommendation.max_length
+        return builder
+    
+    def reset(self) -> None:
+        """Forget all observations and builds."""
+        with self._lock:
+            self._builds.clear()
+            self.unmatched = 0
+            self._reset()
@@ -2,10 +2,46 @@
 Code Analyzer - Python Implementation
 
 A language-agnostic tool that analyzes code for complexity and issues.
+Run with paths to analyze whole repositories into JSONL, e.g.
+    python analyze.py src/ --workers 8 --output results.jsonl
 """
 
-from dataclasses import dataclass, field
-from typing import List, Literal, Optional
+import argparse
+import ast
+import builtins
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import asdict, dataclass, field
+from typing import (Dict, Iterable, Iterator, List, Literal, Optional, Set,
+                    Tuple)
+
+
+# Thresholds above which a Python function is reported
+MAX_COMPLEXITY = 10
+MAX_NESTING = 4
+MAX_FUNCTION_LINES = 50
+
+_BUILTINS = frozenset(dir(builtins)) | {
+    '__file__', '__builtins__', '__path__', '__cached__', '__annotations__',
+    '__class__',
+}
+
+# File extension -> language passed to analyze_code()
+LANGUAGES = {
+    '.py': 'python', '.pyi': 'python',
+    '.js': 'javascript', '.jsx': 'javascript', '.mjs': 'javascript',
+    '.ts': 'typescript', '.tsx': 'typescript',
+    '.java': 'java', '.go': 'go', '.rs': 'rust', '.rb': 'ruby',
+    '.c': 'c', '.h': 'c', '.cc': 'cpp', '.cpp': 'cpp', '.hpp': 'cpp',
+    '.cs': 'csharp', '.kt': 'kotlin', '.swift': 'swift', '.php': 'php',
+}
+
+# Directories never descended into
+SKIP_DIRS = frozenset({'.git', '.hg', '.svn', '__pycache__', 'node_modules',
+                       '.venv', 'venv', '.tox', 'build', 'dist'})
 
 
 @dataclass
@@ -28,6 +64,16 @@ class ProofSteps:
     proof_examples: List[ProofStep] = field(default_factory=list)
 
 
+@dataclass
+class FunctionMetrics:
+    """Measurements of one function."""
+    name: str
+    line: int
+    complexity: int
+    nesting_depth: int
+    length: int
+
+
 @dataclass
 class CodeAnalysisResult:
     """Result of code analysis."""
@@ -37,6 +83,471 @@ class CodeAnalysisResult:
     issues: List[str]
     suggestions: List[str]
     proof_steps: Optional[ProofSteps] = None
+    functions: List[FunctionMetrics] = field(default_factory=list)
+
+
+class _Scope:
+    """Names bound and loaded in one Python scope."""
+    __slots__ = ('kind', 'name', 'bound', 'augmented', 'pending',
+                 'unresolved', 'globals', 'nonlocals', 'loops')
+    
+    def __init__(self, kind: str, name: str):
+        self.kind = kind  # module, function, class or comprehension
+        self.name = name
+        self.bound: Set[str] = set()
+        # Names only ever bound by augmented assignment, which reads them
+        self.augmented: Set[str] = set()
+        # Own loads of names not bound yet, first line of each
+        self.pending: Dict[str, int] = {}
+        # Loads from nested functions, resolved against the whole scope
+        self.unresolved: Dict[str, int] = {}
+        self.globals: Set[str] = set()
+        self.nonlocals: Set[str] = set()
+        # Names that became pending inside each enclosing loop
+        self.loops: List[Set[str]] = []
+
+
+class _Frame:
+    """Complexity and nesting of the function being visited."""
+    __slots__ = ('metrics', 'depth')
+    
+    def __init__(self, metrics: FunctionMetrics):
+        self.metrics = metrics
+        self.depth = 0
+
+
+class _PythonVisitor(ast.NodeVisitor):
+    """
+    Single-pass analysis of a Python module.
+    
+    One visit computes each function's cyclomatic complexity (1 + decision
+    points), deepest block nesting and length, and tracks name bindings
+    per scope. A load of a name the same scope binds only later is used
+    before assignment, unless a later iteration of an enclosing loop may
+    have bound it. Loads a scope never binds are passed outwards: loads
+    in nested functions are resolved against everything the enclosing
+    scope binds, since they run later, and whatever the module cannot
+    resolve (or the builtins) is undefined.
+    """
+    
+    def __init__(self):
+        self.module = _Scope('module', '<module>')
+        self.scopes: List[_Scope] = [self.module]
+        self.frames = [_Frame(FunctionMetrics('<module>', 1, 1, 0, 0))]
+        self.functions: List[FunctionMetrics] = []
+        self.issues: List[Tuple[int, str]] = []
+        # (name, line) pairs already reported, one issue each
+        self._reported: Set[Tuple[str, int]] = set()
+        self.dynamic_names = False
+        self._guarded = 0
+    
+    # Names
+    
+    def _binding_scope(self, name: str) -> Optional[_Scope]:
+        scope = self.scopes[-1]
+        if name in scope.globals:
+            return self.module
+        if name in scope.nonlocals:
+            return None
+        return scope
+    
+    def _bind(self, name: str) -> None:
+        scope = self._binding_scope(name)
+        if scope is not None:
+            scope.bound.add(name)
+    
+    def _load(self, name: str, line: int, scope: Optional[_Scope] = None) -> None:
+        if self._guarded:
+            return
+        if scope is None:
+            scope = self.scopes[-1]
+            if name in scope.globals:
+                self.module.unresolved.setdefault(name, line)
+                return
+            if name in scope.nonlocals:
+                self._defer(scope, name, line)
+                return
+        if name in scope.bound or name in scope.pending:
+            return
+        scope.pending[name] = line
+        if scope.loops:
+            scope.loops[-1].add(name)
+    
+    def _parent(self, scope: _Scope) -> _Scope:
+        """Scope that resolves names scope does not bind; skips classes."""
+        index = len(self.scopes) - 1
+        while self.scopes[index] is not scope:
+            index -= 1
+        index -= 1
+        while self.scopes[index].kind == 'class' and index:
+            index -= 1
+        return self.scopes[index]
+    
+    def _defer(self, scope: _Scope, name: str, line: int) -> None:
+        parent = self._parent(scope)
+        if scope.kind == 'function':
+            # Runs later: anything the parent binds by its end will do
+            if name not in parent.bound:
+                parent.unresolved.setdefault(name, line)
+        else:
+            # Class bodies and comprehensions run on the spot
+            self._load(name, line, parent)
+    
+    def _push(self, kind: str, name: str) -> _Scope:
+        scope = _Scope(kind, name)
+        self.scopes.append(scope)
+        return scope
+    
+    def _pop(self) -> None:
+        scope = self.scopes[-1]
+        for name, line in scope.pending.items():
+            # Class bodies look names up outside until bound, and module
+            # code sees builtins until it rebinds them
+            local = (scope.kind == 'function' or scope.kind == 'module'
+                     and name not in _BUILTINS)
+            if local and (name in scope.bound or name in scope.augmented):
+                where = ('module scope' if scope.kind == 'module'
+                         else f"{scope.name}()")
+                self._reported.add((name, line))
+                self.issues.append((line, f"Variable '{name}' is undefined "
+                                          f"before use in {where} (line {line})"))
+            elif scope.kind != 'module':
+                self._defer(scope, name, line)
+        if scope.kind == 'module':
+            if not self.dynamic_names:
+                undefined = {**scope.unresolved, **{
+                    name: line for name, line in scope.pending.items()
+                    if name not in scope.bound}}
+                for name, line in undefined.items():
+                    if (name not in scope.bound and name not in _BUILTINS
+                            and (name, line) not in self._reported):
+                        self.issues.append(
+                            (line, f"Name '{name}' is not defined (line {line})"))
+            return
+        for name, line in scope.unresolved.items():
+            if name not in scope.bound:
+                parent = self._parent(scope)
+                if name not in parent.bound:
+                    parent.unresolved.setdefault(name, line)
+        self.scopes.pop()
+    
+    def visit_Name(self, node: ast.Name) -> None:
+        if isinstance(node.ctx, ast.Store):
+            self._bind(node.id)
+        else:
+            self._load(node.id, node.lineno)
+    
+    def visit_Call(self, node: ast.Call) -> None:
+        # globals().update(...) defines names no visitor can see
+        if isinstance(node.func, ast.Name) and node.func.id == 'globals':
+            self.dynamic_names = True
+        self.generic_visit(node)
+    
+    def visit_Global(self, node: ast.Global) -> None:
+        self.scopes[-1].globals.update(node.names)
+    
+    def visit_Nonlocal(self, node: ast.Nonlocal) -> None:
+        self.scopes[-1].nonlocals.update(node.names)
+    
+    def visit_Import(self, node: ast.Import) -> None:
+        for alias in node.names:
+            self._bind(alias.asname or alias.name.split('.')[0])
+    
+    def visit_ImportFrom(self, node: ast.ImportFrom) -> None:
+        for alias in node.names:
+            if alias.name == '*':
+                self.dynamic_names = True
+            else:
+                self._bind(alias.asname or alias.name)
+    
+    def visit_Assign(self, node: ast.Assign) -> None:
+        self.visit(node.value)
+        for target in node.targets:
+            self.visit(target)
+    
+    def visit_AugAssign(self, node: ast.AugAssign) -> None:
+        target = node.target
+        if not isinstance(target, ast.Name):
+            self.visit(node.value)
+            self.visit(target)
+            return
+        scope = self.scopes[-1]
+        if (self._binding_scope(target.id) is scope
+                and target.id not in scope.bound and not self._guarded):
+            # Never bound before: fails even on a later loop iteration
+            scope.pending.setdefault(target.id, target.lineno)
+            scope.augmented.add(target.id)
+            self.visit(node.value)
+            return
+        self._load(target.id, target.lineno)
+        self.visit(node.value)
+        self._bind(target.id)
+    
+    def visit_AnnAssign(self, node: ast.AnnAssign) -> None:
+        self.visit(node.annotation)
+        if node.value is not None:
+            self.visit(node.value)
+            self.visit(node.target)
+        elif not isinstance(node.target, ast.Name):
+            self.visit(node.target)
+    
+    def visit_NamedExpr(self, node: ast.NamedExpr) -> None:
+        self.visit(node.value)
+        # Binds in the scope that contains the comprehension
+        index = len(self.scopes) - 1
+        while self.scopes[index].kind == 'comprehension':
+            index -= 1
+        self.scopes[index].bound.add(node.target.id)
+    
+    # Scopes
+    
+    def _arguments(self, args: ast.arguments) -> List[ast.arg]:
+        return [*args.posonlyargs, *args.args, *args.kwonlyargs,
+                *filter(None, (args.vararg, args.kwarg))]
+    
+    def _function(self, node) -> None:
+        for decorator in node.decorator_list:
+            self.visit(decorator)
+        for default in (*node.args.defaults, *node.args.kw_defaults):
+            if default is not None:
+                self.visit(default)
+        self._bind(node.name)
+        
+        outer = [scope.name for scope in self.scopes[1:]
+                 if scope.kind != 'comprehension']
+        scope = self._push('function', '.'.join(outer + [node.name]))
+        for param in getattr(node, 'type_params', ()):
+            scope.bound.add(param.name)
+        arguments = self._arguments(node.args)
+        for arg in arguments:
+            if arg.annotation is not None:
+                self.visit(arg.annotation)
+        if node.returns is not None:
+            self.visit(node.returns)
+        scope.bound.update(arg.arg for arg in arguments)
+        
+        metrics = FunctionMetrics(scope.name, node.lineno, 1, 0,
+                                  node.end_lineno - node.lineno + 1)
+        self.functions.append(metrics)
+        self.frames.append(_Frame(metrics))
+        for statement in node.body:
+            self.visit(statement)
+        self.frames.pop()
+        self._pop()
+    
+    visit_FunctionDef = visit_AsyncFunctionDef = _function
+    
+    def visit_Lambda(self, node: ast.Lambda) -> None:
+        for default in (*node.args.defaults, *node.args.kw_defaults):
+            if default is not None:
+                self.visit(default)
+        scope = self._push('function', self.scopes[-1].name)
+        scope.bound.update(arg.arg for arg in self._arguments(node.args))
+        self.visit(node.body)
+        self._pop()
+    
+    def visit_ClassDef(self, node: ast.ClassDef) -> None:
+        for expr in (*node.decorator_list, *node.bases, *node.keywords):
+            self.visit(expr)
+        outer = [scope.name for scope in self.scopes[1:]
+                 if scope.kind != 'comprehension']
+        scope = self._push('class', '.'.join(outer + [node.name]))
+        for param in getattr(node, 'type_params', ()):
+            scope.bound.add(param.name)
+        for statement in node.body:
+            self.visit(statement)
+        self._pop()
+        self._bind(node.name)
+    
+    def _comprehension(self, node, *elements: ast.expr) -> None:
+        # The first iterable is evaluated in the enclosing scope
+        self.visit(node.generators[0].iter)
+        self._push('comprehension', self.scopes[-1].name)
+        for index, generator in enumerate(node.generators):
+            if index:
+                self.visit(generator.iter)
+            self.visit(generator.target)
+            for condition in generator.ifs:
+                self.visit(condition)
+            self.frames[-1].metrics.complexity += 1 + len(generator.ifs)
+        for element in elements:
+            self.visit(element)
+        self._pop()
+    
+    def visit_ListComp(self, node: ast.ListComp) -> None:
+        self._comprehension(node, node.elt)
+    
+    visit_SetComp = visit_GeneratorExp = visit_ListComp
+    
+    def visit_DictComp(self, node: ast.DictComp) -> None:
+        self._comprehension(node, node.key, node.value)
+    
+    def visit_TypeAlias(self, node) -> None:
+        self._bind(node.name.id)
+        scope = self._push('function', self.scopes[-1].name)
+        for param in node.type_params:
+            scope.bound.add(param.name)
+        self.visit(node.value)
+        self._pop()
+    
+    # Control flow
+    
+    def _block(self, statements: List[ast.stmt]) -> None:
+        """Visit statements one nesting level deeper."""
+        frame = self.frames[-1]
+        frame.depth += 1
+        if frame.depth > frame.metrics.nesting_depth:
+            frame.metrics.nesting_depth = frame.depth
+        for statement in statements:
+            self.visit(statement)
+        frame.depth -= 1
+    
+    def _loop(self, node, head: List[ast.AST]) -> None:
+        self.frames[-1].metrics.complexity += 1
+        scope = self.scopes[-1]
+        scope.loops.append(set())
+        for part in head:
+            self.visit(part)
+        self._block(node.body)
+        # Bound later in the loop: an earlier iteration may have set it
+        for name in scope.loops.pop():
+            if name in scope.bound:
+                scope.pending.pop(name, None)
+            elif scope.loops:
+                scope.loops[-1].add(name)
+        if node.orelse:
+            self._block(node.orelse)
+    
+    def visit_For(self, node: ast.For) -> None:
+        self.visit(node.iter)
+        self._loop(node, [node.target])
+    
+    visit_AsyncFor = visit_For
+    
+    def visit_While(self, node: ast.While) -> None:
+        self._loop(node, [node.test])
+    
+    def visit_If(self, node: ast.If) -> None:
+        self.frames[-1].metrics.complexity += 1
+        self.visit(node.test)
+        self._block(node.body)
+        if len(node.orelse) == 1 and isinstance(node.orelse[0], ast.If):
+            self.visit(node.orelse[0])  # elif stays at the same depth
+        elif node.orelse:
+            self._block(node.orelse)
+    
+    def visit_IfExp(self, node: ast.IfExp) -> None:
+        self.frames[-1].metrics.complexity += 1
+        self.generic_visit(node)
+    
+    def visit_BoolOp(self, node: ast.BoolOp) -> None:
+        self.frames[-1].metrics.complexity += len(node.values) - 1
+        self.generic_visit(node)
+    
+    def visit_With(self, node: ast.With) -> None:
+        for item in node.items:
+            self.visit(item)
+        self._block(node.body)
+    
+    visit_AsyncWith = visit_With
+    
+    def visit_Try(self, node: ast.Try) -> None:
+        # try: ... except NameError: probes for names on purpose
+        guarded = any(isinstance(handler.type, ast.Name)
+                      and handler.type.id == 'NameError'
+                      for handler in node.handlers)
+        self._guarded += guarded
+        self._block(node.body)
+        self._guarded -= guarded
+        for handler in node.handlers:
+            self.frames[-1].metrics.complexity += 1
+            if handler.type is not None:
+                self.visit(handler.type)
+            if handler.name:
+                self._bind(handler.name)
+            self._block(handler.body)
+        for block in (node.orelse, node.finalbody):
+            if block:
+                self._block(block)
+    
+    visit_TryStar = visit_Try
+    
+    def visit_Match(self, node) -> None:
+        self.visit(node.subject)
+        for case in node.cases:
+            self.frames[-1].metrics.complexity += 1
+            self.visit(case.pattern)
+            if case.guard is not None:
+                self.visit(case.guard)
+            self._block(case.body)
+    
+    def visit_MatchAs(self, node) -> None:
+        if node.pattern is not None:
+            self.visit(node.pattern)
+        if node.name:
+            self._bind(node.name)
+    
+    def visit_MatchStar(self, node) -> None:
+        if node.name:
+            self._bind(node.name)
+    
+    def visit_MatchMapping(self, node) -> None:
+        self.generic_visit(node)
+        if node.rest:
+            self._bind(node.rest)
+    
+    def run(self, tree: ast.Module) -> None:
+        for statement in tree.body:
+            self.visit(statement)
+        self._pop()
+        self.issues.sort()
+
+
+def _analyze_python(code: str) -> Tuple[Optional[str], List[FunctionMetrics],
+                                        List[str], List[str]]:
+    """
+    Analyze Python source with one AST visit.
+    
+    Returns:
+        (complexity or None on a syntax error, function metrics,
+        issues, suggestions)
+    
+    Raises:
+        RecursionError: Nesting too deep for the parser or the visitor
+    """
+    try:
+        tree = ast.parse(code)
+    except SyntaxError as e:
+        return None, [], [f"Syntax error at line {e.lineno}: {e.msg}"], []
+    
+    visitor = _PythonVisitor()
+    visitor.run(tree)
+    issues = [message for _, message in visitor.issues]
+    suggestions: List[str] = []
+    for metrics in visitor.functions:
+        if metrics.complexity > MAX_COMPLEXITY:
+            issues.append(f"Function '{metrics.name}' has cyclomatic "
+                          f"complexity {metrics.complexity} (line {metrics.line})")
+            suggestions.append(f"Split '{metrics.name}' into smaller functions")
+        if metrics.nesting_depth > MAX_NESTING:
+            issues.append(f"Function '{metrics.name}' nests "
+                          f"{metrics.nesting_depth} levels deep (line {metrics.line})")
+            suggestions.append('Flatten nesting with early returns or helpers')
+        if metrics.length > MAX_FUNCTION_LINES:
+            issues.append(f"Function '{metrics.name}' is quite long "
+                          f"({metrics.length} lines)")
+            suggestions.append('Consider breaking into smaller functions')
+    
+    # Module-level code counts as a function for the overall rating
+    highest = max([visitor.frames[0].metrics.complexity]
+                  + [metrics.complexity for metrics in visitor.functions])
+    if highest <= 5:
+        complexity = 'simple'
+    elif highest <= MAX_COMPLEXITY:
+        complexity = 'moderate'
+    else:
+        complexity = 'complex'
+    return complexity, visitor.functions, issues, list(dict.fromkeys(suggestions))
 
 
 def _generate_proof_tests(
@@ -300,6 +811,11 @@ def analyze_code(
     """
     Analyze code for complexity and issues.
     
+    Python code is parsed and measured per function: complexity is rated
+    from the highest cyclomatic complexity, and issues include names used
+    before assignment or never defined, overly complex, deep or long
+    functions, and syntax errors. Other languages get a size heuristic.
+    
     Args:
         code: Code snippet to analyze
         language: Programming language (python, javascript, etc)
@@ -332,26 +848,38 @@ def analyze_code(
     line_count = len(code.strip().split('\n'))
     char_count = len(code)
     
-    # Determine complexity
-    if line_count <= 5 and char_count < 200:
-        complexity = 'simple'
-    elif line_count <= 30 and char_count < 1000:
-        complexity = 'moderate'
-    else:
-        complexity = 'complex'
-    
-    # Find common issues
+    complexity = None
+    functions: List[FunctionMetrics] = []
     issues = []
     suggestions = []
+    if language == 'python':
+        try:
+            complexity, functions, issues, suggestions = _analyze_python(code)
+        except (RecursionError, MemoryError) as e:
+            return CodeAnalysisResult(
+                success=False,
+                language=language,
+                complexity='complex',
+                issues=[f"Could not analyze: {type(e).__name__}: {e}"],
+                suggestions=[]
+            )
+    elif line_count > 50:
+        issues.append('Function is quite long')
+        suggestions.append('Consider breaking into smaller functions')
+    
+    # Determine complexity from size when the code could not be parsed
+    if complexity is None:
+        if line_count <= 5 and char_count < 200:
+            complexity = 'simple'
+        elif line_count <= 30 and char_count < 1000:
+            complexity = 'moderate'
+        else:
+            complexity = 'complex'
     
     # Check for common patterns
     if 'TODO' in code or 'FIXME' in code:
         issues.append('Contains TODO/FIXME comments')
     
-    if line_count > 50:
-        issues.append('Function is quite long')
-        suggestions.append('Consider breaking into smaller functions')
-    
     if analyze_for:
         if 'performance' in analyze_for:
             suggestions.append('Consider performance impact')
@@ -379,11 +907,195 @@ def analyze_code(
         complexity=complexity,
         issues=issues,
         suggestions=suggestions,
-        proof_steps=proof_steps
+        proof_steps=proof_steps,
+        functions=functions
     )
 
 
+def _walk(paths: Iterable[str]) -> Iterator[Tuple[str, str]]:
+    """Lazily yield (path, language) of every analyzable file."""
+    for path in paths:
+        if not os.path.isdir(path):
+            language = LANGUAGES.get(os.path.splitext(path)[1].lower())
+            if language:
+                yield path, language
+            continue
+        stack = [path]
+        while stack:
+            try:
+                with os.scandir(stack.pop()) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            if (entry.name not in SKIP_DIRS
+                                    and not entry.name.startswith('.')):
+                                stack.append(entry.path)
+                            continue
+                        language = LANGUAGES.get(
+                            os.path.splitext(entry.name)[1].lower())
+                        if language and entry.is_file():
+                            yield entry.path, language
+            except OSError:
+                continue
+
+
+def _failed(language: str, issue: str) -> CodeAnalysisResult:
+    return CodeAnalysisResult(success=False, language=language,
+                              complexity='simple', issues=[issue],
+                              suggestions=[])
+
+
+def _analyze_file(path: str, language: str,
+                  analyze_for: Optional[List[str]],
+                  max_bytes: int) -> CodeAnalysisResult:
+    """Analyze one file; any failure becomes a success=False result."""
+    try:
+        if os.path.getsize(path) > max_bytes:
+            raise ValueError(f"larger than {max_bytes} bytes")
+        with open(path, encoding='utf-8', errors='replace') as f:
+            code = f.read()
+    except (OSError, ValueError) as e:
+        return _failed(language, f"Could not read file: {e}")
+    try:
+        return analyze_code(code, language, analyze_for)
+    except Exception as e:
+        return _failed(language, f"Analysis failed: {type(e).__name__}: {e}")
+
+
+def _analyze_chunk(chunk: List[Tuple[str, str]],
+                   analyze_for: Optional[List[str]],
+                   max_bytes: int) -> List[Tuple[str, CodeAnalysisResult]]:
+    """Worker entry point: files are read in the worker, not shipped."""
+    return [(path, _analyze_file(path, language, analyze_for, max_bytes))
+            for path, language in chunk]
+
+
+def _chunks(files: Iterator[Tuple[str, str]],
+            size: int) -> Iterator[List[Tuple[str, str]]]:
+    chunk = []
+    for item in files:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _cores() -> int:
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def analyze_paths(
+    paths: Iterable[str],
+    analyze_for: Optional[List[str]] = None,
+    workers: Optional[int] = None,
+    chunk_size: int = 32,
+    max_in_flight: Optional[int] = None,
+    max_bytes: int = 2_000_000
+) -> Iterator[Tuple[str, CodeAnalysisResult]]:
+    """
+    Analyze every source file under the given files and directories.
+    
+    Directories are walked lazily and files are sent to a process pool in
+    chunks, so one round trip covers many files. At most max_in_flight
+    chunks are queued at a time, which bounds memory however large the
+    tree is. Results are yielded as chunks complete, so their order is
+    not the walk order.
+    
+    Args:
+        paths: Files and directories to analyze
+        analyze_for: Passed to analyze_code() for every file
+        workers: Worker processes; defaults to the usable cores, and 1
+                 analyzes in this process
+        chunk_size: Files per task sent to a worker
+        max_in_flight: Chunks queued at once; defaults to 4 per worker
+        max_bytes: Larger files are reported as unreadable
+    
+    Yields:
+        (path, CodeAnalysisResult) for each file
+    
+    Example:
+        >>> for path, result in analyze_paths(['src']):
+        ...     print(path, result.complexity)
+    """
+    workers = workers or _cores()
+    chunks = _chunks(_walk(paths), chunk_size)
+    if workers == 1:
+        for chunk in chunks:
+            yield from _analyze_chunk(chunk, analyze_for, max_bytes)
+        return
+    
+    def collect(future: Future) -> List[Tuple[str, CodeAnalysisResult]]:
+        chunk = pending.pop(future)
+        try:
+            return future.result()
+        except Exception as e:
+            # A worker that died takes only its own chunk down
+            issue = f"Worker failed: {type(e).__name__}: {e}"
+            return [(path, _failed(language, issue)) for path, language in chunk]
+    
+    limit = max_in_flight or 4 * workers
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending: Dict[Future, List[Tuple[str, str]]] = {}
+        for chunk in chunks:
+            future = pool.submit(_analyze_chunk, chunk, analyze_for, max_bytes)
+            pending[future] = chunk
+            if len(pending) < limit:
+                continue
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield from collect(future)
+        for future in list(pending):
+            yield from collect(future)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command line entry point: analyze paths and write JSONL."""
+    parser = argparse.ArgumentParser(
+        description='Analyze source files for complexity and issues.')
+    parser.add_argument('paths', nargs='+', help='files or directories')
+    parser.add_argument('--analyze-for', action='append',
+                        help='aspect to analyze (repeatable)')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='worker processes (default: usable cores)')
+    parser.add_argument('--chunk-size', type=int, default=32,
+                        help='files per worker task')
+    parser.add_argument('--output', default='-',
+                        help='JSONL file to write (default: stdout)')
+    args = parser.parse_args(argv)
+    
+    missing = [path for path in args.paths if not os.path.exists(path)]
+    for path in missing:
+        print(f"{parser.prog}: no such file or directory: {path}",
+              file=sys.stderr)
+    paths = [path for path in args.paths if path not in missing]
+    if not paths:
+        return 2
+    
+    out = sys.stdout if args.output == '-' else open(args.output, 'w',
+                                                     encoding='utf-8')
+    start = time.perf_counter()
+    count = failed = 0
+    try:
+        for path, result in analyze_paths(paths, args.analyze_for,
+                                          args.workers, args.chunk_size):
+            out.write(json.dumps({'path': path, **asdict(result)}) + '\n')
+            count += 1
+            failed += not result.success
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(f"Analyzed {count} files ({failed} failed) in "
+          f"{time.perf_counter() - start:.1f}s", file=sys.stderr)
+    return 2 if missing else 0
+
+
 if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        sys.exit(main())
+    
     # Example 1: Basic analysis
     print("=" * 60)
     print("EXAMPLE 1: Basic Code Analysis")
@@ -0,0 +1,16 @@
+"""
+Shared test setup.
+
+The Python implementations import their siblings by bare module name,
+so their directories go on sys.path the same way the examples do it.
+"""
+
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+for directory in ('src/tools/examples/code-analyzer/python',
+                  'src/feedback/python',
+                  'src/context/python'):
+    sys.path.insert(0, os.path.join(ROOT, directory))
@@ -0,0 +1,161 @@
+"""Tests for the code analyzer."""
+
+import json
+import os
+import textwrap
+
+import analyze
+from analyze import analyze_code, analyze_paths, main
+
+
+def _python(code):
+    return analyze_code(textwrap.dedent(code), 'python')
+
+
+def test_variable_used_before_assignment():
+    result = _python('''
+        def sum_values(items):
+            for item in items:
+                total += item.get('value', 0)
+            return total
+    ''')
+    assert result.success
+    assert result.issues == [
+        "Variable 'total' is undefined before use in sum_values() (line 4)"]
+
+
+def test_forward_references_and_loops_are_not_flagged():
+    result = _python('''
+        import os
+        
+        def first():
+            return second() + LIMIT
+        
+        def second():
+            for i in range(3):
+                if i:
+                    print(last)
+                last = i
+            return len(os.sep)
+        
+        LIMIT = 3
+        
+        class Config:
+            size = LIMIT
+            double = size * 2
+    ''')
+    assert result.issues == []
+
+
+def test_class_body_runs_before_later_module_bindings():
+    result = _python('''
+        class Config:
+            size = LIMIT
+        
+        LIMIT = 3
+    ''')
+    assert result.issues == [
+        "Variable 'LIMIT' is undefined before use in module scope (line 3)"]
+
+
+def test_undefined_names_reported_once_per_line():
+    result = analyze_code('total += item\n', 'python')
+    assert result.issues == [
+        "Name 'item' is not defined (line 1)",
+        "Variable 'total' is undefined before use in module scope (line 1)",
+    ]
+
+
+def test_function_metrics():
+    result = _python('''
+        def branchy(a, b):
+            if a and b:
+                for x in a:
+                    while x:
+                        x -= 1
+            elif b:
+                return [y for y in b if y]
+            return a if a else b
+    ''')
+    (metrics,) = result.functions
+    assert metrics.name == 'branchy'
+    # if, and, for, while, elif, comprehension + its filter, conditional
+    assert metrics.complexity == 1 + 8
+    assert metrics.nesting_depth == 3
+    assert metrics.length == 8
+    assert result.complexity == 'moderate'
+
+
+def test_syntax_error_is_an_issue():
+    result = analyze_code('def broken(:\n    pass\n', 'python')
+    assert result.success
+    assert result.issues[0].startswith('Syntax error at line 1')
+
+
+def test_deeply_nested_input_does_not_crash():
+    result = analyze_code('x = ' + '+'.join(['1'] * 3000), 'python')
+    assert not result.success
+    assert 'RecursionError' in result.issues[0]
+    
+    result = analyze_code('x = ' + '(' * 300 + ')' * 300, 'python')
+    assert result.issues[0].startswith('Syntax error')
+
+
+def test_other_languages_use_size_heuristic():
+    result = analyze_code('function f() { return 1 }', 'javascript')
+    assert result.complexity == 'simple'
+    assert result.functions == []
+
+
+def _tree(tmp_path):
+    (tmp_path / 'pkg').mkdir()
+    (tmp_path / 'pkg' / 'ok.py').write_text('def f(a):\n    return a\n')
+    (tmp_path / 'pkg' / 'deep.py').write_text('x = ' + '+'.join(['1'] * 3000))
+    (tmp_path / 'pkg' / 'app.js').write_text('function f() { return 1 }\n')
+    (tmp_path / 'pkg' / 'notes.txt').write_text('not code')
+    (tmp_path / 'node_modules').mkdir()
+    (tmp_path / 'node_modules' / 'skip.js').write_text('x')
+    return tmp_path
+
+
+def test_analyze_paths_streams_every_file(tmp_path):
+    root = _tree(tmp_path)
+    for workers in (1, 2):
+        results = dict(analyze_paths([str(root)], workers=workers,
+                                     chunk_size=1, max_in_flight=1))
+        names = {os.path.basename(path): result
+                 for path, result in results.items()}
+        assert set(names) == {'ok.py', 'deep.py', 'app.js'}
+        assert names['ok.py'].success
+        assert names['app.js'].language == 'javascript'
+        # One file the analyzer cannot handle does not stop the run
+        assert not names['deep.py'].success
+
+
+def test_analyze_file_turns_any_error_into_a_result(tmp_path, monkeypatch):
+    path = tmp_path / 'a.py'
+    path.write_text('x = 1\n')
+    
+    def explode(*args):
+        raise KeyError('boom')
+    
+    monkeypatch.setattr(analyze, 'analyze_code', explode)
+    result = analyze._analyze_file(str(path), 'python', None, 1000)
+    assert not result.success
+    assert 'KeyError' in result.issues[0]
+
+
+def test_cli_writes_jsonl_and_reports_missing_paths(tmp_path, capsys):
+    root = _tree(tmp_path)
+    out = tmp_path / 'out.jsonl'
+    assert main([str(root / 'pkg'), '--workers', '1', '--output', str(out)]) == 0
+    records = [json.loads(line) for line in out.read_text().splitlines()]
+    assert len(records) == 3
+    assert {'path', 'success', 'complexity', 'issues', 'functions'} <= set(records[0])
+    
+    assert main([str(tmp_path / 'nope'), '--workers', '1']) == 2
+    assert 'no such file or directory' in capsys.readouterr().err
+    
+    assert main([str(tmp_path / 'nope'), str(root / 'pkg' / 'ok.py'),
+                 '--workers', '1', '--output', str(out)]) == 2
+    assert len(out.read_text().splitlines()) == 1
@@ -0,0 +1,421 @@
+"""Tests for the context builder."""
+
+import asyncio
+import copy
+import gc
+import io
+import itertools
+import pickle
+import random
+import threading
+import time
+
+import pytest
+
+import builder as builder_module
+from builder import (SEPARATOR, ContextBuilder, _pack_optimal, amerge_context_streams,
+                     merge_context_streams, merge_contexts, trim_content)
+from tokenizer import Tokenizer
+
+
+def _best_value(costs, values, capacity):
+    best = 0.0
+    for r in range(len(costs) + 1):
+        for combo in itertools.combinations(range(len(costs)), r):
+            if sum(costs[i] for i in combo) <= capacity:
+                best = max(best, sum(values[i] for i in combo))
+    return best
+
+
+def test_optimal_packing_matches_brute_force():
+    rng = random.Random(7)
+    for _ in range(200):
+        n = rng.randint(0, 9)
+        costs = [rng.randint(1, 60) for _ in range(n)]
+        values = [rng.choice((10, 50, 100)) * rng.random() + 1 for _ in range(n)]
+        capacity = rng.randint(0, 200)
+        chosen = _pack_optimal(costs, values, capacity)
+        assert sum(costs[i] for i in chosen) <= capacity
+        assert abs(sum(values[i] for i in chosen)
+                   - _best_value(costs, values, capacity)) < 1e-9
+
+
+def test_optimal_packing_is_bounded_on_adversarial_input(monkeypatch):
+    # Equal values and near-equal sizes defeat the fractional bound
+    rng = random.Random(3)
+    sizes = [rng.randint(100, 106) for _ in range(32)]
+    builder = ContextBuilder(max_length=1500, packing='optimal')
+    for i, size in enumerate(sizes):
+        title = f'Section {i}'
+        builder.add_section(title, 'x' * (size - len(f'## {title}\n\n')))
+    
+    start = time.perf_counter()
+    builder.build()
+    assert time.perf_counter() - start < 2.0
+    dp_included = len(builder.last_report.included)
+    
+    # Same input through branch and bound with its node budget
+    monkeypatch.setattr(builder_module, '_OPTIMAL_DP_CELLS', 0)
+    start = time.perf_counter()
+    builder.build()
+    assert time.perf_counter() - start < 5.0
+    assert len(builder.last_report.included) == dp_included
+    assert builder.last_report.used_length <= 1500
+
+
+def test_sync_provider_timeout_bounds_build_latency():
+    release = threading.Event()
+    
+    def stuck():
+        release.wait(5)
+        return 'late'
+    
+    builder = ContextBuilder()
+    builder.add_section('Task', 'Do the thing.', 'high')
+    builder.add_provider('Slow', stuck, size_hint=10, timeout=0.2)
+    builder.add_provider('Fast', lambda: 'fresh data', size_hint=10)
+    try:
+        start = time.perf_counter()
+        context, _ = builder.build()
+        elapsed = time.perf_counter() - start
+    finally:
+        release.set()
+    
+    assert elapsed < 1.0
+    assert 'fresh data' in context
+    dropped = {d.title: d.reason for d in builder.last_report.dropped}
+    assert dropped == {'Slow': 'provider_timeout'}
+
+
+async def _late():
+    return 'async data'
+
+
+def test_async_and_failing_providers():
+    def broken():
+        raise RuntimeError('backend down')
+    
+    builder = ContextBuilder()
+    builder.add_provider('Async', _late, size_hint=10)
+    builder.add_provider('Broken', broken, size_hint=10)
+    context, _ = builder.build()
+    assert 'async data' in context
+    dropped = {d.title: d.reason for d in builder.last_report.dropped}
+    assert dropped == {'Broken': 'provider_error'}
+
+
+def test_token_budget_holds_for_the_joined_text():
+    rng = random.Random(0)
+    words = 'alpha beta ep- si-lon : ; ,. \n - ## ** x1 2 33 ..'.split(' ')
+    for _ in range(300):
+        builder = ContextBuilder(max_length=rng.randint(20, 400), unit='tokens',
+                                 packing=rng.choice(('ordered', 'greedy', 'optimal')),
+                                 layout=rng.choice(('priority', 'stable')))
+        for i in range(rng.randint(1, 12)):
+            content = ''.join(rng.choice(words) + rng.choice(('', ' ', '\n'))
+                              for _ in range(rng.randint(1, 60)))
+            builder.add_section(f'S{i}', content,
+                                rng.choice(('high', 'medium', 'low')),
+                                trim=rng.choice(('never', 'head', 'tail')),
+                                volatile=rng.random() < 0.3)
+        context, _ = builder.build()
+        used = builder.count_tokens(context)
+        assert used <= builder.max_length
+        assert builder.last_report.used_tokens == used
+        assert len(builder.last_report.included) == len(builder.last_report.sizes)
+
+
+def test_token_fit_counts_the_joined_text_at_most_twice(monkeypatch):
+    rng = random.Random(0)
+    words = ['alpha', 'beta', 'gamma', 'delta', 'x', 'y', '(', ')', '{', '}',
+             '.', ',']
+    builder = ContextBuilder(max_length=20000, unit='tokens')
+    for i in range(3000):
+        builder.add_section(f'S{i}', ' '.join(rng.choice(words)
+                                              for _ in range(rng.randint(3, 12))),
+                            rng.choice(('high', 'medium', 'low')))
+    inner = builder.tokenizer.tokenizer
+    joined = []
+    count = inner.count
+    
+    def counting(text):
+        if len(text) > 10000:
+            joined.append(text)
+        return count(text)
+    
+    monkeypatch.setattr(inner, 'count', counting)
+    builder.get_stats()  # caches every section's count
+    cached = len(builder.tokenizer._cache)
+    joined.clear()
+    context, _ = builder.build()
+    assert len(joined) <= 2
+    assert builder.last_report.used_tokens == count(context) <= 20000
+    # Joined texts stay out of the shared per-section count cache
+    assert len(builder.tokenizer._cache) == cached
+
+
+def test_stats_do_not_tokenize_character_builders(monkeypatch):
+    builder = ContextBuilder()
+    builder.add_section('A', 'some words here')
+    
+    def refuse(*args):
+        raise AssertionError('tokenized a chars builder')
+    
+    monkeypatch.setattr(builder.tokenizer, 'count', refuse)
+    stats = builder.get_stats()
+    assert 'total_tokens' not in stats
+    assert stats['within_limit']
+    monkeypatch.undo()
+    
+    tokens = ContextBuilder(unit='tokens')
+    tokens.add_section('A', 'some words here')
+    assert tokens.get_stats()['total_tokens'] == tokens.total_tokens
+
+
+def _library():
+    builder = ContextBuilder(max_length=400, unit='tokens', dedup=True)
+    builder.add_section('Role', 'You review Python code.', 'high')
+    builder.add_section('Style', 'Prefer small functions.\n\nName things well.',
+                        'medium', trim='tail')
+    builder.add_section('Notes', 'Background reading. ' * 20, 'low', trim='tail')
+    return builder
+
+
+def test_builders_and_sections_pickle_and_deepcopy():
+    builder = _library()
+    expected = builder.build(query='python style')
+    stats = builder.get_stats()
+    pickle.dumps(builder.sections['Role'])
+    for clone in (pickle.loads(pickle.dumps(builder)), copy.deepcopy(builder)):
+        assert clone.build(query='python style') == expected
+        assert clone.get_stats() == stats
+        assert clone.tokenizer is builder.tokenizer
+        # The copy watches its own sections
+        clone.sections['Role'].content = 'You review Python and Rust code.'
+        assert clone.get_stats()['total_length'] > stats['total_length']
+        assert builder.get_stats() == stats
+
+
+def test_loaded_snapshot_pickles(tmp_path):
+    path = str(tmp_path / 'library.ctx')
+    _library().save(path)
+    loaded = ContextBuilder.load(path)
+    clone = pickle.loads(pickle.dumps(loaded))
+    assert clone.build() == loaded.build()
+
+
+def test_fork_totals_follow_in_place_edits_after_parent_is_gone():
+    base = ContextBuilder()
+    base.add_section('Guide', 'short', 'high')
+    fork = base.fork()
+    fork.add_section('Task', 'do it', 'medium')
+    shared = fork.sections['Guide']
+    del base
+    gc.collect()
+    shared.content = 'a much longer guide than before ' * 3
+    assert fork.get_stats()['total_length'] == sum(
+        len(str(s)) for s in fork.sections.values())
+
+
+def test_forks_pickle_without_their_parent():
+    base = _library()
+    fork = base.fork()
+    fork.add_section('Task', 'Review this diff.', 'high')
+    clone = pickle.loads(pickle.dumps(fork))
+    assert clone.build(query='review') == fork.build(query='review')
+    assert copy.deepcopy(fork).get_stats() == fork.get_stats()
+
+
+def _mixed(max_length=1000):
+    builder = ContextBuilder(max_length=max_length)
+    builder.add_section('Role', 'You review Python code.', 'high')
+    builder.add_section('Style', 'Prefer small functions.\n\nName things well.  \n',
+                        'medium', trim='tail')
+    builder.add_section('Diff', 'def f(x):\n    return x * 2\n', 'medium',
+                        volatile=True)
+    builder.add_section('Notes', 'Background reading about style. ' * 20, 'low',
+                        trim='head')
+    return builder
+
+
+def test_streamed_builds_match_build():
+    for max_length in (40, 200, 1000, 5000):
+        builder = _mixed(max_length)
+        for kwargs in ({}, {'packing': 'optimal'}, {'layout': 'stable'},
+                       {'query': 'python style'}, {'top_k': 2}):
+            expected = builder.build(**kwargs)
+            report = builder.last_report
+            assert ''.join(builder.build_iter(**kwargs)) == expected[0]
+            assert builder.last_report == report
+            out = io.StringIO()
+            assert builder.build_into(out, **kwargs) == (len(expected[0]),
+                                                         expected[1])
+            assert out.getvalue() == expected[0]
+
+
+def test_trim_policies_keep_their_end_within_limit():
+    paragraphs = [f'Paragraph {i} has a few sentences. It ends here.'
+                  for i in range(20)]
+    content = '\n\n'.join(paragraphs)
+    marker = builder_module.TRUNCATION_MARKER
+    assert trim_content(content, len(content), 'head') == content
+    for limit in (60, 200, 500):
+        assert trim_content(content, limit, 'never') is None
+        head = trim_content(content, limit, 'head')
+        tail = trim_content(content, limit, 'tail')
+        both = trim_content(content, limit, 'head_tail')
+        for text in (head, tail, both):
+            assert len(text) <= limit and text.count(marker) == 1
+        assert head.startswith('Paragraph 0 ') and head.endswith(marker)
+        assert tail.startswith(marker) and tail.endswith('It ends here.')
+        assert both.startswith('Paragraph 0 ') and both.endswith('It ends here.')
+        # Cuts land on boundaries, not inside words
+        kept = head[:-len(marker)].rstrip()
+        assert content.startswith(kept) and content[len(kept)] in ' \n'
+        kept = tail[len(marker):].lstrip()
+        assert content.endswith(kept) and content[-len(kept) - 1] in ' \n'
+    assert trim_content(content, 10, 'head') is None
+    with pytest.raises(ValueError):
+        trim_content(content, 10, 'middle')
+
+
+def test_builder_fills_leftover_budget_with_trimmed_sections():
+    for policy in ('head', 'tail', 'head_tail'):
+        builder = ContextBuilder(max_length=300)
+        builder.add_section('Role', 'You review Python code.', 'high')
+        builder.add_section('Notes', 'Background reading. ' * 40, 'low',
+                            trim=policy)
+        builder.add_section('Fixed', 'Keep me whole. ' * 40, 'medium')
+        context, truncated = builder.build()
+        report = builder.last_report
+        assert truncated and report.trimmed == ['Notes']
+        assert report.included == ['Role', 'Notes']
+        assert len(context) <= report.used_length <= 300
+        assert builder_module.TRUNCATION_MARKER in context
+        assert [d.title for d in report.dropped] == ['Fixed']
+
+
+def _streams(rng):
+    streams = []
+    for _ in range(rng.randint(1, 5)):
+        priorities = sorted((rng.randint(0, 9) for _ in range(rng.randint(0, 8))),
+                            reverse=True)
+        streams.append([('x' * rng.randint(1, 40), p) for p in priorities])
+    return streams
+
+
+def _expected_merge(streams, max_length, on_overflow):
+    ordered = sorted(((-p, s, i, c) for s, stream in enumerate(streams)
+                      for i, (c, p) in enumerate(stream)))
+    merged, used = [], 0
+    for _, _, _, content in ordered:
+        cost = len(content) + (len(SEPARATOR) if merged else 0)
+        if used + cost <= max_length:
+            merged.append(content)
+            used += cost
+        elif on_overflow == 'stop':
+            break
+        if max_length - used <= len(SEPARATOR):
+            break
+    return merged
+
+
+async def _agen(items):
+    for item in items:
+        await asyncio.sleep(0)
+        yield item
+
+
+def test_stream_merge_respects_budget_and_matches_async():
+    rng = random.Random(11)
+    for _ in range(300):
+        streams = _streams(rng)
+        max_length = rng.randint(0, 150)
+        on_overflow = rng.choice(('stop', 'skip'))
+        merged = list(merge_context_streams(*streams, max_length=max_length,
+                                            on_overflow=on_overflow))
+        assert merged == _expected_merge(streams, max_length, on_overflow)
+        assert len(SEPARATOR.join(merged)) <= max_length
+        
+        async def collect():
+            sources = [_agen(s) if i % 2 else s for i, s in enumerate(streams)]
+            return [c async for c in amerge_context_streams(
+                *sources, max_length=max_length, on_overflow=on_overflow)]
+        
+        assert asyncio.run(collect()) == merged
+
+
+def test_stream_merge_stops_pulling_once_full():
+    pulled = []
+    
+    def stream(name):
+        for i in range(1000):
+            pulled.append(name)
+            yield f'{name}{i:04d}', 1000 - i
+    
+    merged = list(merge_context_streams(stream('a'), stream('b'), max_length=50))
+    assert merged == ['a0000', 'b0000', 'a0001', 'b0001', 'a0002', 'b0002',
+                      'a0003']
+    assert len(pulled) <= 9
+
+
+class _Words(Tokenizer):
+    name = 'test-words'
+    
+    def count(self, text):
+        return len(text.split())
+
+
+def test_merge_contexts_in_tokens():
+    contexts = [('low ' * 5, 1), ('high ' * 5, 3), ('mid ' * 5, 2)]
+    assert merge_contexts(contexts) == SEPARATOR.join(
+        c for c, _ in sorted(contexts, key=lambda x: x[1], reverse=True))
+    merged = merge_contexts(contexts, max_length=12, tokenizer=_Words())
+    assert merged == SEPARATOR.join(['high ' * 5, 'mid ' * 5])
+
+
+def test_prefix_hash_ignores_volatile_sections():
+    first = _mixed()
+    second = _mixed()
+    second.add_section('Diff', 'def g(y):\n    return y + 1\n', 'medium',
+                       volatile=True)
+    second.add_section('Time', 'It is 10:42.', 'high', volatile=True)
+    a, b = first.build_layout(), second.build_layout()
+    assert a.text != b.text
+    assert a.prefix_hash == b.prefix_hash and a.prefix_end == b.prefix_end
+    assert a.text[:a.prefix_end] == b.text[:b.prefix_end]
+    assert [s.title for s in a.spans if not s.volatile] == ['Role', 'Style', 'Notes']
+    for span in a.spans:
+        assert f'## {span.title}\n' in a.text[span.start:span.end]
+    
+    second.sections['Notes'].content = 'Different background.'
+    assert second.build_layout().prefix_hash != a.prefix_hash
+    assert first.build_layout(layout='priority').prefix_end < a.prefix_end
+
+
+def test_session_reports_changes_between_turns():
+    builder = _mixed()
+    session = builder.session()
+    delta = session.build()
+    assert [s.title for s in delta.added] == ['Role', 'Style', 'Notes', 'Diff']
+    assert delta.common_prefix == 0 and delta.text == builder.build_layout().text
+    
+    delta = session.build()
+    assert not delta.has_changes
+    assert delta.common_prefix == delta.spans[-1].end
+    previous = delta.text
+    
+    builder.sections['Diff'].content = 'def h():\n    pass\n'
+    builder.add_section('Question', 'Is this safe?', 'low', volatile=True)
+    builder.remove_section('Notes')
+    delta = session.build()
+    assert [s.title for s in delta.added] == ['Question']
+    assert [s.title for s in delta.removed] == ['Notes']
+    assert [(old.title, new.title) for old, new in delta.changed] == [('Diff', 'Diff')]
+    assert delta.unchanged == ['Role', 'Style']
+    assert delta.text == builder.build_layout().text
+    assert delta.text[:delta.common_prefix] == previous[:delta.common_prefix]
+    assert delta.common_prefix == delta.spans[1].end
+    
+    session.reset()
+    assert len(session.build().added) == 4
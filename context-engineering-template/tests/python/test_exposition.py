@@ -0,0 +1,70 @@
+"""Tests for the OpenMetrics exposition."""
+
+import re
+import urllib.request
+
+from exposition import CONTENT_TYPE, MetricsExporter, render
+from feedback import ExecutionMetrics, FeedbackAnalyzer
+
+SAMPLE = re.compile(r'^[a-z_]+(\{[^}]*\})? [0-9.e+-]+$')
+
+
+def _analyzer():
+    analyzer = FeedbackAnalyzer(sinks=[])
+    for i, time in enumerate((0.5, 3.0, 7.0, 40.0, 20000.0)):
+        analyzer.record(ExecutionMetrics('search', 1000.0 + i, i != 2, time, 10,
+                                         'good'))
+    analyzer.record(ExecutionMetrics('say "hi"\\now', 2000.0, True, 2.0, 1, 'poor'))
+    return analyzer
+
+
+def test_render_is_valid_openmetrics():
+    text = render(_analyzer())
+    lines = text.splitlines()
+    assert text.endswith('# EOF\n') and lines.count('# EOF') == 1
+    for line in lines[:-1]:
+        assert line.startswith(('# TYPE ', '# HELP ', '# UNIT ')) or SAMPLE.match(line), line
+    assert 'context_tool_executions_total{tool="search"} 5' in lines
+    assert 'context_tool_successes_total{tool="search"} 4' in lines
+    assert 'context_tool_context_tokens_total{tool="search"} 50' in lines
+    assert 'context_tool_outputs_total{quality="good"} 5' in lines
+    assert 'context_tool_executions_total{tool="say \\"hi\\"\\\\now"} 1' in lines
+    assert '# UNIT context_tool_execution_seconds seconds' in lines
+    
+    buckets = [line for line in lines
+               if line.startswith('context_tool_execution_seconds_bucket{tool="search"')]
+    counts = [int(line.rsplit(' ', 1)[1]) for line in buckets]
+    assert counts == sorted(counts) and counts[-1] == 5
+    assert buckets[0] == 'context_tool_execution_seconds_bucket{tool="search",le="0.001"} 1'
+    assert buckets[-2].endswith('le="10.0"} 4') and buckets[-1].endswith('le="+Inf"} 5')
+    assert 'context_tool_execution_seconds_count{tool="search"} 5' in lines
+    assert 'context_tool_execution_seconds_sum{tool="search"} 20.0505' in lines
+
+
+def test_exporter_renders_again_only_after_new_data(tmp_path):
+    analyzer = _analyzer()
+    exporter = MetricsExporter(analyzer)
+    first = exporter.render()
+    assert exporter.render() is first and exporter.renders == 1
+    path = str(tmp_path / 'tools.prom')
+    assert exporter.write_file(path)
+    assert not exporter.write_file(path)
+    
+    analyzer.record(ExecutionMetrics('search', 3000.0, True, 1.0, 0, 'good'))
+    second = exporter.render()
+    assert second != first and exporter.renders == 2
+    assert 'context_tool_executions_total{tool="search"} 6' in second
+    assert exporter.write_file(path)
+    with open(path, encoding='utf-8') as f:
+        assert f.read() == second
+
+
+def test_exporter_serves_metrics_over_http():
+    exporter = MetricsExporter(_analyzer())
+    host, port = exporter.serve(port=0)
+    try:
+        with urllib.request.urlopen(f'http://{host}:{port}/metrics', timeout=10) as response:
+            assert response.headers['Content-Type'] == CONTENT_TYPE
+            assert response.read().decode('utf-8') == exporter.render()
+    finally:
+        exporter.close()
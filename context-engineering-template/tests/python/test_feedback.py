@@ -0,0 +1,165 @@
+"""Tests for the feedback analyzer and its sinks."""
+
+import os
+import random
+import statistics
+import subprocess
+import sys
+import textwrap
+from collections import Counter
+
+import pytest
+
+from feedback import ExecutionMetrics, FeedbackAnalyzer, RunningStats
+from sinks import CallbackSink
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _metrics(tool='tool', time=10.0, success=True):
+    return ExecutionMetrics(tool, None, success, time, 5, 'good')
+
+
+def test_default_output_is_written_before_exit():
+    script = textwrap.dedent('''
+        import sys
+        sys.path.insert(0, 'src/feedback/python')
+        from feedback import ExecutionMetrics, FeedbackAnalyzer
+        
+        analyzer = FeedbackAnalyzer()
+        for i in range(3):
+            analyzer.record(ExecutionMetrics(f'tool{i}', None, True, 1.0, 0, 'good'))
+    ''')
+    result = subprocess.run([sys.executable, '-c', script], cwd=ROOT,
+                            capture_output=True, text=True, timeout=30)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.count('✅ Recorded:') == 3
+
+
+def test_sinks_receive_batches_and_reset_is_silent(capsys):
+    received = []
+    analyzer = FeedbackAnalyzer(sinks=[CallbackSink(received.extend)])
+    for i in range(10):
+        analyzer.record(_metrics(time=float(i)))
+    assert analyzer.flush(5)
+    assert [m.execution_time for m in received] == [float(i) for i in range(10)]
+    
+    analyzer.reset()
+    assert analyzer.analyze()['total_executions'] == 0
+    analyzer.close()
+    assert capsys.readouterr().out == ''
+
+
+def test_average_latency_uses_the_configured_threshold():
+    for threshold, expected in ((100, True), (1000, False)):
+        analyzer = FeedbackAnalyzer(sinks=[], latency_threshold=threshold)
+        for i in range(5):
+            analyzer.record(ExecutionMetrics('tool', 1000.0 + i, True, 200.0, 0, 'good'))
+        reasons = [r.reason for r in analyzer.analyze()['recommendations']]
+        assert any(r.startswith('Avg time') for r in reasons) is expected
+
+
+def test_report_counts_the_percentile_window():
+    analyzer = FeedbackAnalyzer(sinks=[], window_ms=1000, windows=2)
+    for i in range(5):
+        analyzer.record(ExecutionMetrics('tool', 1000.0 + i, True, 10.0, 0, 'good'))
+    for i in range(3):
+        analyzer.record(ExecutionMetrics('tool', 60_000.0 + i, True, 20.0, 0, 'good'))
+    report = analyzer.report()
+    assert '## Tool Latency (last 2s)' in report
+    assert '- tool: p50 20ms' in report and '(3 executions)' in report
+    assert 'Total Executions: 8' in report
+
+
+def _regressions(analyzer):
+    return [r for r in analyzer.analyze()['recommendations']
+            if 'latency regression' in r.change]
+
+
+def _feed(analyzer, start, count, level):
+    for i in range(count):
+        analyzer.record(ExecutionMetrics('tool', float(start + i), True,
+                                         level * (1 + 0.02 * (i % 5)), 0, 'good'))
+    return start + count
+
+
+def test_regression_alert_fires_and_clears_on_recovery():
+    raised = []
+    analyzer = FeedbackAnalyzer(sinks=[], on_alert=raised.append)
+    at = _feed(analyzer, 0, 100, 10.0)
+    assert not raised and not _regressions(analyzer)
+    at = _feed(analyzer, at, 50, 40.0)
+    assert len(raised) == 1
+    assert _regressions(analyzer) == raised
+    at = _feed(analyzer, at, 50, 40.0)
+    assert _regressions(analyzer) == raised
+    _feed(analyzer, at, 500, 10.0)
+    assert _regressions(analyzer) == []
+    assert list(analyzer.alerts) == raised
+
+
+def test_regression_alert_ages_out_after_the_window():
+    analyzer = FeedbackAnalyzer(sinks=[], window_ms=1000, windows=2)
+    at = _feed(analyzer, 0, 100, 10.0)
+    _feed(analyzer, at, 50, 40.0)
+    assert len(_regressions(analyzer)) == 1
+    _feed(analyzer, 1500, 10, 40.0)
+    assert len(_regressions(analyzer)) == 1
+    _feed(analyzer, 5000, 10, 40.0)
+    assert _regressions(analyzer) == []
+
+
+def test_running_aggregates_match_a_full_recompute():
+    rng = random.Random(2)
+    analyzer = FeedbackAnalyzer(sinks=[])
+    recorded = []
+    for i in range(2000):
+        metrics = ExecutionMetrics(rng.choice(('a', 'b', 'c')), 1000.0 + i,
+                                   rng.random() < 0.7,
+                                   rng.lognormvariate(3, 1) + 1e6,
+                                   rng.randrange(500),
+                                   rng.choice(('excellent', 'good', 'poor')))
+        analyzer.record(metrics)
+        recorded.append(metrics)
+    times = [m.execution_time for m in recorded]
+    analysis = analyzer.analyze()
+    assert analysis['total_executions'] == len(recorded)
+    assert analysis['success_rate'] == sum(m.success for m in recorded) / len(recorded)
+    assert analysis['avg_execution_time'] == pytest.approx(statistics.fmean(times))
+    assert analysis['stdev_execution_time'] == pytest.approx(statistics.stdev(times))
+    assert analysis['total_tokens_used'] == sum(m.context_tokens_used for m in recorded)
+    assert analysis['quality_counts'] == Counter(m.output_quality for m in recorded)
+    for name, stats in analysis['tools'].items():
+        mine = [m for m in recorded if m.tool_name == name]
+        assert stats['executions'] == len(mine)
+        assert stats['success_rate'] == sum(m.success for m in mine) / len(mine)
+        assert stats['avg_execution_time'] == pytest.approx(
+            statistics.fmean(m.execution_time for m in mine))
+        assert stats['total_tokens_used'] == sum(m.context_tokens_used for m in mine)
+
+
+def test_running_stats_merge_matches_one_pass():
+    rng = random.Random(4)
+    values = [rng.gauss(50, 10) for _ in range(1000)]
+    whole, left, right = RunningStats(), RunningStats(), RunningStats()
+    for i, value in enumerate(values):
+        whole.add(value)
+        (left if i < 300 else right).add(value)
+    merged = left.merge(right)
+    assert merged.count == whole.count == len(values)
+    assert merged.mean == pytest.approx(statistics.fmean(values))
+    assert merged.variance == pytest.approx(statistics.variance(values))
+    assert RunningStats().merge(whole).variance == pytest.approx(whole.variance)
+
+
+def test_report_is_cached_until_data_or_thresholds_change():
+    analyzer = FeedbackAnalyzer(sinks=[], latency_threshold=100)
+    for i in range(5):
+        analyzer.record(ExecutionMetrics('tool', 1000.0 + i, True, 50.0, 0, 'good'))
+    first = analyzer.report()
+    assert analyzer.report() is first
+    analyzer.latency_threshold = 10
+    second = analyzer.report()
+    assert second != first and 'exceeds 10ms' in second
+    analyzer.record(ExecutionMetrics('tool', 2000.0, False, 50.0, 0, 'poor'))
+    assert 'Total Executions: 6' in analyzer.report()
@@ -0,0 +1,113 @@
+"""Tests for tool instrumentation."""
+
+from types import SimpleNamespace
+
+import pytest
+
+from feedback import FeedbackAnalyzer
+from instrument import _Sampler, instrument, measure
+from sinks import CallbackSink
+
+
+def _analyzer():
+    received = []
+    return FeedbackAnalyzer(sinks=[CallbackSink(received.extend)]), received
+
+
+def test_records_success_failure_and_result():
+    analyzer, received = _analyzer()
+    
+    @instrument(analyzer, tokens=7)
+    def tool(x):
+        if x < 0:
+            raise ValueError(x)
+        return x * 2
+    
+    assert tool(2) == 4
+    with pytest.raises(ValueError):
+        tool(-1)
+    analyzer.flush(5)
+    assert [(m.tool_name, m.success, m.output_quality, m.context_tokens_used)
+            for m in received] == [('tool', True, 'good', 7),
+                                   ('tool', False, 'poor', 7)]
+    assert all(m.execution_time >= 0 for m in received)
+
+
+@pytest.mark.parametrize('rate', [0.3, 0.5, 0.01, 1.0])
+def test_sampler_picks_the_requested_fraction(rate):
+    sampler = _Sampler(rate)
+    due = sum(sampler.due() for _ in range(10000))
+    assert abs(due - rate * 10000) <= 1
+
+
+@pytest.mark.parametrize('rate', [0, -0.5, 1.5, 3])
+def test_sampler_rejects_rates_outside_unit_interval(rate):
+    with pytest.raises(ValueError):
+        _Sampler(rate)
+
+
+def test_record_rate_skips_unrecorded_calls():
+    analyzer, received = _analyzer()
+    calls = []
+    tool = instrument(analyzer, 'hot', record_rate=0.25)(calls.append)
+    for i in range(100):
+        tool(i)
+    analyzer.flush(5)
+    assert len(calls) == 100
+    assert len(received) == 25
+
+
+@pytest.mark.parametrize('kwargs', [{'record_rate': 0}, {'record_rate': 1.5},
+                                    {'sample_rate': -0.1}, {'sample_rate': 2}])
+def test_instrument_rejects_bad_rates(kwargs):
+    analyzer, _ = _analyzer()
+    with pytest.raises(ValueError):
+        instrument(analyzer, **kwargs)
+
+
+def test_traced_calls_note_peak_allocation():
+    analyzer, received = _analyzer()
+    tool = instrument(analyzer, 'alloc', sample_rate=0.5)(lambda n: bytearray(n))
+    for _ in range(4):
+        tool(100000)
+    analyzer.flush(5)
+    notes = [m.feedback for m in received]
+    assert len(notes) == 4
+    assert sum(1 for note in notes if note and note.startswith('peak allocation')) == 2
+
+
+def test_measure_records_block():
+    analyzer, received = _analyzer()
+    with measure(analyzer, 'block', tokens=3) as m:
+        m.success = False
+    analyzer.flush(5)
+    assert [(r.tool_name, r.success, r.context_tokens_used)
+            for r in received] == [('block', False, 3)]
+
+
+def test_extractors_never_mask_the_tools_exception():
+    analyzer, received = _analyzer()
+    
+    @instrument(analyzer, tokens=lambda r: r.tokens, quality=lambda r: r.quality)
+    def tool(fail):
+        if fail:
+            raise KeyError('original')
+        return SimpleNamespace(tokens=12, quality='excellent')
+    
+    with pytest.raises(KeyError, match='original'):
+        tool(True)
+    tool(False)
+    analyzer.flush(5)
+    assert [(m.success, m.context_tokens_used, m.output_quality)
+            for m in received] == [(False, 0, 'poor'), (True, 12, 'excellent')]
+
+
+def test_success_attribute_is_read_per_result():
+    analyzer, received = _analyzer()
+    results = iter([SimpleNamespace(success=False), SimpleNamespace(),
+                    SimpleNamespace(success=True)])
+    tool = instrument(analyzer, 'ns')(lambda: next(results))
+    for _ in range(3):
+        tool()
+    analyzer.flush(5)
+    assert [m.success for m in received] == [False, True, True]
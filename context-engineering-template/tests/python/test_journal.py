@@ -0,0 +1,134 @@
+"""Tests for the CRC-framed metrics log."""
+
+import glob
+import os
+import subprocess
+import sys
+import textwrap
+import time
+
+from feedback import ExecutionMetrics
+from journal import MetricsLog
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _metrics(i, tool='tool'):
+    return ExecutionMetrics(tool, 1000.0 + i, i % 3 != 0, float(i), i, 'good',
+                            f'note {i}')
+
+
+def _segments(directory):
+    return sorted(glob.glob(os.path.join(directory, '*.seg')))
+
+
+def test_round_trip_and_time_range(tmp_path):
+    log = MetricsLog(str(tmp_path), index_every=4)
+    log.write([_metrics(i) for i in range(50)])
+    assert [m.execution_time for m in log.replay()] == [float(i) for i in range(50)]
+    assert [m.timestamp for m in log.replay(1010, 1019)] == [1000.0 + i for i in range(10, 20)]
+    log.close()
+    reopened = MetricsLog(str(tmp_path))
+    records = list(reopened)
+    reopened.close()
+    assert records == [_metrics(i) for i in range(50)]
+
+
+def test_replay_after_truncated_frame(tmp_path):
+    log = MetricsLog(str(tmp_path))
+    log.write([_metrics(i) for i in range(10)])
+    log.close()
+    path = _segments(str(tmp_path))[-1]
+    size = os.path.getsize(path)
+    with open(path, 'r+b') as f:
+        f.truncate(size - 3)
+    
+    log = MetricsLog(str(tmp_path))
+    assert [m.timestamp for m in log.replay()] == [1000.0 + i for i in range(9)]
+    log.write([_metrics(100)])
+    log.close()
+    log = MetricsLog(str(tmp_path))
+    assert [m.timestamp for m in log.replay()][-2:] == [1008.0, 1100.0]
+    log.close()
+
+
+def test_corrupt_frame_keeps_valid_prefix(tmp_path):
+    log = MetricsLog(str(tmp_path))
+    log.write([_metrics(i) for i in range(10)])
+    log.close()
+    path = _segments(str(tmp_path))[-1]
+    size = os.path.getsize(path)
+    with open(path, 'r+b') as f:
+        f.seek(size // 2)
+        byte = f.read(1)
+        f.seek(size // 2)
+        f.write(bytes([byte[0] ^ 0xFF]))
+    
+    log = MetricsLog(str(tmp_path))
+    timestamps = [m.timestamp for m in log.replay()]
+    log.close()
+    assert 0 < len(timestamps) < 10
+    assert timestamps == [1000.0 + i for i in range(len(timestamps))]
+
+
+def test_commit_deadline_without_further_writes(tmp_path):
+    log = MetricsLog(str(tmp_path), sync_interval=0.05)
+    log.write([_metrics(0)])
+    log.write([_metrics(1)])
+    path = _segments(str(tmp_path))[-1]
+    deadline = time.monotonic() + 2
+    while os.path.getsize(path) == 0 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    try:
+        assert os.path.getsize(path) > 0
+        with open(path, 'rb') as f:
+            assert b'note 1' in f.read()
+    finally:
+        log.close()
+
+
+def test_segments_stay_within_segment_bytes(tmp_path):
+    log = MetricsLog(str(tmp_path), segment_bytes=1000, sync_interval=60,
+                     group_bytes=700)
+    for i in range(0, 200, 7):
+        log.write([_metrics(j) for j in range(i, min(i + 7, 200))])
+    log.close()
+    paths = _segments(str(tmp_path))
+    assert len(paths) > 5
+    assert all(os.path.getsize(p) <= 1000 for p in paths)
+    log = MetricsLog(str(tmp_path))
+    assert len(list(log)) == 200
+    log.close()
+
+
+def test_compaction_folds_sealed_segments(tmp_path):
+    log = MetricsLog(str(tmp_path), segment_bytes=1000)
+    log.write([_metrics(i) for i in range(100)])
+    before = len(_segments(str(tmp_path)))
+    folded = log.compact(1000.0 + 60)
+    assert 0 < folded <= 60
+    assert len(_segments(str(tmp_path))) < before
+    remaining = list(log)
+    assert folded + len(remaining) == 100
+    assert log.aggregates()['tools']['tool']['count'] == folded
+    log.close()
+
+
+def test_records_are_committed_at_exit(tmp_path):
+    script = textwrap.dedent(f'''
+        import sys
+        sys.path.insert(0, 'src/feedback/python')
+        from feedback import ExecutionMetrics, FeedbackAnalyzer
+        from journal import MetricsLog
+
+        log = MetricsLog({str(tmp_path)!r}, sync_interval=60)
+        analyzer = FeedbackAnalyzer(sinks=[log])
+        for i in range(5):
+            analyzer.record(ExecutionMetrics('tool', 1000.0 + i, True, 1.0, 0, 'good'))
+    ''')
+    result = subprocess.run([sys.executable, '-c', script], cwd=ROOT,
+                            capture_output=True, text=True, timeout=30)
+    assert result.returncode == 0, result.stderr
+    log = MetricsLog(str(tmp_path))
+    assert len(list(log)) == 5
+    log.close()
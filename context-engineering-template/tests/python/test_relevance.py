@@ -0,0 +1,108 @@
+"""Tests for the BM25 relevance index."""
+
+import math
+import random
+
+import pytest
+
+import relevance
+from builder import ContextBuilder
+from relevance import InvertedIndex, terms
+
+DOCS = {
+    'cache': 'Cache rendered sections and invalidate the cache on edits.',
+    'tokens': 'Count tokens with a cached tokenizer.',
+    'style': 'Prefer small functions and clear names.',
+    'tests': 'Write focused tests for cache invalidation and tokens.',
+}
+
+
+def _bm25(docs, query, k1=1.5, b=0.75):
+    counted = {key: terms(text) for key, text in docs.items()}
+    avgdl = sum(map(len, counted.values())) / len(counted)
+    scores = {}
+    for key, words in counted.items():
+        score = 0.0
+        for term in terms(query):
+            tf = words.count(term)
+            if not tf:
+                continue
+            df = sum(term in other for other in counted.values())
+            idf = math.log(1 + (len(counted) - df + 0.5) / (df + 0.5))
+            score += idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * len(words) / avgdl))
+        if score:
+            scores[key] = score
+    return scores
+
+
+def _index(docs):
+    index = InvertedIndex()
+    for key, text in docs.items():
+        index.add(key, text)
+    return index
+
+
+def test_scores_match_reference_bm25():
+    index = _index(DOCS)
+    for query in ('cache', 'cache tokens', 'small tests', 'unrelated words'):
+        expected = _bm25(DOCS, query)
+        scores = index.scores(query)
+        assert scores.keys() == expected.keys()
+        for key, score in expected.items():
+            assert scores[key] == pytest.approx(score)
+
+
+def test_search_ranks_best_first_and_honours_top_k():
+    index = _index(DOCS)
+    ranked = index.search('cache invalidation')
+    assert [key for key, _ in ranked] == ['tests', 'cache']
+    assert [score for _, score in ranked] == sorted(
+        (score for _, score in ranked), reverse=True)
+    assert index.search('cache tokens', top_k=1) == index.search('cache tokens')[:1]
+    assert index.search('nothing matches') == []
+
+
+def test_incremental_updates_match_a_rebuilt_index():
+    rng = random.Random(5)
+    vocabulary = 'alpha beta gamma delta cache tokens style tests'.split()
+    docs = {}
+    index = InvertedIndex()
+    for _ in range(300):
+        key = f'd{rng.randrange(20)}'
+        if key in docs and rng.random() < 0.3:
+            del docs[key]
+            index.remove(key)
+        else:
+            docs[key] = ' '.join(rng.choice(vocabulary)
+                                 for _ in range(rng.randint(1, 10)))
+            index.add(key, docs[key])
+        copy = index.copy()
+        copy.add('extra', 'alpha alpha')
+        query = ' '.join(rng.sample(vocabulary, 2))
+        assert index.search(query) == pytest.approx(_index(docs).search(query))
+    assert len(index) == len(docs)
+
+
+def test_numpy_and_python_scoring_agree(monkeypatch):
+    pytest.importorskip('numpy')
+    index = _index(DOCS)
+    vectorized = index.scores('cache tokens tests')
+    monkeypatch.setattr(relevance, 'np', None)
+    assert index.scores('cache tokens tests') == pytest.approx(vectorized)
+
+
+def test_builder_ranks_sections_by_query_and_applies_top_k():
+    builder = ContextBuilder()
+    builder.add_section('Rules', 'Answer briefly.', 'high')
+    for key, text in DOCS.items():
+        builder.add_section(key, text, 'medium')
+    builder.build(query='cache invalidation')
+    report = builder.last_report
+    assert report.included == ['tests', 'cache', 'Rules']
+    dropped = {d.title: d.reason for d in report.dropped}
+    assert dropped == {'tokens': 'not_relevant', 'style': 'not_relevant'}
+    
+    builder.build(query='cache invalidation', top_k=2)
+    assert builder.last_report.included == ['tests', 'cache']
+    assert {d.title: d.reason for d in builder.last_report.dropped}['Rules'] == (
+        'below_top_k')
@@ -0,0 +1,90 @@
+"""Tests for fleet-wide metrics in shared memory."""
+
+import multiprocessing
+
+import pytest
+
+from feedback import ExecutionMetrics
+from shared import SharedMetrics
+
+
+def _work(args, count, offset):
+    metrics = SharedMetrics(*args)
+    for i in range(count):
+        metrics.record(float(offset + i % 10 + 1), i % 2 == 0, 3)
+    metrics.close()
+
+
+def _hold(args, claimed, release):
+    metrics = SharedMetrics(*args)
+    metrics.claim()
+    claimed.set()
+    release.wait(30)
+    metrics.close()
+
+
+@pytest.fixture
+def block():
+    metrics = SharedMetrics.create(slots=4)
+    yield metrics
+    metrics.close()
+    metrics.unlink()
+
+
+def test_concurrent_writers(block):
+    workers = [multiprocessing.Process(target=_work,
+                                       args=(block.attach_args(), 500, n * 10))
+               for n in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(30)
+        assert worker.exitcode == 0
+    snapshot = block.snapshot()
+    assert snapshot['workers'] == 4
+    assert snapshot['total_executions'] == 2000
+    assert snapshot['success_rate'] == 0.5
+    assert snapshot['total_tokens_used'] == 6000
+    assert snapshot['avg_execution_time'] == pytest.approx(20.5)
+    assert snapshot['lost'] == 0
+
+
+def test_slots_of_exited_workers_are_reclaimed(block):
+    for round_ in range(3):
+        workers = [multiprocessing.Process(target=_work,
+                                           args=(block.attach_args(), 100, 0))
+                   for _ in range(4)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join(30)
+            assert worker.exitcode == 0
+    snapshot = block.snapshot()
+    assert snapshot['total_executions'] == 1200
+    assert snapshot['total_tokens_used'] == 3600
+    assert snapshot['workers'] == 4
+    assert snapshot['lost'] == 0
+    assert snapshot['p50'] == pytest.approx(5.5, rel=0.1)
+
+
+def test_no_free_slot_is_reported():
+    block = SharedMetrics.create(slots=1)
+    claimed, release = multiprocessing.Event(), multiprocessing.Event()
+    holder = multiprocessing.Process(target=_hold,
+                                     args=(block.attach_args(), claimed, release))
+    holder.start()
+    try:
+        assert claimed.wait(30)
+        writer = SharedMetrics(*block.attach_args())
+        with pytest.raises(RuntimeError):
+            writer.record(1.0, True, 0)
+        batch = [ExecutionMetrics('tool', 0.0, True, 1.0, 0, 'good')] * 3
+        with pytest.warns(RuntimeWarning):
+            writer.write(batch)
+        assert block.snapshot()['lost'] == 3
+        writer.close()
+    finally:
+        release.set()
+        holder.join(30)
+        block.close()
+        block.unlink()
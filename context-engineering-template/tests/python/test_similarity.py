@@ -0,0 +1,59 @@
+"""Tests for near-duplicate detection."""
+
+import random
+
+from builder import ContextBuilder
+from similarity import DEFAULT_HASHER, find_near_duplicates
+
+SHORT = ('Always validate user input at the service boundary and return '
+         'a clear error if fields are missing.')
+
+
+def _edit(text, index, word):
+    words = text.split()
+    words[index] = word
+    return ' '.join(words)
+
+
+def _long_text(seed, words=150):
+    rng = random.Random(seed)
+    return ' '.join(f'w{rng.randrange(1000)}' for _ in range(words))
+
+
+def _similarity(a, b):
+    return DEFAULT_HASHER.similarity(DEFAULT_HASHER.sketch(a),
+                                     DEFAULT_HASHER.sketch(b))
+
+
+def test_one_word_edits_are_near_duplicates():
+    assert len(SHORT.split()) == 17
+    long = _long_text(1)
+    pairs = [(SHORT, _edit(SHORT, 8, 'API')),
+             (long, _edit(long, 75, 'changed'))]
+    for a, b in pairs:
+        assert _similarity(a, b) >= ContextBuilder.DEDUP_THRESHOLD
+        items = [(a, DEFAULT_HASHER.sketch(a)), (b, DEFAULT_HASHER.sketch(b))]
+        assert set(find_near_duplicates(items, ContextBuilder.DEDUP_THRESHOLD,
+                                        DEFAULT_HASHER)) == {1}
+
+
+def test_distinct_sections_are_kept():
+    texts = [SHORT,
+             'Prefer composition over inheritance when sharing behaviour '
+             'between small classes.',
+             _long_text(2), _long_text(3)]
+    items = [(t, DEFAULT_HASHER.sketch(t)) for t in texts]
+    assert find_near_duplicates(items, ContextBuilder.DEDUP_THRESHOLD,
+                                DEFAULT_HASHER) == {}
+
+
+def test_builder_keeps_the_higher_priority_copy():
+    builder = ContextBuilder(dedup=True)
+    builder.add_section('Draft rule', _edit(SHORT, 8, 'API'), 'low')
+    builder.add_section('Rule', SHORT, 'high')
+    builder.add_section('Long', _long_text(4), 'medium')
+    builder.add_section('Long copy', _edit(_long_text(4), 10, 'x'), 'low')
+    builder.build()
+    dropped = {d.title: d.reason for d in builder.last_report.dropped}
+    assert dropped == {'Draft rule': 'duplicate', 'Long copy': 'duplicate'}
+    assert set(builder.last_report.included) == {'Rule', 'Long'}
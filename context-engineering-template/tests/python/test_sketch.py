@@ -0,0 +1,72 @@
+"""Tests for the latency quantile sketches."""
+
+import random
+
+import pytest
+
+from sketch import QuantileSketch, WindowedSketch
+
+QS = (0.01, 0.25, 0.5, 0.9, 0.99, 0.999)
+
+
+def _true_quantile(ordered, q):
+    return ordered[int(q * (len(ordered) - 1))]
+
+
+@pytest.mark.parametrize('accuracy', [0.01, 0.05])
+def test_quantiles_stay_within_relative_error(accuracy):
+    rng = random.Random(1)
+    values = [rng.lognormvariate(4, 1.5) for _ in range(20000)]
+    sketch = QuantileSketch(accuracy)
+    for value in values:
+        sketch.add(value)
+    ordered = sorted(values)
+    for q in QS:
+        expected = _true_quantile(ordered, q)
+        assert abs(sketch.quantile(q) - expected) <= accuracy * expected * (1 + 1e-9)
+    assert sketch.quantile(0) == ordered[0] and sketch.quantile(1) == ordered[-1]
+    assert QuantileSketch().quantile(0.5) is None
+
+
+def test_merged_sketches_equal_one_sketch():
+    rng = random.Random(2)
+    parts = [QuantileSketch() for _ in range(4)]
+    whole = QuantileSketch()
+    for i in range(8000):
+        value = rng.expovariate(0.01) if i % 10 else 0.0
+        parts[i % 4].add(value)
+        whole.add(value)
+    merged = parts[0].copy()
+    for part in parts[1:]:
+        merged.merge(part)
+    assert merged.count == whole.count and merged.zeros == whole.zeros
+    assert merged.quantiles(QS) == whole.quantiles(QS)
+    with pytest.raises(ValueError):
+        merged.merge(QuantileSketch(0.05))
+
+
+def test_bucket_limit_only_blurs_the_lowest_values():
+    sketch = QuantileSketch(0.01, max_buckets=100)
+    values = [1.05 ** i for i in range(1000)]
+    for value in values:
+        sketch.add(value)
+    assert len(sketch.buckets) <= 100
+    for q in (0.95, 0.99):
+        expected = _true_quantile(values, q)
+        assert abs(sketch.quantile(q) - expected) <= 0.01 * expected * (1 + 1e-9)
+
+
+def test_windows_slide_and_expire():
+    sketch = WindowedSketch(window_ms=1000, windows=3)
+    for second in range(10):
+        for _ in range(10):
+            sketch.add(float(second + 1), second * 1000 + 500)
+    window = sketch.merged()
+    assert window.count == 30 and window.min == 8.0 and window.max == 10.0
+    assert sketch.merged(now=11_000).count == 10
+    assert sketch.merged(now=20_000).count == 0
+    
+    # Late values land in their window while it is retained
+    sketch.add(100.0, 8200)
+    sketch.add(100.0, 1200)
+    assert sketch.merged().count == 31 and sketch.merged().max == 100.0
@@ -0,0 +1,94 @@
+"""Tests for builder snapshots."""
+
+import pytest
+
+from builder import ContextBuilder, _SNAPSHOT_HEADER
+
+
+def _builder(unit='chars'):
+    builder = ContextBuilder(max_length=300, unit=unit, packing='greedy',
+                             layout='stable')
+    builder.add_section('Role', 'You review Python code.', 'high')
+    builder.add_section('Style', 'Prefer small functions.\n\nName things well.',
+                        'medium', trim='tail')
+    builder.add_section('Ünïcode', 'Grüße — 你好 ' * 10, 'low', volatile=True)
+    builder.add_section('Notes', 'Background reading. ' * 30, 'low', trim='head')
+    return builder
+
+
+def _save(tmp_path, builder=None):
+    path = str(tmp_path / 'library.ctx')
+    (builder or _builder()).save(path)
+    return path
+
+
+@pytest.mark.parametrize('memory_map', [True, False])
+@pytest.mark.parametrize('unit', ['chars', 'tokens'])
+def test_round_trip(tmp_path, memory_map, unit):
+    original = _builder(unit)
+    path = _save(tmp_path, original)
+    loaded = ContextBuilder.load(path, memory_map=memory_map)
+    for attr in ('max_length', 'packing', 'unit', 'layout', 'dedup'):
+        assert getattr(loaded, attr) == getattr(original, attr)
+    for title, section in original.sections.items():
+        copy = loaded.sections[title]
+        assert 'content' not in copy.__dict__
+        assert (copy.priority, copy.trim, copy.volatile, copy.length) == (
+            section.priority, section.trim, section.volatile, section.length)
+    assert loaded.get_stats() == original.get_stats()
+    assert loaded.build() == original.build()
+    assert loaded.build(query='python style') == original.build(query='python style')
+    
+    loaded.sections['Role'].content = 'You review Python and Rust code.'
+    assert loaded.get_stats()['total_length'] == sum(
+        len(str(s)) for s in loaded.sections.values())
+
+
+def test_providers_cannot_be_saved(tmp_path):
+    builder = _builder()
+    builder.add_provider('Live', lambda: 'data', size_hint=10)
+    with pytest.raises(ValueError):
+        builder.save(str(tmp_path / 'lazy.ctx'))
+
+
+@pytest.mark.parametrize('keep', [0, 10, _SNAPSHOT_HEADER.size + 5, -40, -1])
+def test_truncated_snapshot_is_rejected(tmp_path, keep):
+    path = _save(tmp_path)
+    with open(path, 'rb') as f:
+        data = f.read()
+    with open(path, 'wb') as f:
+        f.write(data[:keep])
+    with pytest.raises(ValueError):
+        ContextBuilder.load(path).build()
+
+
+def test_corrupt_index_is_rejected_on_load(tmp_path):
+    path = _save(tmp_path)
+    with open(path, 'r+b') as f:
+        f.seek(_SNAPSHOT_HEADER.size + 3)
+        byte = f.read(1)
+        f.seek(_SNAPSHOT_HEADER.size + 3)
+        f.write(bytes([byte[0] ^ 0x01]))
+    with pytest.raises(ValueError, match='corrupt'):
+        ContextBuilder.load(path)
+
+
+def test_corrupt_content_is_detected_when_decoded(tmp_path):
+    path = _save(tmp_path)
+    with open(path, 'rb') as f:
+        data = bytearray(f.read())
+    at = data.rindex(b'Background reading.')
+    data[at] = ord('b')
+    with open(path, 'wb') as f:
+        f.write(data)
+    loaded = ContextBuilder.load(path)
+    assert loaded.sections['Role'].content == 'You review Python code.'
+    with pytest.raises(ValueError, match='Notes'):
+        loaded.sections['Notes'].content
+
+
+def test_other_files_are_rejected(tmp_path):
+    path = tmp_path / 'notes.txt'
+    path.write_bytes(b'just some text that is not a snapshot at all')
+    with pytest.raises(ValueError, match='not a context snapshot'):
+        ContextBuilder.load(str(path))
@@ -0,0 +1,87 @@
+"""Tests for the columnar metrics ring buffer."""
+
+import random
+
+import pytest
+
+import store as store_module
+from store import MetricsStore
+
+
+def _row(i):
+    return (f'tool{i % 3}', 1000.0 + i, i % 4 != 0, float(i % 17), i,
+            ('excellent', 'good', 'poor')[i % 3],
+            f'note {i}' if i % 5 == 0 else None,
+            f'ctx{i}' if i % 7 == 0 else None)
+
+
+def _expected(rows, tool=None, since=None):
+    rows = [r for r in rows if (tool is None or r[0] == tool)
+            and (since is None or r[1] >= since)]
+    quality = {}
+    for r in rows:
+        quality[r[5]] = quality.get(r[5], 0) + 1
+    count = len(rows)
+    return {
+        'executions': count,
+        'success_rate': sum(r[2] for r in rows) / count if count else 0,
+        'avg_execution_time': sum(r[3] for r in rows) / count if count else 0,
+        'total_tokens_used': sum(r[4] for r in rows),
+        'quality_counts': quality,
+    }
+
+
+def _assert_same(actual, expected):
+    actual, expected = dict(actual), dict(expected)
+    assert actual.pop('quality_counts') == expected.pop('quality_counts')
+    assert actual == pytest.approx(expected)
+
+
+def test_oldest_records_are_evicted_in_order():
+    store = MetricsStore(capacity=10)
+    rows = [_row(i) for i in range(27)]
+    for i, row in enumerate(rows, 1):
+        store.append(*row)
+        assert len(store) == min(i, 10)
+        assert list(store) == rows[max(0, i - 10):i]
+    assert store.evicted == 17
+    # Side columns are dropped along with the slot they belonged to
+    assert len(store._feedback) == sum(r[6] is not None for r in rows[-10:])
+    assert len(store._context) == sum(r[7] is not None for r in rows[-10:])
+    
+    store.clear()
+    assert len(store) == 0 and list(store) == [] and store.evicted == 0
+    store.append(*rows[0])
+    assert list(store) == rows[:1]
+
+
+def test_summary_covers_only_retained_records():
+    rng = random.Random(9)
+    store = MetricsStore(capacity=64)
+    rows = [_row(rng.randrange(10000)) for _ in range(200)]
+    for row in rows:
+        store.append(*row)
+    retained = rows[-64:]
+    since = sorted(r[1] for r in retained)[32]
+    for tool in (None, 'tool0', 'tool2', 'missing'):
+        for start in (None, since):
+            _assert_same(store.summary(tool, start),
+                         _expected(retained, tool, start))
+
+
+def test_numpy_and_python_summaries_agree(monkeypatch):
+    pytest.importorskip('numpy')
+    store = MetricsStore(capacity=50)
+    for i in range(120):
+        store.append(*_row(i))
+    queries = [(tool, since) for tool in (None, 'tool1')
+               for since in (None, 1100.0)]
+    vectorized = [store.summary(*query) for query in queries]
+    monkeypatch.setattr(store_module, 'np', None)
+    for query, expected in zip(queries, vectorized):
+        _assert_same(store.summary(*query), expected)
+
+
+def test_capacity_must_be_positive():
+    with pytest.raises(ValueError):
+        MetricsStore(capacity=0)
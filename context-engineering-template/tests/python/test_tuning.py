@@ -0,0 +1,44 @@
+"""Tests for the context tuner."""
+
+from builder import ContextBuilder
+from feedback import ExecutionMetrics
+from tuning import ContextTuner
+
+
+def _metrics(context_id, quality='good'):
+    return ExecutionMetrics('tool', 0.0, True, 10.0, 0, quality,
+                            context_id=context_id)
+
+
+def test_token_builder_budget_shrinks_in_tokens():
+    builder = ContextBuilder(max_length=2000, unit='tokens')
+    builder.add_section('Task', 'Summarize the incident report. ' * 5, 'high')
+    builder.add_section('Noise', 'unrelated filler text ' * 150, 'low')
+    tuner = ContextTuner(min_samples=10)
+    for i in range(40):
+        target = builder.fork().remove_section('Noise') if i % 2 else builder
+        target.build()
+        tuner.observe(_metrics(tuner.observe_build(target)))
+    
+    recommendation = tuner.recommend(builder)
+    assert recommendation.drop == ['Noise']
+    task_tokens = builder.sections['Task'].token_count(builder.tokenizer)
+    separator = builder.count_tokens('\n\n')
+    # Proposed from token counts, not from character lengths
+    assert task_tokens <= recommendation.max_length
+    assert recommendation.max_length <= (task_tokens + separator) * tuner.headroom + 1
+    assert recommendation.max_length < builder.sections['Task'].length
+
+
+def test_trimmed_sections_count_at_trimmed_size():
+    builder = ContextBuilder(max_length=120, unit='tokens')
+    builder.add_section('Log', 'line of output\n' * 200, 'medium', trim='tail')
+    builder.build()
+    assert builder.last_report.trimmed == ['Log']
+    
+    tuner = ContextTuner()
+    tuner.observe(_metrics(tuner.observe_build(builder)))
+    (estimate,) = tuner.estimates()
+    assert estimate.avg_size == builder.last_report.sizes['Log']
+    assert estimate.avg_size <= 120
+    assert estimate.avg_size < builder.sections['Log'].token_count(builder.tokenizer)